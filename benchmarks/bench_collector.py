@@ -0,0 +1,116 @@
+"""Compares collecting a counter table's values with :py:class:`TableCollector`
+against decoding each entry with :py:func:`read_entries`.
+
+Responses are built up front and served from memory, so only the client side
+cost of decoding them is measured. Requires NumPy.
+
+Usage, from the root of the repository::
+
+    PYTHONPATH=. python benchmarks/bench_collector.py [n_entries]
+"""
+
+import sys
+
+from common import timed
+
+from bfrt_helper.bfrt import BfRtHelper
+from bfrt_helper.bfrt_info import BfRtInfo
+from bfrt_helper.collector import TableCollector
+from bfrt_helper.pb2.bfruntime_pb2 import ReadResponse
+from bfrt_helper.read import read_entries
+
+
+COUNTER_TABLE = "pipe.Ingress.port_counter"
+ENTRIES_PER_RESPONSE = 1000
+
+
+def make_counter_info(size):
+    fields = [
+        {"singleton": {"id": 65553 + i, "name": name, "type": {"type": "uint64"}}}
+        for i, name in enumerate(["$COUNTER_SPEC_BYTES", "$COUNTER_SPEC_PKTS"])
+    ]
+    return BfRtInfo(
+        {
+            "tables": [
+                {
+                    "id": 1,
+                    "name": COUNTER_TABLE,
+                    "table_type": "Counter",
+                    "size": size,
+                    "key": [
+                        {
+                            "id": 65556,
+                            "name": "$COUNTER_INDEX",
+                            "match_type": "Exact",
+                            "type": {"type": "uint32"},
+                        }
+                    ],
+                    "data": fields,
+                }
+            ]
+        }
+    )
+
+
+def make_responses(n_entries):
+    responses = []
+    for start in range(0, n_entries, ENTRIES_PER_RESPONSE):
+        response = ReadResponse()
+        for index in range(start, min(start + ENTRIES_PER_RESPONSE, n_entries)):
+            table_entry = response.entities.add().table_entry
+            table_entry.table_id = 1
+            key_field = table_entry.key.fields.add()
+            key_field.field_id = 65556
+            key_field.exact.value = index.to_bytes(4, "big")
+            for field_id in (65553, 65554):
+                data_field = table_entry.data.fields.add()
+                data_field.field_id = field_id
+                data_field.stream = (index * field_id).to_bytes(8, "big")
+        responses.append(response)
+    return responses
+
+
+class InMemoryClient:
+    def __init__(self, responses):
+        self.responses = responses
+
+    def Read(self, request):
+        return iter(self.responses)
+
+
+class InMemoryConnection:
+    def __init__(self, helper, responses):
+        self.helper = helper
+        self.p4_name = "test"
+        self.client = InMemoryClient(responses)
+
+    def sync_table(self, table_name, operation, program_name=None):
+        pass
+
+
+def per_entry(helper, responses):
+    values = {}
+    for entry in read_entries(helper.bfrt_info, responses):
+        values[entry.key["$COUNTER_INDEX"].value.value] = (
+            entry.data["$COUNTER_SPEC_BYTES"].value,
+            entry.data["$COUNTER_SPEC_PKTS"].value,
+        )
+    return values
+
+
+def main():
+    n_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    helper = BfRtHelper(0, 0, make_counter_info(n_entries))
+    responses = make_responses(n_entries)
+    collector = TableCollector(InMemoryConnection(helper, responses), COUNTER_TABLE)
+
+    for name, function in [
+        ("read_entries", lambda: per_entry(helper, responses)),
+        ("TableCollector", collector.poll),
+    ]:
+        seconds = timed(function, repeat=3)
+        print(f"{name:<16} {seconds * 1e6 / n_entries:8.2f} us/entry")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Measures encoding route table entries held as columns.
+
+Compares building a match and parameter objects per row, from the same
+columns, with encoding the columns directly. Requires NumPy.
+
+Usage, from the root of the repository::
+
+    PYTHONPATH=. python benchmarks/bench_columns.py [n_entries]
+"""
+
+import sys
+
+import numpy
+
+from common import ROUTE_ACTION
+from common import ROUTE_KEY
+from common import ROUTE_TABLE
+from common import make_bfrt_data
+from common import make_routes
+from common import timed
+
+from bfrt_helper.bfrt import BfRtHelper
+from bfrt_helper.bfrt_info import BfRtInfo
+from bfrt_helper.fields import Field
+from bfrt_helper.fields import IPv4Address
+from bfrt_helper.match import LongestPrefixMatch
+from bfrt_helper.wire import WireWriteBatch
+
+
+class NextHop(Field):
+    bitwidth = 16
+
+
+class Port(Field):
+    bitwidth = 9
+
+
+def make_columns(n_entries):
+    routes = numpy.array(make_routes(n_entries), dtype=numpy.uint64)
+    return routes[:, 0], routes[:, 1], routes[:, 2], routes[:, 3]
+
+
+def row_objects(helper, columns):
+    addresses, prefixes, nexthops, ports = columns
+    batch = WireWriteBatch(helper, "test")
+    for address, prefix, nexthop, port in zip(
+        addresses.tolist(), prefixes.tolist(), nexthops.tolist(), ports.tolist()
+    ):
+        batch.insert(
+            ROUTE_TABLE,
+            {ROUTE_KEY: LongestPrefixMatch(IPv4Address(address), prefix)},
+            ROUTE_ACTION,
+            {"nexthop": NextHop(nexthop), "port": Port(port)},
+        )
+    return batch.pop_all()
+
+
+def columns_write(helper, columns):
+    addresses, prefixes, nexthops, ports = columns
+    batch = helper.create_column_write(
+        "test",
+        ROUTE_TABLE,
+        {ROUTE_KEY: (addresses, prefixes)},
+        ROUTE_ACTION,
+        {"nexthop": nexthops, "port": ports},
+    )
+    return batch.pop_all()
+
+
+def main():
+    n_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    helper = BfRtHelper(0, 0, BfRtInfo(make_bfrt_data(10)))
+    columns = make_columns(n_entries)
+    assert row_objects(helper, columns) == columns_write(helper, columns)
+
+    benchmarks = [
+        ("objects per row", row_objects),
+        ("create_column_write", columns_write),
+    ]
+    for name, function in benchmarks:
+        seconds = timed(lambda: function(helper, columns), repeat=3)
+        print(f"{name:<24} {1e6 * seconds / n_entries:8.2f} us/entry")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Measures the construction time and memory of :py:class:`Field` objects,
+and the time to encode them.
+
+The slotted fields are compared against an equivalent of how fields were
+implemented before they were slotted: with a ``__dict__`` each, the class's
+bitwidth copied to every instance by ``__new__``, and the maximum value
+recomputed by every construction.
+
+Encoding is measured for the first call to ``to_bytes``, which encodes the
+value, and later calls, which return the memoised bytes, as when the same
+entries are written again. The masks of prefix matches are shared, so are
+only encoded once for each prefix length.
+
+Usage, from the root of the repository::
+
+    PYTHONPATH=. python benchmarks/bench_fields.py [n_fields]
+"""
+
+import gc
+import sys
+import tracemalloc
+
+from common import timed
+
+from bfrt_helper.fields import DevPort
+from bfrt_helper.fields import IPv4Address
+from bfrt_helper.fields import PortId
+from bfrt_helper.fields import field_class
+from bfrt_helper.match import LongestPrefixMatch
+from bfrt_helper.util import InvalidValue
+from bfrt_helper.util import encode_number
+
+
+class LegacyField:
+    def __init__(self, value=0):
+        if hasattr(self, "bitwidth"):
+            max_value = self.__class__.max_value()
+            if value > max_value:
+                raise InvalidValue(f"Value {value} is too large")
+        self.value = value
+
+    def __new__(cls, *args, **kwargs):
+        instance = super().__new__(cls)
+        if hasattr(cls, "bitwidth"):
+            instance.bitwidth = cls.bitwidth
+        return instance
+
+    @classmethod
+    def max_value(cls):
+        return 2**cls.bitwidth - 1
+
+
+class LegacyPortId(LegacyField):
+    bitwidth = 9
+
+
+class LegacyDevPort(LegacyField):
+    bitwidth = 32
+
+
+class LegacyBits48(LegacyField):
+    bitwidth = 48
+
+
+def build(classes, n_fields):
+    return [cls(i % 512) for i in range(n_fields) for cls in classes]
+
+
+def measure(function):
+    gc.collect()
+    tracemalloc.start()
+    result = function()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def main():
+    n_fields = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+    variants = {
+        "legacy": (LegacyPortId, LegacyDevPort, LegacyBits48),
+        "slotted": (PortId, DevPort, field_class(48)),
+    }
+    n_objects = n_fields * 3
+    for name, classes in variants.items():
+        seconds = timed(lambda: build(classes, n_fields), repeat=3)
+        fields, size = measure(lambda: build(classes, n_fields))
+        # The list holding the fields is not counted.
+        size -= sys.getsizeof(fields)
+        print(
+            f"{name:<8} {seconds / n_objects * 1e9:6.0f} ns/object"
+            f"  {size / n_objects:5.0f} bytes/object"
+        )
+
+    routes = [
+        LongestPrefixMatch(IPv4Address(0x0A000000 + (i << 8)), 24)
+        for i in range(n_fields)
+    ]
+
+    def legacy_to_bytes(field):
+        return encode_number(field.value, field.bitwidth)
+
+    def encode_unmemoised():
+        for match in routes:
+            legacy_to_bytes(match.value)
+            legacy_to_bytes(match.mask)
+
+    def encode():
+        for match in routes:
+            match.value.to_bytes()
+            match.mask.to_bytes()
+
+    for name, function in (
+        ("unmemoised", encode_unmemoised),
+        ("first", encode),
+        ("memoised", encode),
+    ):
+        seconds = timed(function, repeat=1)
+        print(f"{name:<10} {seconds / n_fields * 1e9:6.0f} ns/route encode")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Measures the memory of a shadow copy of a port forwarding table, with its
+fields created by their constructors or shared with ``Field.flyweight``.
+
+Each entry is keyed by ingress port and VLAN, and forwards to an egress port
+with a replication ID, as a table of a VLAN aware switch would. Only the
+fields differ between the two copies; the matches and dictionaries of each
+entry are the same.
+
+The time to build the table, and to encode every field of it, is also given.
+
+Usage, from the root of the repository::
+
+    PYTHONPATH=. python benchmarks/bench_flyweight.py [n_entries]
+"""
+
+import gc
+import sys
+import tracemalloc
+
+from common import timed
+
+from bfrt_helper.fields import PortId
+from bfrt_helper.fields import ReplicationId
+from bfrt_helper.fields import VlanID
+from bfrt_helper.match import Exact
+
+
+def make_table(n_entries, make):
+    table = []
+    for i in range(n_entries):
+        key = {
+            "ig_intr_md.ingress_port": Exact(make(PortId, i % 512)),
+            "hdr.vlan.vid": Exact(make(VlanID, i // 512 % 4096)),
+        }
+        params = {
+            "egress_port": make(PortId, (i * 7) % 512),
+            "rid": make(ReplicationId, i % 64),
+        }
+        table.append((key, params))
+    return table
+
+
+def construct(cls, value):
+    return cls(value)
+
+
+def flyweight(cls, value):
+    return cls.flyweight(value)
+
+
+def encode(table):
+    for key, params in table:
+        for match in key.values():
+            match.value_bytes()
+        for param in params.values():
+            param.to_bytes()
+
+
+def measure(function):
+    gc.collect()
+    tracemalloc.start()
+    result = function()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def main():
+    n_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    # Create the shared instances up front, as a long running process would
+    # have, so that they are not counted against the table.
+    make_table(n_entries, flyweight)
+    for name, make in (("constructed", construct), ("flyweight", flyweight)):
+        table, size = measure(lambda: make_table(n_entries, make))
+        build_seconds = timed(lambda: make_table(n_entries, make), repeat=3)
+        encode_seconds = timed(lambda: encode(table), repeat=1)
+        print(
+            f"{name:<12} {size / n_entries:5.0f} bytes/entry"
+            f"  build {build_seconds / n_entries * 1e6:5.2f} us/entry"
+            f"  first encode {encode_seconds / n_entries * 1e6:5.2f} us/entry"
+        )
+        table = None
+
+
+if __name__ == "__main__":
+    main()
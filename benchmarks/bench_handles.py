@@ -0,0 +1,93 @@
+"""Compares modifying table entries by key with modifying them by handle.
+
+Entries are in a table keyed on four 128 bit ternary fields, e.g. an IPv6
+ACL. Reports the encoding time and request size per entry.
+
+Usage, from the root of the repository::
+
+    PYTHONPATH=. python benchmarks/bench_handles.py [n_entries]
+"""
+
+import sys
+
+from common import make_key
+from common import make_param
+from common import timed
+
+from bfrt_helper.bfrt import BfRtHelper
+from bfrt_helper.bfrt_info import BfRtInfo
+from bfrt_helper.fields import Field
+from bfrt_helper.handles import HandleCache
+from bfrt_helper.match import Ternary
+from bfrt_helper.wire import WireWriteBatch
+
+
+ACL_TABLE = "pipe.Ingress.acl"
+ACL_ACTION = "Ingress.permit"
+KEY_NAMES = ["src_addr", "dst_addr", "src_mask", "dst_mask"]
+
+
+class IPv6(Field):
+    bitwidth = 128
+
+
+class Port(Field):
+    bitwidth = 9
+
+
+def make_acl_info():
+    return BfRtInfo(
+        {
+            "tables": [
+                {
+                    "id": 1,
+                    "name": ACL_TABLE,
+                    "table_type": "MatchAction_Direct",
+                    "key": [
+                        make_key(i + 1, name, "Ternary", 128)
+                        for i, name in enumerate(KEY_NAMES)
+                    ],
+                    "action_specs": [
+                        {"id": 2, "name": ACL_ACTION, "data": [make_param(1, "port", 9)]}
+                    ],
+                }
+            ]
+        }
+    )
+
+
+def make_keys(n_entries):
+    mask = (1 << 128) - (1 << 64)
+    return [
+        {name: Ternary(IPv6((i << 64) + j), IPv6(mask)) for j, name in enumerate(KEY_NAMES)}
+        for i in range(n_entries)
+    ]
+
+
+def modify(helper, handles, keys):
+    batch = WireWriteBatch(helper, "test")
+    for key in keys:
+        handles.modify(batch, key, ACL_ACTION, {"port": Port(1)})
+    return batch.pop_all()
+
+
+def main():
+    n_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    helper = BfRtHelper(0, 0, make_acl_info())
+    keys = make_keys(n_entries)
+    handles = HandleCache(ACL_TABLE)
+    cached = HandleCache(ACL_TABLE)
+    for handle_id, key in enumerate(keys):
+        cached.add(key, handle_id)
+
+    for name, cache in [("by key", handles), ("by handle", cached)]:
+        seconds = timed(lambda: modify(helper, cache, keys), repeat=3)
+        size = sum(len(request) for request, _ in modify(helper, cache, keys))
+        print(
+            f"{name:<10} {seconds * 1e6 / n_entries:8.2f} us/entry "
+            f"{size / n_entries:8.1f} bytes/entry"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Measures the throughput of encoding route table writes with a process pool,
+for increasing numbers of processes.
+
+Usage, from the root of the repository::
+
+    PYTHONPATH=. python benchmarks/bench_parallel.py [n_entries] [max_processes]
+
+Two ways of giving the workers entries are measured. With ``encode``, entries
+are built by the parent before timing and pickled to the workers. With
+``encode_shards``, only ranges of routes are sent, and the workers build the
+entries; this is compared with building and encoding them in one process.
+"""
+
+import os
+import sys
+
+from bench_table_write import NextHop
+from bench_table_write import Port
+from bench_table_write import make_entries
+from common import ROUTE_ACTION
+from common import ROUTE_KEY
+from common import ROUTE_TABLE
+from common import make_bfrt_data
+from common import timed
+
+from bfrt_helper.bfrt import BfRtHelper
+from bfrt_helper.bfrt_info import BfRtInfo
+from bfrt_helper.fields import IPv4Address
+from bfrt_helper.match import LongestPrefixMatch
+from bfrt_helper.parallel import ParallelEncoder
+from bfrt_helper.wire import WireWriteBatch
+
+
+def serial(helper, entries):
+    batch = WireWriteBatch(helper, "test")
+    writer = batch.prepared(ROUTE_TABLE, ROUTE_ACTION)
+    for key, params in entries:
+        batch.add_prepared(writer, key, params)
+    return batch.pop_all()
+
+
+def route_entries(shard):
+    """Builds the entries of routes ``start`` to ``stop``, as ``make_entries``
+    would."""
+    start, stop = shard
+    for i in range(start, stop):
+        yield (
+            {ROUTE_KEY: LongestPrefixMatch(IPv4Address(0x0A000000 + (i << 8)), 24)},
+            {"nexthop": NextHop(i % 65536), "port": Port(i % 512)},
+        )
+
+
+def parallel(encoder, entries):
+    return list(encoder.encode("test", ROUTE_TABLE, entries, ROUTE_ACTION))
+
+
+def parallel_shards(encoder, n_entries, shard_size=10000):
+    shards = [
+        (start, min(start + shard_size, n_entries))
+        for start in range(0, n_entries, shard_size)
+    ]
+    requests = encoder.encode_shards(
+        "test", ROUTE_TABLE, shards, route_entries, ROUTE_ACTION
+    )
+    return list(requests)
+
+
+def report(name, n_entries, seconds):
+    print(f"{name:<16} {n_entries / seconds:12.0f} entries/s")
+
+
+def main():
+    n_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    max_processes = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    helper = BfRtHelper(0, 0, BfRtInfo(make_bfrt_data(500)))
+    entries = make_entries(n_entries)
+
+    print("entries built by the parent")
+    report("serial", n_entries, timed(lambda: serial(helper, entries), repeat=3))
+    processes = 1
+    while processes <= max_processes:
+        with ParallelEncoder(helper, processes) as encoder:
+            seconds = timed(lambda: parallel(encoder, entries), repeat=3)
+        report(f"{processes} processes", n_entries, seconds)
+        processes *= 2
+
+    print("entries built by the workers")
+    seconds = timed(lambda: serial(helper, make_entries(n_entries)), repeat=3)
+    report("serial", n_entries, seconds)
+    processes = 1
+    while processes <= max_processes:
+        with ParallelEncoder(helper, processes) as encoder:
+            seconds = timed(lambda: parallel_shards(encoder, n_entries), repeat=3)
+        report(f"{processes} processes", n_entries, seconds)
+        processes *= 2
+
+
+if __name__ == "__main__":
+    main()
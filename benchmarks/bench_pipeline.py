@@ -0,0 +1,112 @@
+"""Measures the peak memory and time of encoding a pipeline push request.
+
+Building a ``SetForwardingPipelineConfigRequest`` message with
+``create_set_pipeline_request``, and serialising it, is compared with
+encoding it directly from memory mapped artifacts, and with a cache hit.
+
+Each variant runs in a fresh process. Peak memory is the growth of the
+process's resident set (``VmHWM``), which includes pages of mapped files.
+
+Usage, from the root of the repository::
+
+    PYTHONPATH=. python benchmarks/bench_pipeline.py [binary_mb] [n_profiles]
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from bfrt_helper.bfrt import BfRtHelper
+from bfrt_helper.bfrt_info import BfRtInfo
+from bfrt_helper.pipeline import Pipeline
+from bfrt_helper.pipeline import PipelineCache
+from bfrt_helper.pipeline import PipelineProfile
+from bfrt_helper.pipeline import encode_set_pipeline_request
+
+
+def make_pipeline(directory, binary_mb, n_profiles):
+    def write(name, size):
+        path = os.path.join(directory, name)
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+        return path
+
+    bfrt_path = write("bf-rt.json", 4 << 20)
+    profiles = [
+        PipelineProfile(
+            write(f"context{i}.json", 8 << 20),
+            write(f"tofino{i}.bin", binary_mb << 20),
+            profile_name=f"pipe{i}",
+            pipe_scope=[i],
+        )
+        for i in range(n_profiles)
+    ]
+    return Pipeline("bench", bfrt_path, profiles)
+
+
+def status_kb(name):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(name + ":"):
+                return int(line.split()[1])
+
+
+def message(helper, pipeline):
+    profile = pipeline.profiles[0]
+    request = helper.create_set_pipeline_request(
+        pipeline.program_name,
+        pipeline.bfrt_path,
+        profile.context_path,
+        profile.binary_path,
+    )
+    config = request.config[0]
+    for extra in pipeline.profiles[1:]:
+        config_profile = config.profiles.add()
+        config_profile.profile_name = extra.profile_name
+        with open(extra.context_path, "rb") as f:
+            config_profile.context = f.read()
+        with open(extra.binary_path, "rb") as f:
+            config_profile.binary = f.read()
+    return request.SerializeToString()
+
+
+def run(name, pipeline, results):
+    helper = BfRtHelper(0, 0, BfRtInfo({}))
+    cache = PipelineCache()
+    if name == "cache hit":
+        encode_set_pipeline_request(helper, [pipeline], cache=cache)
+    # Resets VmHWM to the current resident set.
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    before = status_kb("VmRSS")
+    start = time.perf_counter()
+    if name == "message":
+        request = message(helper, pipeline)
+    else:
+        request = encode_set_pipeline_request(helper, [pipeline], cache=cache)
+    seconds = time.perf_counter() - start
+    results.put((len(request), (status_kb("VmHWM") - before) / 1024, seconds))
+
+
+def main():
+    binary_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    n_profiles = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        pipeline = make_pipeline(directory, binary_mb, n_profiles)
+        for name in ("message", "mapped", "cache hit"):
+            results = context.Queue()
+            process = context.Process(target=run, args=(name, pipeline, results))
+            process.start()
+            size, peak_mb, seconds = results.get()
+            process.join()
+            print(
+                f"{name:<10} request {size / 1e6:7.1f} MB"
+                f"  peak {peak_mb:7.1f} MB  {seconds * 1000:8.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Compares reading a table from the software shadow and from the hardware,
+against a local stand-in for the BfRt server.
+
+The stand-in serves a route table from pre-encoded responses. A read with
+``from_hw`` set is delayed by a fixed time per entry, standing in for the
+register accesses the driver makes to read each entry from the hardware. The
+delay is a parameter, and should be set from measurements on a real device;
+what is measured here is the cost on top of it, of the request, the response
+stream and decoding the entries.
+
+Usage, from the root of the repository::
+
+    PYTHONPATH=. python benchmarks/bench_read.py [n_entries] [hw_us_per_entry]
+"""
+
+import sys
+import time
+from concurrent import futures
+
+import grpc
+
+from bench_table_write import make_entries
+from common import ROUTE_ACTION
+from common import ROUTE_KEY
+from common import ROUTE_TABLE
+from common import make_bfrt_data
+from common import timed
+
+from bfrt_helper.bfrt import BfRtHelper
+from bfrt_helper.bfrt_info import BfRtInfo
+from bfrt_helper.pb2 import bfruntime_pb2_grpc
+from bfrt_helper.pb2.bfruntime_pb2 import ReadResponse
+from bfrt_helper.read import read_entries
+
+
+ENTRIES_PER_RESPONSE = 1000
+
+
+class StandInServer(bfruntime_pb2_grpc.BfRuntimeServicer):
+    def __init__(self, helper, n_entries, hw_seconds_per_entry):
+        self.hw_seconds_per_entry = hw_seconds_per_entry
+        self.responses = []
+        entries = make_entries(n_entries)
+        for start in range(0, n_entries, ENTRIES_PER_RESPONSE):
+            response = ReadResponse()
+            for key, params in entries[start:start + ENTRIES_PER_RESPONSE]:
+                request = helper.create_table_write(
+                    "test", ROUTE_TABLE, key, ROUTE_ACTION, params
+                )
+                table_entry = response.entities.add().table_entry
+                table_entry.CopyFrom(request.updates[0].entity.table_entry)
+            self.responses.append(response)
+
+    def Read(self, request, context):
+        from_hw = request.entities[0].table_entry.table_flags.from_hw
+        for response in self.responses:
+            if from_hw:
+                time.sleep(self.hw_seconds_per_entry * len(response.entities))
+            yield response
+
+
+def read_table(helper, stub, from_hw, decode):
+    request = helper.create_table_read("test", ROUTE_TABLE, from_hw=from_hw)
+    for entry in read_entries(helper.bfrt_info, stub.Read(request)):
+        if decode:
+            entry.key[ROUTE_KEY]
+            entry.action_params
+
+
+def main():
+    n_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    hw_seconds_per_entry = float(sys.argv[2]) * 1e-6 if len(sys.argv) > 2 else 5e-6
+    helper = BfRtHelper(0, 0, BfRtInfo(make_bfrt_data(10)))
+
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=2))
+    bfruntime_pb2_grpc.add_BfRuntimeServicer_to_server(
+        StandInServer(helper, n_entries, hw_seconds_per_entry), server
+    )
+    port = server.add_insecure_port("localhost:0")
+    server.start()
+    try:
+        channel = grpc.insecure_channel(f"localhost:{port}")
+        stub = bfruntime_pb2_grpc.BfRuntimeStub(channel)
+        for from_hw in (False, True):
+            for decode in (False, True):
+                seconds = timed(
+                    lambda: read_table(helper, stub, from_hw, decode), repeat=3
+                )
+                name = "hardware" if from_hw else "software shadow"
+                name += ", decoded" if decode else ""
+                print(
+                    f"{name:<26} {n_entries / seconds:12.0f} entries/s "
+                    f"{seconds * 1e6 / n_entries:8.2f} us/entry"
+                )
+        channel.close()
+    finally:
+        server.stop(None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Measures the memory used by a parsed BfRt info file.
+
+The slotted, interned schema objects are compared against an equivalent graph
+of plain ``__dict__`` objects holding unshared copies of the same values, which
+is how the schema was held before those classes were slotted.
+
+Usage, from the root of the repository::
+
+    PYTHONPATH=. python benchmarks/bench_schema_memory.py [n_tables]
+"""
+
+import copy
+import gc
+import json
+import sys
+import tracemalloc
+
+from common import make_bfrt_data
+
+from bfrt_helper.bfrt_info import BfRtInfo
+from bfrt_helper.bfrt_info import BfRtObject
+
+
+class Plain:
+    pass
+
+
+def unslotted(value):
+    """Converts schema objects to plain objects with unshared values."""
+    if isinstance(value, list):
+        return [unslotted(x) for x in value]
+    if isinstance(value, BfRtObject):
+        plain = Plain()
+        for name, member in value._members():
+            setattr(plain, name, unslotted(member))
+        return plain
+    return copy.deepcopy(value)
+
+
+def measure(function):
+    gc.collect()
+    tracemalloc.start()
+    result = function()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def main():
+    n_tables = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    # Round trip through JSON so that strings are not already shared, as they
+    # would not be when loading a file.
+    raw = json.dumps(make_bfrt_data(n_tables))
+
+    tables, slotted_size = measure(lambda: BfRtInfo(json.loads(raw)).tables)
+    _, plain_size = measure(lambda: unslotted(tables))
+
+    print(f"tables:               {n_tables}")
+    print(f"raw file size:        {len(raw) / 1e6:.1f} MB")
+    print(f"plain objects:        {plain_size / 1e6:.1f} MB")
+    print(f"slotted objects:      {slotted_size / 1e6:.1f} MB")
+    print(f"reduction:            {100 * (1 - slotted_size / plain_size):.0f}%")
+
+
+if __name__ == "__main__":
+    main()
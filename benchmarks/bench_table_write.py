@@ -0,0 +1,105 @@
+"""Measures the client side cost of building table write requests.
+
+Usage, from the root of the repository::
+
+    PYTHONPATH=. python benchmarks/bench_table_write.py [n_entries]
+"""
+
+import sys
+
+from common import ROUTE_ACTION
+from common import ROUTE_KEY
+from common import ROUTE_TABLE
+from common import make_bfrt_data
+from common import make_routes
+from common import timed
+
+from bfrt_helper.bfrt import BfRtHelper
+from bfrt_helper.bfrt_info import BfRtInfo
+from bfrt_helper.fields import Field
+from bfrt_helper.fields import IPv4Address
+from bfrt_helper.match import LongestPrefixMatch
+from bfrt_helper.pb2.bfruntime_pb2 import Update
+from bfrt_helper.wire import WireWriteBatch
+
+
+class NextHop(Field):
+    bitwidth = 16
+
+
+class Port(Field):
+    bitwidth = 9
+
+
+def make_entries(n_entries):
+    return [
+        (
+            {ROUTE_KEY: LongestPrefixMatch(IPv4Address(address), prefix)},
+            {"nexthop": NextHop(nexthop), "port": Port(port)},
+        )
+        for address, prefix, nexthop, port in make_routes(n_entries)
+    ]
+
+
+def copied_table_write(helper, entries):
+    """Builds each request the way ``create_table_write`` used to: as
+    standalone sub-messages copied into their parent with ``CopyFrom``."""
+    for key, params in entries:
+        request = helper.create_write_request("test")
+        table_entry = helper.create_table_entry(ROUTE_TABLE)
+        table_entry.key.fields.extend(helper.create_key_fields(ROUTE_TABLE, key))
+        action = helper.create_action(ROUTE_TABLE, ROUTE_ACTION, params)
+        table_entry.data.CopyFrom(action)
+        update = request.updates.add()
+        update.type = Update.Type.INSERT
+        update.entity.table_entry.CopyFrom(table_entry)
+
+
+def create_table_write(helper, entries):
+    for key, params in entries:
+        helper.create_table_write("test", ROUTE_TABLE, key, ROUTE_ACTION, params)
+
+
+def prepared_table_write(helper, entries):
+    route = helper.prepare_table_write(ROUTE_TABLE, ROUTE_ACTION)
+    for key, params in entries:
+        request = helper.create_write_request("test")
+        route(key, params, update=request.updates.add())
+
+
+def serialised_write_batch(helper, entries):
+    batch = helper.create_write_batch("test")
+    for key, params in entries:
+        batch.insert(ROUTE_TABLE, key, ROUTE_ACTION, params)
+    return [request.SerializeToString() for request, _ in batch.pop_all()]
+
+
+def wire_write_batch(helper, entries):
+    batch = WireWriteBatch(helper, "test")
+    for key, params in entries:
+        batch.insert(ROUTE_TABLE, key, ROUTE_ACTION, params)
+    return [request for request, _ in batch.pop_all()]
+
+
+def report(name, n_entries, seconds):
+    print(f"{name:<24} {1e6 * seconds / n_entries:8.2f} us/entry")
+
+
+def main():
+    n_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    helper = BfRtHelper(0, 0, BfRtInfo(make_bfrt_data(500)))
+    entries = make_entries(n_entries)
+
+    benchmarks = [
+        ("CopyFrom (reference)", copied_table_write),
+        ("create_table_write", create_table_write),
+        ("prepare_table_write", prepared_table_write),
+        ("WriteBatch (serialised)", serialised_write_batch),
+        ("WireWriteBatch", wire_write_batch),
+    ]
+    for name, function in benchmarks:
+        report(name, n_entries, timed(lambda: function(helper, entries), repeat=3))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Shared helpers for the benchmarks in this directory.
+
+The benchmarks do not require a device. Where a BfRt info file is needed, a
+synthetic one of a configurable size is generated, which is shaped like the
+output of the P4 compiler.
+"""
+
+import time
+
+
+def make_key(id_, name, match_type, width):
+    return {
+        "id": id_,
+        "name": name,
+        "repeated": False,
+        "annotations": [],
+        "mandatory": True,
+        "match_type": match_type,
+        "type": {"type": "bytes", "width": width},
+    }
+
+
+def make_param(id_, name, width):
+    return {
+        "id": id_,
+        "name": name,
+        "repeated": False,
+        "mandatory": True,
+        "read_only": False,
+        "annotations": [],
+        "type": {"type": "bytes", "width": width},
+    }
+
+
+def make_action(id_, name, n_params):
+    return {
+        "id": id_,
+        "name": name,
+        "action_scope": "TableAndDefault",
+        "annotations": [],
+        "data": [make_param(i + 1, f"param_{i}", 9 + i) for i in range(n_params)],
+    }
+
+
+def make_table(index, n_keys=4, n_actions=4, n_params=3):
+    match_types = ["Exact", "Ternary", "LongestPrefixMatch"]
+    keys = [
+        make_key(i + 1, f"hdr.field_{i}", match_types[i % 3], 32)
+        for i in range(n_keys)
+    ]
+    actions = [
+        make_action(
+            0x1000000 * (index + 1) + i, f"Control.table_{index}_action_{i}", n_params
+        )
+        for i in range(n_actions)
+    ]
+    return {
+        "name": f"pipe.Control.table_{index}",
+        "id": 0x2000000 + index,
+        "table_type": "MatchAction_Direct",
+        "size": 1024,
+        "annotations": [],
+        "depends_on": [],
+        "has_const_default_action": False,
+        "key": keys,
+        "action_specs": actions,
+        "data": [],
+        "supported_operations": [],
+        "attributes": ["EntryScope"],
+    }
+
+
+ROUTE_TABLE = "pipe.Ingress.ipv4_route"
+ROUTE_KEY = "hdr.ipv4.dst_addr"
+ROUTE_ACTION = "Ingress.set_nexthop"
+
+
+def make_route_table():
+    """An IPv4 route table, keyed on an LPM destination address, with an
+    action taking a 16 bit next hop and 9 bit port."""
+    return {
+        "name": ROUTE_TABLE,
+        "id": 0x1000001,
+        "table_type": "MatchAction_Direct",
+        "size": 1 << 20,
+        "annotations": [],
+        "depends_on": [],
+        "has_const_default_action": False,
+        "key": [make_key(1, ROUTE_KEY, "LongestPrefixMatch", 32)],
+        "action_specs": [
+            {
+                "id": 0x2000001,
+                "name": ROUTE_ACTION,
+                "action_scope": "TableAndDefault",
+                "annotations": [],
+                "data": [make_param(1, "nexthop", 16), make_param(2, "port", 9)],
+            }
+        ],
+        "data": [],
+        "supported_operations": [],
+        "attributes": ["EntryScope"],
+    }
+
+
+def make_bfrt_data(n_tables=500, **kwargs):
+    """Creates the contents of a synthetic BfRt info file. The route table
+    from :py:func:`make_route_table` is always included."""
+    return {
+        "schema_version": "1.0.0",
+        "tables": [
+            make_route_table(),
+            *[make_table(i, **kwargs) for i in range(n_tables)],
+        ],
+        "learn_filters": [],
+    }
+
+
+def make_routes(n_routes):
+    """Creates ``(address, prefix, nexthop, port)`` tuples for the route
+    table."""
+    return [
+        (0x0A000000 + (i << 8), 24, i % 65536, i % 512) for i in range(n_routes)
+    ]
+
+
+def timed(function, repeat=5):
+    """Returns the best wall clock time of ``repeat`` calls, in seconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
@@ -2,6 +2,7 @@ import json
 
 from bfrt_helper.fields import StringField
 from bfrt_helper.bfrt_info import BfRtInfo
+from bfrt_helper.cache import load_bfrt_info
 
 import bfrt_helper.pb2.bfruntime_pb2 as bfruntime_pb2
 from bfrt_helper.pb2.bfruntime_pb2 import WriteRequest
@@ -15,6 +16,8 @@ from bfrt_helper.pb2.bfruntime_pb2 import (
 
 from bfrt_helper.match import Exact
 from bfrt_helper.match import LongestPrefixMatch
+from bfrt_helper.match import Optional
+from bfrt_helper.match import Range
 from bfrt_helper.match import Ternary
 from bfrt_helper.fields import Field, DevPort
 
@@ -113,6 +116,8 @@ class MismatchedMatchType(Exception):
         * :py:class:`LongestPrefixMatch`
         * :py:class:`Exact`
         * :py:class:`Ternary`
+        * :py:class:`Range`
+        * :py:class:`Optional`
 
     Args:
         field_name (str): The name of the field in question.
@@ -155,6 +160,567 @@ class InvalidActionParameter(Exception):
         super().__init__(msg)
 
 
+class UnknownDataField(Exception):
+    """Exception raised when a data field for a given table could not be found.
+
+    Args:
+        table_name (str): String containing the name of the table.
+        field_name (str): String containing the name of the data field.
+    """
+
+    def __init__(self, table_name: str, field_name: str):
+        super().__init__(f"Could not find data field {table_name}::{field_name}")
+
+
+def set_exact_key_field(bfrt_key_field, data):
+    """Sets the value of an exact ``KeyField`` message from an :py:class:`Exact`
+    match."""
+    bfrt_key_field.exact.value = data.value_bytes()
+
+
+def set_lpm_key_field(bfrt_key_field, data):
+    """Sets the value of an LPM ``KeyField`` message from a
+    :py:class:`LongestPrefixMatch`."""
+    bfrt_key_field.lpm.value = data.value_bytes()
+    bfrt_key_field.lpm.prefix_len = data.prefix
+
+
+def set_ternary_key_field(bfrt_key_field, data):
+    """Sets the value of a ternary ``KeyField`` message from a
+    :py:class:`Ternary` match."""
+    bfrt_key_field.ternary.value = data.value_bytes()
+    bfrt_key_field.ternary.mask = data.mask_bytes()
+
+
+def set_range_key_field(bfrt_key_field, data):
+    """Sets the bounds of a range ``KeyField`` message from a :py:class:`Range`
+    match."""
+    bfrt_key_field.range.low = data.low_bytes()
+    bfrt_key_field.range.high = data.high_bytes()
+
+
+def set_optional_key_field(bfrt_key_field, data):
+    """Sets the value of an optional ``KeyField`` message from an
+    :py:class:`Optional` match."""
+    bfrt_key_field.optional.value = data.value_bytes()
+    bfrt_key_field.optional.is_valid = data.is_valid
+
+
+KEY_FIELD_ENCODERS = {
+    "Exact": (Exact, set_exact_key_field),
+    "LongestPrefixMatch": (LongestPrefixMatch, set_lpm_key_field),
+    "Ternary": (Ternary, set_ternary_key_field),
+    "Range": (Range, set_range_key_field),
+    "Optional": (Optional, set_optional_key_field),
+}
+"""Maps a BfRt info key field match type to the :py:mod:`bfrt_helper.match`
+class expected for it, and the function which sets the ``KeyField`` message
+from an instance of it. Key fields with match types not listed here are sent
+with only their field ID."""
+
+
+def data_field_bitwidth(info_field):
+    """Retrieves the bitwidth a :py:class:`Field` must have to be used as the
+    value of an action parameter or data field.
+
+    Returns:
+        int: The bitwidth, or ``None`` if the type is not checked.
+    """
+    type_ = info_field.type or {}
+    if type_.get("type") == "bytes":
+        return type_.get("width")
+    elif type_.get("type") == "uint16":
+        return 16
+    elif type_.get("type") == "uint32":
+        return 32
+    return None
+
+
+class PreparedTableWrite:
+    """A match-action table write with all lookups performed up front.
+
+    Creating a request with :py:meth:`BfRtHelper.create_table_write` looks up
+    the table, every key field, the action and every action parameter for each
+    and every entry. When writing many entries to the same table with the same
+    action, this can be done once, leaving only the encoding of each entry's
+    values.
+
+    Instances are created with :py:meth:`BfRtHelper.prepare_table_write`, and
+    are called with the key and action parameters of each entry, using the
+    same arguments as :py:meth:`BfRtHelper.create_table_write`::
+
+        forward = bfrt_helper.prepare_table_write(
+            "pipe.PortForward.destination_port", "PortForward.forward"
+        )
+        request = bfrt_helper.create_write_request("forwarder")
+        for ingress_port, egress_port in ports:
+            forward(
+                {"ig_intr_md.ingress_port": Exact(PortId(ingress_port))},
+                {"egress_port": PortId(egress_port)},
+                update=request.updates.add(),
+            )
+
+    Args:
+        helper (BfRtHelper): The helper for the program.
+        table_name (str): Name of table within the program.
+        action_name (str, optional): Name of the action to execute on a match.
+        update_type (Update.Type): The default type of operation.
+
+    Raises:
+        UnknownTable: If the table does not exist.
+        UnknownAction: If the table has no such action.
+    """
+
+    def __init__(
+        self, helper, table_name, action_name=None, update_type=Update.Type.INSERT
+    ):
+        self.helper = helper
+        self.table_name = table_name
+        self.action_name = action_name
+        self.update_type = update_type
+
+        bfrt_info = helper.bfrt_info
+        table = bfrt_info.get_table(table_name)
+        if table is None:
+            raise UnknownTable(table_name)
+        self.table_id = table.id
+
+        self.key_fields = {}
+        for info_key_field in table.key:
+            if info_key_field.name in self.key_fields:
+                continue
+            encoder = KEY_FIELD_ENCODERS.get(info_key_field.match_type)
+            self.key_fields[info_key_field.name] = (
+                info_key_field.id,
+                info_key_field.match_type,
+                encoder,
+            )
+
+        self.action_id = None
+        self.action_params = {}
+        if action_name is not None:
+            info_action = bfrt_info.get_action_spec(table_name, action_name)
+            if info_action is None:
+                raise UnknownAction(table_name, action_name)
+            self.action_id = info_action.id
+            for info_field in info_action.data or []:
+                if info_field.name in self.action_params:
+                    continue
+                self.action_params[info_field.name] = (
+                    info_field,
+                    data_field_bitwidth(info_field),
+                )
+
+    def set_key(self, bfrt_table_entry, key):
+        """Adds the key fields of an entry to a ``TableEntry`` message.
+
+        Raises:
+            UnknownKeyField: If a key field does not exist in the table.
+            MismatchedMatchType: If a key field's match is of the wrong type.
+        """
+        key_fields = self.key_fields
+        bfrt_fields = bfrt_table_entry.key.fields
+        for field_name, data in key.items():
+            try:
+                field_id, match_type, encoder = key_fields[field_name]
+            except KeyError:
+                raise UnknownKeyField(self.table_name, field_name)
+            bfrt_key_field = bfrt_fields.add()
+            bfrt_key_field.field_id = field_id
+            if encoder is not None:
+                match_cls, set_key_field = encoder
+                if data.__class__ is not match_cls and not isinstance(data, match_cls):
+                    raise MismatchedMatchType(field_name, data, match_type)
+                set_key_field(bfrt_key_field, data)
+
+    def set_action(self, bfrt_table_entry, action_params):
+        """Sets the action and it's parameters on a ``TableEntry`` message.
+
+        Raises:
+            UnknownActionParameter: If a parameter does not exist.
+            InvalidActionParameter: If a parameter's value has the wrong size.
+        """
+        bfrt_table_data = bfrt_table_entry.data
+        bfrt_table_data.action_id = self.action_id
+        if action_params is None:
+            return
+        for param_name, param_data in action_params.items():
+            try:
+                info_field, bitwidth = self.action_params[param_name]
+            except KeyError:
+                raise UnknownActionParameter(
+                    self.table_name, self.action_name, param_name
+                )
+            if isinstance(param_data, Field):
+                if bitwidth is not None and param_data.bitwidth != bitwidth:
+                    raise InvalidActionParameter(
+                        self.table_name,
+                        self.action_name,
+                        param_name,
+                        str(MismatchedDataSize(bitwidth, param_data.bitwidth)),
+                    )
+                bfrt_data_field = bfrt_table_data.fields.add()
+                bfrt_data_field.field_id = info_field.id
+                bfrt_data_field.stream = param_data.to_bytes()
+                continue
+            try:
+                self.helper.set_data_field(
+                    bfrt_table_data.fields.add(), info_field, param_data
+                )
+            except MismatchedDataSize as err:
+                raise InvalidActionParameter(
+                    self.table_name, self.action_name, param_name, str(err)
+                )
+
+    def __call__(
+        self, key, action_params=None, update_type=None, update=None, handle_id=None
+    ):
+        """Creates the ``Update`` for a single entry.
+
+        Args:
+            key (dict): Dictionary of match field names to their match. Not
+                used if ``handle_id`` is given.
+            action_params (dict, optional): Dictionary of parameter names to
+                their values.
+            update_type (Update.Type, optional): Overrides the type of
+                operation given when prepared.
+            update (Update, optional): An existing message to fill in, e.g. one
+                added to a request with ``request.updates.add()``. If not
+                given, a new message is created.
+            handle_id (int, optional): Handle of an existing entry, to
+                modify or delete it by it's handle rather than it's key. See
+                :py:class:`HandleCache`.
+
+        Returns:
+            bfruntime_pb2.Update
+        """
+        if update is None:
+            update = bfruntime_pb2.Update()
+        update.type = self.update_type if update_type is None else update_type
+        bfrt_table_entry = update.entity.table_entry
+        bfrt_table_entry.table_id = self.table_id
+        if handle_id is not None:
+            bfrt_table_entry.handle_id = handle_id
+        else:
+            self.set_key(bfrt_table_entry, key)
+        if self.action_id is not None:
+            self.set_action(bfrt_table_entry, action_params)
+        return update
+
+
+DEFAULT_MAX_REQUEST_BYTES = 4 * 1024 * 1024 - 4 * 1024
+"""Default limit on the encoded size of a request created by a
+:py:class:`WriteBatch`. This is gRPC's default maximum message size of 4 MiB,
+less some headroom."""
+
+
+def varint_size(value):
+    """Number of bytes needed to encode an unsigned integer as a protobuf
+    varint."""
+    size = 1
+    while value >= 0x80:
+        value >>= 7
+        size += 1
+    return size
+
+
+class WriteBatch:
+    """Accumulates many updates into as few write requests as possible.
+
+    The helper's ``create_*`` methods produce a request containing exactly one
+    update, meaning one gRPC round trip per entry. A batch instead collects
+    inserts, modifications and deletions, across any number of tables, into
+    requests which are sent with :py:meth:`BfRtConnection.write_batch`.
+
+    How the device treats errors partway through a request is controlled by
+    ``atomicity``, see :py:meth:`BfRtHelper.create_write_request`.
+
+    Lookups for match-action entries are cached per table and action, see
+    :py:class:`PreparedTableWrite`.
+
+    Example::
+
+        batch = bfrt_helper.create_write_batch("forwarder")
+        for ingress_port, egress_port in ports:
+            batch.insert(
+                "pipe.PortForward.destination_port",
+                key={"ig_intr_md.ingress_port": Exact(PortId(ingress_port))},
+                action_name="PortForward.forward",
+                action_params={"egress_port": PortId(egress_port)},
+            )
+        batch.delete(
+            "pipe.PortForward.destination_port",
+            key={"ig_intr_md.ingress_port": Exact(PortId(0))},
+        )
+        for request in batch.requests:
+            client.Write(request)
+
+    **Splitting**
+
+    Requests are limited both by gRPC's maximum message size, and by how many
+    updates the device will process in one request. As updates are added, the
+    encoded size of the request is tracked, and once adding an update would
+    exceed ``max_bytes`` or ``max_updates``, a new request is started. Updates
+    remain in the order they were added.
+
+    Every update added is numbered, starting at zero, and :py:attr:`ranges`
+    holds the numbers contained by each request in :py:attr:`requests`. This
+    can be used to map a failed request back to the entries it contained.
+
+    Note that atomicity only applies within a request, not across requests
+    created by splitting a batch.
+
+    When loading very large numbers of entries, completed requests can be
+    taken out of the batch with :py:meth:`pop_full` as it is filled, rather
+    than holding all of them in memory.
+
+    Args:
+        helper (BfRtHelper): The helper for the program.
+        program_name (str): Name of program to target.
+        atomicity (WriteRequest.Atomicity): See
+            :py:meth:`BfRtHelper.create_write_request`.
+        target (dict): See :py:meth:`BfRtHelper.create_write_request`.
+        max_bytes (int, optional): Maximum encoded size of each request. A
+            single update larger than this is placed in a request of it's own.
+            Default is :py:data:`DEFAULT_MAX_REQUEST_BYTES`. ``None`` disables
+            the limit.
+        max_updates (int, optional): Maximum number of updates in each
+            request. Default is ``None``, no limit.
+    """
+
+    def __init__(
+        self,
+        helper,
+        program_name,
+        atomicity=WriteRequest.Atomicity.CONTINUE_ON_ERROR,
+        target: dict = {},
+        max_bytes=DEFAULT_MAX_REQUEST_BYTES,
+        max_updates=None,
+    ):
+        self.helper = helper
+        self.program_name = program_name
+        self.atomicity = atomicity
+        self.target = target
+        self.max_bytes = max_bytes
+        self.max_updates = max_updates
+        self.requests = []
+        self.ranges = []
+        self._count = 0
+        self._prepared = {}
+        self._new_request()
+
+    def _new_request(self):
+        """Starts a new request, which subsequent updates are added to."""
+        request = self.helper.create_write_request(
+            self.program_name, self.atomicity, self.target
+        )
+        self.requests.append(request)
+        self.ranges.append(range(self._count, self._count))
+        self._size = request.ByteSize()
+        return request
+
+    @property
+    def request(self):
+        """The request currently being added to.
+
+        If the batch has not been split, this is the only request.
+        """
+        return self.requests[-1]
+
+    def __len__(self):
+        """Number of updates in the batch."""
+        return sum(len(r) for r in self.ranges)
+
+    def _next_update(self):
+        """Adds an empty update to the current request, to be filled in and then
+        passed to :py:meth:`_added`."""
+        return self.requests[-1].updates.add()
+
+    def _discard(self):
+        """Removes an update that could not be filled in."""
+        del self.requests[-1].updates[-1]
+
+    def _added(self, update):
+        """Accounts for a filled in update, moving it to a new request if the
+        current one would exceed the limits.
+
+        Returns:
+            bfruntime_pb2.Update: The update, which may have been moved.
+        """
+        update_size = update.ByteSize()
+        # Tag, length and contents of the repeated ``updates`` field.
+        size = 1 + varint_size(update_size) + update_size
+
+        current = self.ranges[-1]
+        over_bytes = self.max_bytes is not None and self._size + size > self.max_bytes
+        over_updates = (
+            self.max_updates is not None and len(current) >= self.max_updates
+        )
+        if len(current) > 0 and (over_bytes or over_updates):
+            previous = self.requests[-1]
+            moved = self._new_request().updates.add()
+            moved.CopyFrom(update)
+            del previous.updates[-1]
+            update = moved
+            current = self.ranges[-1]
+
+        self._size += size
+        self._count += 1
+        self.ranges[-1] = range(current.start, self._count)
+        return update
+
+    def pop_full(self):
+        """Removes and returns every request that is complete, i.e., all but the
+        one currently being added to.
+
+        Returns:
+            list: ``(request, range)`` pairs, in order.
+        """
+        full = list(zip(self.requests[:-1], self.ranges[:-1]))
+        del self.requests[:-1]
+        del self.ranges[:-1]
+        return full
+
+    def pop_all(self):
+        """Removes and returns every request that contains updates, leaving the
+        batch empty. Numbering of further updates continues from where it was.
+
+        Returns:
+            list: ``(request, range)`` pairs, in order.
+        """
+        pairs = [(q, r) for q, r in zip(self.requests, self.ranges) if len(r) > 0]
+        self.requests = []
+        self.ranges = []
+        self._new_request()
+        return pairs
+
+    def prepared(self, table_name, action_name=None):
+        """Retrieves the (cached) prepared write for a table and action."""
+        writer = self._prepared.get((table_name, action_name))
+        if writer is None:
+            writer = PreparedTableWrite(self.helper, table_name, action_name)
+            self._prepared[(table_name, action_name)] = writer
+        return writer
+
+    def add_prepared(
+        self, writer, key, action_params=None, update_type=None, handle_id=None
+    ):
+        """Adds an entry using a :py:class:`PreparedTableWrite`.
+
+        Returns:
+            bfruntime_pb2.Update: The added update.
+        """
+        try:
+            update = writer(
+                key, action_params, update_type, self._next_update(), handle_id
+            )
+        except Exception:
+            self._discard()
+            raise
+        return self._added(update)
+
+    def add(
+        self,
+        table_name,
+        key,
+        action_name=None,
+        action_params=None,
+        update_type=Update.Type.INSERT,
+    ):
+        """Adds a match-action table entry update.
+
+        The arguments are the same as :py:meth:`BfRtHelper.create_table_write`.
+
+        Returns:
+            bfruntime_pb2.Update: The added update.
+        """
+        writer = self.prepared(table_name, action_name)
+        return self.add_prepared(writer, key, action_params, update_type)
+
+    def insert(self, table_name, key, action_name=None, action_params=None):
+        """Adds an INSERT of a match-action table entry. See :py:meth:`add`."""
+        return self.add(table_name, key, action_name, action_params, Update.Type.INSERT)
+
+    def modify(self, table_name, key, action_name=None, action_params=None):
+        """Adds a MODIFY of a match-action table entry. See :py:meth:`add`."""
+        return self.add(table_name, key, action_name, action_params, Update.Type.MODIFY)
+
+    def delete(self, table_name, key):
+        """Adds a DELETE of a match-action table entry. See :py:meth:`add`."""
+        return self.add(table_name, key, update_type=Update.Type.DELETE)
+
+    def modify_handle(self, table_name, handle_id, action_name=None, action_params=None):
+        """Adds a MODIFY of the match-action table entry with the given handle.
+        See :py:class:`HandleCache`."""
+        writer = self.prepared(table_name, action_name)
+        return self.add_prepared(
+            writer, None, action_params, Update.Type.MODIFY, handle_id
+        )
+
+    def delete_handle(self, table_name, handle_id):
+        """Adds a DELETE of the match-action table entry with the given handle.
+        See :py:class:`HandleCache`."""
+        writer = self.prepared(table_name)
+        return self.add_prepared(writer, None, None, Update.Type.DELETE, handle_id)
+
+    def add_data(
+        self,
+        table_name,
+        key,
+        data,
+        update_type=Update.Type.INSERT,
+        mod_inc_type=None,
+        action_name=None,
+        action_params=None,
+    ):
+        """Adds an update of an arbitrary table.
+
+        The arguments are the same as
+        :py:meth:`BfRtHelper.create_table_data_write`. If ``mod_inc_type`` is
+        given, the update is a MODIFY_INC, as for
+        :py:meth:`BfRtHelper.create_table_data_modify_inc`.
+
+        An action may also be given, for data fields of a match-action table
+        which are not action parameters, e.g. ``$ENTRY_TTL`` or direct meter
+        specs. Their values are added after the action's parameters.
+
+        Returns:
+            bfruntime_pb2.Update: The added update.
+
+        Raises:
+            UnknownDataField: If a data field does not exist in the table.
+            UnknownAction: If the table has no such action.
+        """
+        writer = self.prepared(table_name, action_name)
+        update = self._next_update()
+        try:
+            if mod_inc_type is not None:
+                update_type = Update.Type.MODIFY_INC
+            writer(key, action_params, update_type=update_type, update=update)
+            if mod_inc_type is not None:
+                self.helper.set_mod_inc(update.entity.table_entry, mod_inc_type)
+            bfrt_table_data = update.entity.table_entry.data
+            for field_name, value in data.items():
+                field = self.helper.bfrt_info.get_data_field(table_name, field_name)
+                if field is None:
+                    raise UnknownDataField(table_name, field_name)
+                self.helper.set_data_field(
+                    bfrt_table_data.fields.add(), field.singleton, value
+                )
+        except Exception:
+            self._discard()
+            raise
+        return self._added(update)
+
+
+DEFAULT_PIPE_SCOPE = (0, 1, 2, 3)
+"""Default pipes a pushed program's profile is loaded to; all four pipes of a
+device."""
+
+DEFAULT_BASE_PATH = "install/share/tofinopd/"
+"""Default directory the device stores pushed programs in."""
+
+
 class BfRtHelper:
     """Barefoot Runtime gRPC Helper Class"""
 
@@ -192,20 +758,17 @@ class BfRtHelper:
 
         """
 
-        subscribe = bfruntime_pb2.Subscribe()
+        request = bfruntime_pb2.StreamMessageRequest()
+        request.client_id = self.client_id
+
+        subscribe = request.subscribe
         subscribe.device_id = self.device_id
 
-        notifications = bfruntime_pb2.Subscribe.Notifications()
+        notifications = subscribe.notifications
         notifications.enable_learn_notifications = learn
         notifications.enable_idletimeout_notifications = timeout
         notifications.enable_port_status_change_notifications = port_change
 
-        subscribe.notifications.CopyFrom(notifications)
-
-        request = bfruntime_pb2.StreamMessageRequest()
-        request.client_id = self.client_id
-        request.subscribe.CopyFrom(subscribe)
-
         return request
 
     def create_write_request(
@@ -263,14 +826,7 @@ class BfRtHelper:
         request.client_id = self.client_id
         request.p4_name = program_name
         request.atomicity = atomicity
-
-        device = bfruntime_pb2.TargetDevice()
-        device.device_id = self.device_id
-        device.pipe_id = target.get("pipe_id", 0xFFFF)
-        device.direction = target.get("direction", 0xFF)
-        device.prsr_id = target.get("prsr_id", 0xFF)
-
-        request.target.CopyFrom(device)
+        self.set_target_device(request.target, target)
 
         return request
 
@@ -279,16 +835,24 @@ class BfRtHelper:
         request.client_id = self.client_id
         request.p4_name = program_name
         # request.atomicity = atomicity
+        self.set_target_device(request.target)
 
-        target = bfruntime_pb2.TargetDevice()
-        target.device_id = self.device_id
-        target.pipe_id = 0xFFFF
-        target.direction = 0xFF
-        target.prsr_id = 0xFF
+        return request
 
-        request.target.CopyFrom(target)
+    def set_target_device(self, device, target: dict = {}):
+        """Fills in the ``TargetDevice`` message of a request.
 
-        return request
+        Args:
+
+            device (bfruntime_pb2.TargetDevice): The message to fill in, e.g.
+                ``request.target``.
+
+            target (dict): See :py:meth:`create_write_request`.
+        """
+        device.device_id = self.device_id
+        device.pipe_id = target.get("pipe_id", 0xFFFF)
+        device.direction = target.get("direction", 0xFF)
+        device.prsr_id = target.get("prsr_id", 0xFF)
 
     def create_table_entry(self, table_name: str):
         """Generates empty table message
@@ -305,14 +869,24 @@ class BfRtHelper:
             bfruntime_pb2.TableEntry
 
         """
+        table_entry = bfruntime_pb2.TableEntry()
+        self.set_table_entry(table_entry, table_name)
+
+        return table_entry
+
+    def set_table_entry(self, table_entry, table_name: str):
+        """Sets the table of a ``TableEntry`` message, e.g. one accessed
+        through ``update.entity.table_entry``.
+
+        Raises:
+
+            UnknownTable: If the table does not exist.
+        """
         table_id = self.bfrt_info.get_table_id(table_name)
         if table_id is None:
             raise UnknownTable(table_name)
-        table_entry = bfruntime_pb2.TableEntry()
         table_entry.table_id = table_id
 
-        return table_entry
-
     def create_key_field(self, table_name: str, field_name: str, data: Field):
         """Generates key field component of a gRPC message
 
@@ -342,33 +916,46 @@ class BfRtHelper:
                 match the match type defined for the field actually present in
                 the table.
         """
-        info_key_field = self.bfrt_info.get_key(table_name, field_name)
-        if info_key_field is None:
-            raise UnknownKeyField(table_name, field_name)
         bfrt_key_field = bfruntime_pb2.KeyField()
-        bfrt_key_field.field_id = info_key_field.id
+        self.set_key_field(bfrt_key_field, table_name, field_name, data)
 
-        if info_key_field.match_type == "Exact":
-            if not isinstance(data, Exact):
-                raise MismatchedMatchType(field_name, data, "Exact")
-            bfrt_key_field.exact.value = data.value_bytes()
+        return bfrt_key_field
 
-        if info_key_field.match_type == "LongestPrefixMatch":
-            if not isinstance(data, LongestPrefixMatch):
-                raise MismatchedMatchType(field_name, data, "LongestPrefixMatch")
-            bfrt_key_field.lpm.value = data.value_bytes()
-            bfrt_key_field.lpm.prefix_len = data.prefix
+    def set_key_field(self, bfrt_key_field, table_name, field_name, data):
+        """Fills in a ``KeyField`` message, e.g. one added to a table entry with
+        ``table_entry.key.fields.add()``.
 
-        if info_key_field.match_type == "Ternary":
-            if not isinstance(data, Ternary):
-                raise MismatchedMatchType(field_name, data, "Ternary")
-            bfrt_key_field.ternary.value = data.value_bytes()
-            bfrt_key_field.ternary.mask = data.mask_bytes()
+        See :py:meth:`create_key_field` for arguments and exceptions raised.
+        """
+        info_key_field = self.bfrt_info.get_key(table_name, field_name)
+        if info_key_field is None:
+            raise UnknownKeyField(table_name, field_name)
+        bfrt_key_field.field_id = info_key_field.id
 
-        return bfrt_key_field
+        encoder = KEY_FIELD_ENCODERS.get(info_key_field.match_type)
+        if encoder is not None:
+            match_cls, set_key_field = encoder
+            if not isinstance(data, match_cls):
+                raise MismatchedMatchType(field_name, data, info_key_field.match_type)
+            set_key_field(bfrt_key_field, data)
 
     def create_data_field(self, field, value):
         data_field = bfruntime_pb2.DataField()
+        self.set_data_field(data_field, field, value)
+        return data_field
+
+    def set_data_field(self, data_field, field, value):
+        """Fills in a ``DataField`` message, e.g. one added to table data with
+        ``table_data.fields.add()``.
+
+        Args:
+            data_field (bfruntime_pb2.DataField): The message to fill in.
+            field: The BfRt info field (action parameter or data field
+                singleton) the value is for.
+            value: The value of the field. Lists of ``int``, ``bool`` or
+                ``str`` are set as arrays. A list of containers is given as a
+                list of lists of ``DataField`` messages.
+        """
         data_field.field_id = field.id
 
         if isinstance(value, Field) or isinstance(value, bytes):
@@ -396,16 +983,21 @@ class BfRtHelper:
         elif isinstance(value, list):
             if len(value) > 0:
                 inner_value = value[0]
-                if isinstance(inner_value, int):
+                # ``bool`` is a subclass of ``int``, so is checked first.
+                if isinstance(inner_value, bool):
+                    data_field.bool_arr_val.val.extend(value)
+                elif isinstance(inner_value, int):
                     data_field.int_arr_val.val.extend(value)
-                elif isinstance(inner_value, bool):
-                    data_field.bool_arr_value.val.extend(value)
+                elif isinstance(inner_value, str):
+                    data_field.str_arr_val.val.extend(value)
                 else:
-                    data = [self.create_data_field(x) for x in value]
-                    data_field.container_arr_value.val.extend(data)
+                    # Containers, each given as a list of ``DataField``
+                    # messages for the container's fields.
+                    containers = data_field.container_arr_val.container
+                    for container_fields in value:
+                        containers.add().val.extend(container_fields)
         else:
             raise Exception("Unknown data type!")
-        return data_field
 
     def create_key_fields(self, table_name, key_fields):
         """Create the key fields gRPC message component"""
@@ -416,12 +1008,29 @@ class BfRtHelper:
 
         return fields
 
+    def set_key_fields(self, bfrt_key, table_name, key_fields):
+        """Adds key fields to a ``TableKey`` message, e.g.
+        ``table_entry.key``.
+
+        The key is marked as present even if there are no fields to add.
+        """
+        bfrt_key.SetInParent()
+        for field_name, field_data in key_fields.items():
+            self.set_key_field(bfrt_key.fields.add(), table_name, field_name, field_data)
+
     def create_action(self, table_name, action_name, action_params):
+        bfrt_table_data = bfruntime_pb2.TableData()
+        self.set_action(bfrt_table_data, table_name, action_name, action_params)
+
+        return bfrt_table_data
+
+    def set_action(self, bfrt_table_data, table_name, action_name, action_params):
+        """Fills in a ``TableData`` message with an action and it's parameters,
+        e.g. ``table_entry.data``."""
         info_action = self.bfrt_info.get_action_spec(table_name, action_name)
         if info_action is None:
             raise UnknownAction(table_name, action_name)
 
-        bfrt_table_data = bfruntime_pb2.TableData()
         bfrt_table_data.action_id = info_action.id
 
         if action_params is not None:
@@ -434,17 +1043,14 @@ class BfRtHelper:
                     raise UnknownActionParameter(table_name, action_name, param_name)
 
                 try:
-                    bfrt_data_field = self.create_data_field(
-                        info_action_field, param_data
+                    self.set_data_field(
+                        bfrt_table_data.fields.add(), info_action_field, param_data
                     )
-                    bfrt_table_data.fields.extend([bfrt_data_field])
                 except MismatchedDataSize as err:
                     raise InvalidActionParameter(
                         table_name, action_name, param_name, str(err)
                     )
 
-        return bfrt_table_data
-
     def create_table_write(
         self,
         program_name,
@@ -485,20 +1091,160 @@ class BfRtHelper:
 
         """
         bfrt_request = self.create_write_request(program_name)
-        bfrt_table_entry = self.create_table_entry(table_name)
-        bfrt_key_fields = self.create_key_fields(table_name, key)
-        bfrt_table_entry.key.fields.extend(bfrt_key_fields)
-
-        if action_name is not None:
-            bfrt_action = self.create_action(table_name, action_name, action_params)
-            bfrt_table_entry.data.CopyFrom(bfrt_action)
-
         bfrt_update = bfrt_request.updates.add()
         bfrt_update.type = update_type
-        bfrt_update.entity.table_entry.CopyFrom(bfrt_table_entry)
+
+        bfrt_table_entry = bfrt_update.entity.table_entry
+        self.set_table_entry(bfrt_table_entry, table_name)
+        self.set_key_fields(bfrt_table_entry.key, table_name, key)
+
+        if action_name is not None:
+            self.set_action(
+                bfrt_table_entry.data, table_name, action_name, action_params
+            )
 
         return bfrt_request
 
+    def prepare_table_write(
+        self, table_name, action_name=None, update_type=Update.Type.INSERT
+    ):
+        """Prepares writes of many entries to a match-action table.
+
+        All IDs are looked up, and the key field match types and action
+        parameter sizes resolved, once. See :py:class:`PreparedTableWrite`.
+
+        Args:
+            table_name (str): Name of table within the program.
+
+            action_name (str): Name of the action to execute on a match.
+
+            update_type (Update.Type): The type of operation to take place,
+                e.g., INSERT, MODIFY, DELETE. The default value of ``1``
+                corresponds to Update.Type.INSERT.
+
+        Returns:
+
+            PreparedTableWrite
+        """
+        return PreparedTableWrite(self, table_name, action_name, update_type)
+
+    def create_write_batch(
+        self,
+        program_name: str,
+        atomicity=WriteRequest.Atomicity.CONTINUE_ON_ERROR,
+        target: dict = {},
+        max_bytes=DEFAULT_MAX_REQUEST_BYTES,
+        max_updates=None,
+    ):
+        """Creates a batch for writing many updates in as few requests as
+        possible.
+
+        See :py:class:`WriteBatch`.
+
+        Args:
+
+            program_name (str): The name of the program to target.
+
+            atomicity (WriteRequest.Atomicity): See
+                :py:meth:`create_write_request`.
+
+            target (dict): See :py:meth:`create_write_request`.
+
+            max_bytes (int): Maximum encoded size of each request.
+
+            max_updates (int): Maximum number of updates in each request.
+
+        Returns:
+
+            WriteBatch
+        """
+        return WriteBatch(
+            self, program_name, atomicity, target, max_bytes, max_updates
+        )
+
+    def prepare_column_write(
+        self, table_name, action_name=None, update_type=Update.Type.INSERT
+    ):
+        """Prepares writes of columns of entries to a match-action table.
+
+        See :py:class:`ColumnTableWrite`. Requires NumPy.
+
+        Args:
+            table_name (str): Name of table within the program.
+
+            action_name (str): Name of the action to execute on a match.
+
+            update_type (Update.Type): The type of operation to take place.
+
+        Returns:
+
+            ColumnTableWrite
+        """
+        from bfrt_helper.columns import ColumnTableWrite
+
+        prepared = PreparedTableWrite(self, table_name, action_name, update_type)
+        return ColumnTableWrite(prepared)
+
+    def create_column_write(
+        self,
+        program_name: str,
+        table_name,
+        key,
+        action_name=None,
+        action_params=None,
+        update_type=Update.Type.INSERT,
+        atomicity=WriteRequest.Atomicity.CONTINUE_ON_ERROR,
+        target: dict = {},
+        max_bytes=DEFAULT_MAX_REQUEST_BYTES,
+        max_updates=None,
+    ):
+        """Creates batched writes of columns of entries to a match-action
+        table.
+
+        Rather than a :py:class:`Match` per entry, each key field and action
+        parameter is given as a column of values, e.g. a NumPy array, which
+        are validated and encoded a column at a time. See
+        :py:mod:`bfrt_helper.columns` for the form of each column. Requires
+        NumPy.
+
+        Args:
+            program_name (str): Name of program to target.
+
+            table_name (str): Name of table within the program.
+
+            key (dict): Dictionary of key field names to their column.
+
+            action_name (str): Name of the action to execute on a match.
+
+            action_params (dict): Dictionary of parameter names to their
+                column.
+
+            update_type (Update.Type): The type of operation to take place.
+
+            atomicity (WriteRequest.Atomicity): See
+                :py:meth:`create_write_request`.
+
+            target (dict): See :py:meth:`create_write_request`.
+
+            max_bytes (int): Maximum encoded size of each request.
+
+            max_updates (int): Maximum number of updates in each request.
+
+        Returns:
+
+            WireWriteBatch: The serialised requests, to be written with
+            :py:meth:`BfRtConnection.write_batch`.
+        """
+        from bfrt_helper.wire import WireWriteBatch
+
+        writer = self.prepare_column_write(table_name, action_name, update_type)
+        batch = WireWriteBatch(
+            self, program_name, atomicity, target, max_bytes, max_updates
+        )
+        for update in writer(key, action_params):
+            batch.add_encoded(update)
+        return batch
+
     def create_table_data_write(
         self,
         program_name: str,
@@ -543,32 +1289,204 @@ class BfRtHelper:
                 corresponds to Update.Type.INSERT.
         """
         bfrt_request = self.create_write_request(program_name)
-        bfrt_table_entry = self.create_table_entry(table_name)
-        bfrt_key_fields = self.create_key_fields(table_name, key)
-        bfrt_table_entry.key.fields.extend(bfrt_key_fields)
+        bfrt_update = bfrt_request.updates.add()
+        bfrt_update.type = update_type
 
-        bfrt_table_data = bfruntime_pb2.TableData()
+        bfrt_table_entry = bfrt_update.entity.table_entry
+        self.set_table_entry(bfrt_table_entry, table_name)
+        self.set_key_fields(bfrt_table_entry.key, table_name, key)
+
+        bfrt_table_data = bfrt_table_entry.data
+        # Data is always present, even when there are no fields to write.
+        bfrt_table_data.SetInParent()
         for field_name, value in data.items():
             field = self.bfrt_info.get_data_field(table_name, field_name)
-            bfrt_data_field = self.create_data_field(field.singleton, value)
-            bfrt_table_data.fields.extend([bfrt_data_field])
+            self.set_data_field(bfrt_table_data.fields.add(), field.singleton, value)
 
-        bfrt_table_entry.data.CopyFrom(bfrt_table_data)
+        return bfrt_request
 
-        bfrt_update = bfrt_request.updates.add()
-        bfrt_update.type = update_type
-        bfrt_update.entity.table_entry.CopyFrom(bfrt_table_entry)
+    def create_table_data_modify_inc(
+        self,
+        program_name: str,
+        table_name,
+        key,
+        data,
+        mod_inc_type=bfruntime_pb2.TableModIncFlag.Type.MOD_INC_ADD,
+    ):
+        """Creates an incremental update of the list valued data fields of an
+        entry, e.g. the nodes of a multicast group or the members of an action
+        selector group.
+
+        Rather than rewriting each list in full, as a MODIFY would, the values
+        given are added to, or deleted from, the entry's lists with a
+        MODIFY_INC update.
+
+        Example:
+            Adding a node to a multicast group::
+
+                request = bfrt_helper.create_table_data_modify_inc(
+                    "forwarder",
+                    "$pre.mgid",
+                    {"$MGID": Exact(MulticastGroupId(1))},
+                    {
+                        "$MULTICAST_NODE_ID": [42],
+                        "$MULTICAST_NODE_L1_XID_VALID": [False],
+                        "$MULTICAST_NODE_L1_XID": [0],
+                    },
+                )
+
+        Args:
+            program_name (str): Name of program to target.
+            table_name (str): Name of table within the program.
+            key (dict): Key fields of the entry.
+            data (dict): Data field names to the list of values to add or
+                delete. See :py:meth:`set_data_field`.
+            mod_inc_type (TableModIncFlag.Type): ``MOD_INC_ADD`` to add the
+                values, or ``MOD_INC_DELETE`` to delete them.
+
+        Returns:
+            bfruntime_pb2.WriteRequest
+
+        Raises:
+            UnknownDataField: If a data field does not exist in the table.
+        """
+        for field_name in data:
+            if self.bfrt_info.get_data_field(table_name, field_name) is None:
+                raise UnknownDataField(table_name, field_name)
+        bfrt_request = self.create_table_data_write(
+            program_name, table_name, key, data, bfruntime_pb2.Update.Type.MODIFY_INC
+        )
+        self.set_mod_inc(bfrt_request.updates[0].entity.table_entry, mod_inc_type)
 
         return bfrt_request
 
-    def create_table_read(self, program_name, table_name, key):
+    def set_mod_inc(self, table_entry, mod_inc_type):
+        """Sets whether a MODIFY_INC update of a ``TableEntry`` adds or deletes
+        it's values.
+
+        Args:
+            table_entry (bfruntime_pb2.TableEntry): The message to fill in.
+            mod_inc_type (TableModIncFlag.Type): ``MOD_INC_ADD`` or
+                ``MOD_INC_DELETE``.
+        """
+        # ``MOD_INC_ADD`` is zero, so the flag is marked as present.
+        table_entry.table_mod_inc_flag.SetInParent()
+        table_entry.table_mod_inc_flag.type = mod_inc_type
+
+    def create_table_read(self, program_name, table_name, key=None, from_hw=None):
+        """Creates a read of a match-action table's entries.
+
+        If no key is given, this is a wildcard read of every entry in the
+        table. Further tables or entries can be read with the same request by
+        adding entities with :py:meth:`set_table_read`.
+
+        Args:
+            program_name (str): Name of program to target.
+            table_name (str): Name of table within the program.
+            key (dict, optional): Key fields of the entry to read, as for
+                :py:meth:`create_table_write`.
+            from_hw (bool, optional): See :py:meth:`set_table_read`.
+
+        Returns:
+            bfruntime_pb2.ReadRequest
+        """
         bfrt_request = self.create_read_request(program_name)
-        bfrt_table_entry = self.create_table_entry(table_name)
-        bfrt_key_fields = self.create_key_fields(table_name, key)
+        self.set_table_read(
+            bfrt_request.entities.add().table_entry, table_name, key, from_hw
+        )
 
-        bfrt_table_entry.key.fields.extend(bfrt_key_fields)
-        update = bfrt_request.entities.add()
-        update.table_entry.CopyFrom(bfrt_table_entry)
+        return bfrt_request
+
+    def set_table_read(self, table_entry, table_name, key=None, from_hw=None):
+        """Fills in the ``TableEntry`` message of a read request entity, e.g.
+        ``request.entities.add().table_entry``.
+
+        Counters, registers and other values updated by the data plane can be
+        read either from the hardware, or from the driver's software shadow of
+        it, which is much faster but may be out of date. If ``from_hw`` is not
+        given, this is left to the server's default.
+
+        Args:
+            table_entry (bfruntime_pb2.TableEntry): The message to fill in.
+            table_name (str): Name of table within the program.
+            key (dict, optional): Key fields of the entry to read. If not
+                given, every entry is read.
+            from_hw (bool, optional): Whether to read from the hardware,
+                rather than the software shadow.
+
+        Raises:
+            UnknownTable: If the table does not exist.
+        """
+        self.set_table_entry(table_entry, table_name)
+        if key is not None:
+            self.set_key_fields(table_entry.key, table_name, key)
+        if from_hw is not None:
+            table_entry.table_flags.from_hw = from_hw
+
+    def create_handle_read(self, program_name, table_name, keys):
+        """Creates a read of the handles of a table's entries, by key.
+
+        The response holds a ``HandleId`` entity for each key, in the same
+        order as the keys.
+
+        Args:
+            program_name (str): Name of program to target.
+            table_name (str): Name of table within the program.
+            keys (list): Key of each entry, as for :py:meth:`create_table_write`.
+
+        Returns:
+            bfruntime_pb2.ReadRequest
+
+        Raises:
+            UnknownTable: If the table does not exist.
+        """
+        bfrt_request = self.create_read_request(program_name)
+        for key in keys:
+            self.set_handle_read(bfrt_request.entities.add().handle, table_name, key)
+
+        return bfrt_request
+
+    def set_handle_read(self, handle, table_name, key):
+        """Fills in the ``HandleId`` message of a read request entity, e.g.
+        ``request.entities.add().handle``, to read the handle of an entry.
+
+        Raises:
+            UnknownTable: If the table does not exist.
+        """
+        table_id = self.bfrt_info.get_table_id(table_name)
+        if table_id is None:
+            raise UnknownTable(table_name)
+        handle.table_id = table_id
+        self.set_key_fields(handle.key, table_name, key)
+
+    def create_table_operation(self, program_name, table_name, operation):
+        """Creates a request to execute an operation on a whole table.
+
+        Operations include ``"SyncCounters"`` and ``"SyncRegisters"``, which
+        update the driver's software shadow of a table's counters or
+        registers from the hardware, so that they can then be read from it,
+        and ``"UpdateHitState"`` for idle timeouts.
+
+        Args:
+            program_name (str): Name of program to target.
+            table_name (str): Name of table within the program.
+            operation (str): Name of the operation.
+
+        Returns:
+            bfruntime_pb2.WriteRequest
+
+        Raises:
+            UnknownTable: If the table does not exist.
+        """
+        table_id = self.bfrt_info.get_table_id(table_name)
+        if table_id is None:
+            raise UnknownTable(table_name)
+        bfrt_request = self.create_write_request(program_name)
+        bfrt_update = bfrt_request.updates.add()
+        bfrt_update.type = bfruntime_pb2.Update.Type.INSERT
+        bfrt_table_operation = bfrt_update.entity.table_operation
+        bfrt_table_operation.table_id = table_id
+        bfrt_table_operation.table_operations_type = operation
 
         return bfrt_request
 
@@ -580,45 +1498,68 @@ class BfRtHelper:
             Experimental.
         """
         bfrt_request = self.create_write_request(program_name)
-        bfrt_table_entry = self.create_table_entry("$pre.port")
-        bfrt_key_field = self.create_key_field("$pre.port", "$DEV_PORT",
-                                               Exact(DevPort(port)))
-        bfrt_table_entry.key.fields.extend([bfrt_key_field])
+        bfrt_update = bfrt_request.updates.add()
+        bfrt_update.type = bfruntime_pb2.Update.Type.MODIFY
+
+        bfrt_table_entry = bfrt_update.entity.table_entry
+        self.set_table_entry(bfrt_table_entry, "$pre.port")
+        self.set_key_field(bfrt_table_entry.key.fields.add(), "$pre.port",
+                           "$DEV_PORT", Exact(DevPort(port)))
 
         info_cpu_port_field = self.bfrt_info.get_data_field(
             "$pre.port", "$COPY_TO_CPU_PORT_ENABLE"
         )
-        bfrt_cpu_port_field = self.create_data_field(
-            info_cpu_port_field.singleton, True
+        self.set_data_field(
+            bfrt_table_entry.data.fields.add(), info_cpu_port_field.singleton, True
         )
-        bfrt_table_entry.data.fields.extend([bfrt_cpu_port_field])
-
-        bfrt_update = bfrt_request.updates.add()
-        bfrt_update.type = bfruntime_pb2.Update.Type.MODIFY
-        bfrt_update.entity.table_entry.CopyFrom(bfrt_table_entry)
 
         return bfrt_request
 
     def create_set_pipeline_request(
-        self, program_name, bfrt_path, context_path, binary_path
+        self,
+        program_name,
+        bfrt_path,
+        context_path,
+        binary_path,
+        pipe_scope=DEFAULT_PIPE_SCOPE,
+        action=SetPipelineReq.VERIFY_AND_WARM_INIT_BEGIN_AND_END,
     ):
+        """Creates a request to push a program with a single profile.
+
+        Every artifact is read into memory. For large or multi-profile
+        programs, see :py:mod:`bfrt_helper.pipeline`, which avoids this.
+
+        Args:
+            program_name (str): Name of the program.
+            bfrt_path (str): Path of the program's BfRt info file.
+            context_path (str): Path of the profile's ``context.json``.
+            binary_path (str): Path of the profile's ``tofino.bin``.
+            pipe_scope (list): Pipes the profile is loaded to.
+            action (SetForwardingPipelineConfigRequest.Action): What the
+                device does with the program.
 
+        Returns:
+            bfruntime_pb2.SetForwardingPipelineConfigRequest
+        """
         # Need to figure out base_path properly later
         request = bfruntime_pb2.SetForwardingPipelineConfigRequest()
         request.client_id = self.client_id
         request.device_id = self.device_id
-        request.base_path = 'install/share/tofinopd/'
-        request.action = SetPipelineReq.VERIFY_AND_WARM_INIT_BEGIN_AND_END
+        request.base_path = DEFAULT_BASE_PATH
+        request.action = action
 
         config = request.config.add()
         config.p4_name = program_name
-        config.bfruntime_info = open(bfrt_path, "rb").read()
+        with open(bfrt_path, "rb") as f:
+            config.bfruntime_info = f.read()
 
         profile = config.profiles.add()
         profile.profile_name = "pipe"
-        profile.context = open(context_path, "rb").read()
-        profile.binary = open(binary_path, "rb").read()
-        profile.pipe_scope.extend([0, 1, 2, 3])
+        with open(context_path, "rb") as f:
+            profile.context = f.read()
+        with open(binary_path, "rb") as f:
+            profile.binary = f.read()
+        profile.pipe_scope.extend(pipe_scope)
 
         return request
 
@@ -629,10 +1570,20 @@ class BfRtHelper:
         return request
 
 
-def make_bfrt_helper(host, device_id, client_id, bfrt_path):
-    """ Create a BfRtHelper instance with BfRtInfo already loaded. """
-    bfrt_data = json.loads(open(bfrt_path).read())
-    bfrt_info = BfRtInfo(bfrt_data)
+def make_bfrt_helper(
+    host, device_id, client_id, bfrt_path, lazy=False, cache_dir=None
+):
+    """ Create a BfRtHelper instance with BfRtInfo already loaded.
+
+    If ``lazy`` is set, tables are only parsed when first used. See
+    :py:class:`BfRtInfo`.
+
+    If ``cache_dir`` is set, the parsed BfRtInfo is cached on disk, keyed by a
+    hash of the file's contents. See :py:class:`BfRtInfoCache`.
+    """
+    with open(bfrt_path, "rb") as f:
+        raw = f.read()
+    bfrt_info = load_bfrt_info(raw, cache_dir=cache_dir, lazy=lazy)
     return BfRtHelper(device_id, client_id, bfrt_info)
 
 
@@ -669,25 +1620,33 @@ def make_port_map(program_name, bfrt_helper, client, ports):
     """
     request = bfrt_helper.create_read_request(program_name)
     for port in ports:
-        table_entry = bfrt_helper.create_table_entry('$PORT_STR_INFO')
-        key_field = bfrt_helper.create_key_fields(
+        table_entry = request.entities.add().table_entry
+        bfrt_helper.set_table_entry(table_entry, '$PORT_STR_INFO')
+        bfrt_helper.set_key_fields(
+            table_entry.key,
             '$PORT_STR_INFO',
             key_fields={
                 '$PORT_NAME': Exact(StringField(port))
             })
-        table_entry.key.fields.extend(key_field)
-        update = request.entities.add()
-        update.table_entry.CopyFrom(table_entry)
-
-    response = client.Read(request)
-
-    data = response.next()
 
+    bfrt_info = bfrt_helper.bfrt_info
     result = {}
-    for entity in data.entities:
-        port_name = entity.table_entry.key.fields[0].exact.value.decode('utf-8')
-        dev_port = entity.table_entry.data.fields[0].stream
-        dev_port = int.from_bytes(dev_port, byteorder='big')
-        result[port_name] = dev_port
+    entities = (
+        entity for data in client.Read(request) for entity in data.entities
+    )
+    for entity in entities:
+        table_id = entity.table_entry.table_id
+        port_name = None
+        dev_port = None
+        for key_field in entity.table_entry.key.fields:
+            info_key = bfrt_info.key_by_id(table_id, key_field.field_id)
+            if info_key is not None and info_key.name == '$PORT_NAME':
+                port_name = key_field.exact.value.decode('utf-8')
+        for data_field in entity.table_entry.data.fields:
+            info_field = bfrt_info.data_field_by_id(table_id, data_field.field_id)
+            if info_field is not None and info_field.singleton.name == '$DEV_PORT':
+                dev_port = int.from_bytes(data_field.stream, byteorder='big')
+        if port_name is not None and dev_port is not None:
+            result[port_name] = dev_port
 
     return result
@@ -4,6 +4,8 @@ used by developers. Other than the creation of the BfRtInfo object for
 consumption by the actual helper class.
 """
 
+import sys
+
 from bfrt_helper.fields import JSONSerialisable
 
 
@@ -14,10 +16,62 @@ def quoted(value):
         return value
 
 
+def intern_string(value):
+    """Interns a string, so that repeated occurrences throughout a BfRt info
+    file, e.g. match types, share the same object."""
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+def shared(value, shared_values=None):
+    """Returns a shared instance of a schema value equal to ``value``.
+
+    Type descriptions (e.g. ``{"type": "bytes", "width": 9}``) and annotation
+    lists are repeated many times throughout a BfRt info file. Equal values are
+    replaced with a single shared instance, so must be treated as read-only.
+    Values which cannot be hashed (e.g. containing a list of choices) are
+    returned unchanged.
+
+    Args:
+        value: The schema value.
+        shared_values (dict, optional): The instances shared so far, by
+            value. Only values parsed with the same dictionary are shared, so
+            it is kept only while a file is parsed, and not for the life of
+            the process. If not given, ``value`` is returned unchanged.
+    """
+    if shared_values is None:
+        return value
+    try:
+        key = (value.__class__, _freeze(value))
+        return shared_values.setdefault(key, value)
+    except TypeError:
+        return value
+
+
+def _freeze(value):
+    """Converts dictionaries and lists into a hashable equivalent."""
+    if isinstance(value, dict):
+        return tuple((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(_freeze(x) for x in value)
+    hash(value)
+    # Include the type so that e.g. ``False`` and ``0`` are not conflated.
+    return (value.__class__, value)
+
+
 class BfRtObject(JSONSerialisable):
+    """Base class of objects created from a BfRt info file.
+
+    Objects are slotted rather than storing attributes in a ``__dict__``, as
+    large programs produce a great many of them.
+    """
+
+    __slots__ = ()
+
     def __repr__(self):
         pairs = []
-        for key, value in self.__dict__.items():
+        for key, value in self._members():
             if value is not None:
                 pairs.append("{}={}".format(key, quoted(value)))
         string = ", ".join(pairs)
@@ -25,6 +79,8 @@ class BfRtObject(JSONSerialisable):
 
 
 class BfRtTable(BfRtObject):
+    __slots__ = ("id", "name", "table_type", "size", "key", "action_specs", "data")
+
     def __init__(self, id_, name: str, table_type: str, size):
         self.id = id_
         self.name = name
@@ -36,6 +92,16 @@ class BfRtTable(BfRtObject):
 
 
 class BfRtTableKey(BfRtObject):
+    __slots__ = (
+        "id",
+        "name",
+        "repeated",
+        "annotations",
+        "mandatory",
+        "match_type",
+        "type",
+    )
+
     def __init__(
         self,
         id_: int,
@@ -56,6 +122,8 @@ class BfRtTableKey(BfRtObject):
 
 
 class BfRtTableActionSpec(BfRtObject):
+    __slots__ = ("id", "name", "action_scope", "annotations", "data")
+
     def __init__(
         self, id_: int, name: str, action_scope: str, annotations: list, data: list
     ):
@@ -67,6 +135,16 @@ class BfRtTableActionSpec(BfRtObject):
 
 
 class BfRtTableActionData(BfRtObject):
+    __slots__ = (
+        "id",
+        "name",
+        "repeated",
+        "mandatory",
+        "read_only",
+        "annotations",
+        "type",
+    )
+
     def __init__(
         self,
         id_: int,
@@ -88,6 +166,8 @@ class BfRtTableActionData(BfRtObject):
 
 
 class BfRtTableDataFieldSingleton(BfRtObject):
+    __slots__ = ("id", "name", "repeated", "annotations", "type")
+
     def __init__(
         self, id_: int, name: str, repeated: bool, annotations: list, type_: dict
     ):
@@ -99,6 +179,8 @@ class BfRtTableDataFieldSingleton(BfRtObject):
 
 
 class BfRtTableDataField(BfRtObject):
+    __slots__ = ("mandatory", "read_only", "singleton")
+
     def __init__(
         self, mandatory: bool, read_only: bool, singleton: BfRtTableDataFieldSingleton
     ):
@@ -107,14 +189,14 @@ class BfRtTableDataField(BfRtObject):
         self.singleton = singleton
 
 
-def parse_table_key(key_data):
+def parse_table_key(key_data, shared_values=None):
     id_ = key_data.get("id", None)
-    name = key_data.get("name", None)
+    name = intern_string(key_data.get("name", None))
     repeated = key_data.get("repeated", None)
-    annotations = key_data.get("annotations", None)
+    annotations = shared(key_data.get("annotations", None), shared_values)
     mandatory = key_data.get("mandatory", None)
-    match_type = key_data.get("match_type", None)
-    type_ = key_data.get("type", None)
+    match_type = intern_string(key_data.get("match_type", None))
+    type_ = shared(key_data.get("type", None), shared_values)
 
     return BfRtTableKey(
         id_=id_,
@@ -127,16 +209,16 @@ def parse_table_key(key_data):
     )
 
 
-def parse_action_data(data):
+def parse_action_data(data, shared_values=None):
     data_list = []
     for action in data:
         id_ = action.get("id", None)
-        name = action.get("name", None)
+        name = intern_string(action.get("name", None))
         repeated = action.get("repeated", None)
         read_only = action.get("read_only", None)
-        annotations = action.get("annotations", None)
+        annotations = shared(action.get("annotations", None), shared_values)
         mandatory = action.get("mandatory", None)
-        type_ = action.get("type", None)
+        type_ = shared(action.get("type", None), shared_values)
         data_list.append(
             BfRtTableActionData(
                 id_=id_,
@@ -151,14 +233,14 @@ def parse_action_data(data):
     return data_list
 
 
-def parse_action_spec(action_data):
+def parse_action_spec(action_data, shared_values=None):
     id_ = action_data.get("id", None)
     name = action_data.get("name", None)
-    action_scope = action_data.get("action_scope", None)
-    annotations = action_data.get("annotations", None)
+    action_scope = intern_string(action_data.get("action_scope", None))
+    annotations = shared(action_data.get("annotations", None), shared_values)
     data = action_data.get("data", None)
     if data is not None:
-        data = parse_action_data(data)
+        data = parse_action_data(data, shared_values)
 
     return BfRtTableActionSpec(
         id_=id_,
@@ -169,49 +251,51 @@ def parse_action_spec(action_data):
     )
 
 
-def parse_table_data_field_singleton(singleton):
+def parse_table_data_field_singleton(singleton, shared_values=None):
     id_ = singleton.get("id", None)
-    name = singleton.get("name", None)
+    name = intern_string(singleton.get("name", None))
     repeated = singleton.get("repeated", None)
-    annotations = singleton.get("annotations", None)
-    type_ = singleton.get("type", None)
+    annotations = shared(singleton.get("annotations", None), shared_values)
+    type_ = shared(singleton.get("type", None), shared_values)
 
     return BfRtTableDataFieldSingleton(
         id_=id_, name=name, repeated=repeated, annotations=annotations, type_=type_
     )
 
 
-def parse_table_data_field(field):
+def parse_table_data_field(field, shared_values=None):
     mandatory = field.get("mandatory", None)
     read_only = field.get("read_only", None)
     singleton = field.get("singleton", None)
     if singleton is not None:
-        singleton = parse_table_data_field_singleton(singleton)
+        singleton = parse_table_data_field_singleton(singleton, shared_values)
 
     return BfRtTableDataField(
         mandatory=mandatory, read_only=read_only, singleton=singleton
     )
 
 
-def parse_table(table_data):
+def parse_table(table_data, shared_values=None):
+    if shared_values is None:
+        shared_values = {}
     id_ = table_data.get("id", None)
     name = table_data.get("name", None)
-    table_type = table_data.get("table_type", None)
+    table_type = intern_string(table_data.get("table_type", None))
     size = table_data.get("size", None)
 
     table = BfRtTable(id_, name, table_type, size)
 
     if "key" in table_data:
         for key in table_data.get("key"):
-            table.key.append(parse_table_key(key))
+            table.key.append(parse_table_key(key, shared_values))
 
     if "action_specs" in table_data:
         for action_spec in table_data.get("action_specs"):
-            table.action_specs.append(parse_action_spec(action_spec))
+            table.action_specs.append(parse_action_spec(action_spec, shared_values))
 
     if "data" in table_data:
         for field in table_data.get("data"):
-            table.data.append(parse_table_data_field(field))
+            table.data.append(parse_table_data_field(field, shared_values))
 
     return table
 
@@ -229,31 +313,203 @@ class BfRtInfo(object):
 
     This would then be passed to the BfRt helper.
 
+    All names and IDs are indexed when the object is constructed, so the
+    ``get_*`` and ``*_by_id`` methods are dictionary lookups rather than scans
+    of the table list.
+
     The data passed in would ordinarily be created as follows::
 
         bfrt_data = json.load(open("all_bfrt.json"))
         bfrt_info = BfRtInfo(all_bfrt_data)
 
+    A program will typically only ever touch a handful of the tables described
+    by the file, especially once merged with the non-P4 tables. If ``lazy`` is
+    set, the table dictionaries are kept as they are, and a table is only
+    parsed (and indexed) the first time it is looked up, by name or by ID. The
+    :py:attr:`parsed_table_count` and :py:attr:`table_count` properties can be
+    used to see how many tables were actually parsed.
+
     Args:
         data (dict): Dictionary containing the contents of the BfRtInfo file.
+        lazy (bool, optional): Defer parsing each table until it is first
+            looked up. Default is ``False``.
     """
 
-    def __init__(self, data):
-        if "tables" in data:
-            self.tables = []
-            for table_data in data.get("tables"):
-                self.tables.append(parse_table(table_data))
+    def __init__(self, data, lazy=False):
+        self._tables = {}
+        self._keys = {}
+        self._action_specs = {}
+        self._action_fields = {}
+        self._data_fields = {}
+        self._tables_by_id = {}
+        self._keys_by_id = {}
+        self._action_specs_by_id = {}
+        self._action_fields_by_id = {}
+        self._data_fields_by_id = {}
+
+        self._raw_tables = list(data.get("tables", []))
+        self._parsed_tables = [None] * len(self._raw_tables)
+        self._raw_by_name = {}
+        self._raw_by_id = {}
+        self._parsed_table_count = 0
+        # Schema values shared by the tables, see :py:func:`shared`. Dropped
+        # once every table is parsed.
+        self._shared_values = {}
+        for position, table_data in enumerate(self._raw_tables):
+            self._raw_by_name.setdefault(table_data.get("name", None), position)
+            self._raw_by_id.setdefault(table_data.get("id", None), position)
+
+        if not lazy:
+            for position in range(len(self._raw_tables)):
+                self._parse_table(position)
+
         if "learn_filters" in data:
             self.learn_filters = []
             for table_data in data.get("learn_filters"):
                 self.learn_filters.append(table_data)
 
+    @property
+    def tables(self):
+        """List of every table, in the order they appear in the file.
+
+        In lazy mode, accessing this parses every table not yet parsed.
+
+        This is the object's own list, as when ``tables`` was an attribute,
+        so changes to it are kept. However, lookups by name or ID use indexes
+        built as each table is parsed, so do not see tables added to or
+        removed from the list.
+        """
+        for position, table in enumerate(self._parsed_tables):
+            if table is None:
+                self._parse_table(position)
+        return self._parsed_tables
+
+    @property
+    def table_count(self):
+        """Number of tables described by the file."""
+        return len(self._parsed_tables)
+
+    @property
+    def parsed_table_count(self):
+        """Number of tables which have been parsed."""
+        return self._parsed_table_count
+
+    def _parse_table(self, position):
+        """Parses and indexes the table at the given position in the file.
+
+        The raw dictionary is released once parsed, and the shared schema
+        values once every table is.
+        """
+        table = parse_table(self._raw_tables[position], self._shared_values)
+        self._raw_tables[position] = None
+        self._parsed_tables[position] = table
+        self._parsed_table_count += 1
+        if self._parsed_table_count == len(self._parsed_tables):
+            self._shared_values = None
+        self._index_table(
+            table,
+            by_name=self._raw_by_name.get(table.name) == position,
+            by_id=self._raw_by_id.get(table.id) == position,
+        )
+        return table
+
+    def _is_parsed(self, position):
+        # Tables may have been removed from :py:attr:`tables` once parsed.
+        tables = self._parsed_tables
+        return position >= len(tables) or tables[position] is not None
+
+    def _load_table(self, table_name):
+        """Parses the named table if not already done. Returns whether or not
+        a table was parsed."""
+        position = self._raw_by_name.get(table_name)
+        if position is None or self._is_parsed(position):
+            return False
+        self._parse_table(position)
+        return True
+
+    def _load_table_by_id(self, table_id):
+        """Parses the table with the given ID if not already done. Returns
+        whether or not a table was parsed."""
+        position = self._raw_by_id.get(table_id)
+        if position is None or self._is_parsed(position):
+            return False
+        self._parse_table(position)
+        return True
+
+    def _lookup(self, index, key, table_name):
+        """Retrieves a name-keyed index entry, parsing the table if needed."""
+        entry = index.get(key)
+        if entry is None and self._load_table(table_name):
+            entry = index.get(key)
+        return entry
+
+    def _lookup_by_id(self, index, key, table_id):
+        """Retrieves an ID-keyed index entry, parsing the table if needed."""
+        entry = index.get(key)
+        if entry is None and self._load_table_by_id(table_id):
+            entry = index.get(key)
+        return entry
+
+    def _index_table(self, table, by_name=True, by_id=True):
+        """Adds a parsed table to the name and ID keyed lookup dictionaries.
+
+        Lookups previously performed a linear scan and returned the first
+        match, so where names or IDs are duplicated the first occurrence is
+        kept. Which table is first is decided by the caller through
+        ``by_name`` and ``by_id``.
+        """
+        keys = {}
+        keys_by_id = {}
+        for key in table.key:
+            keys.setdefault(key.name, key)
+            keys_by_id.setdefault(key.id, key)
+
+        action_specs = {}
+        action_specs_by_id = {}
+        action_fields = {}
+        action_fields_by_id = {}
+        for action_spec in table.action_specs:
+            fields = {}
+            fields_by_id = {}
+            for field in action_spec.data or []:
+                fields.setdefault(field.name, field)
+                fields_by_id.setdefault(field.id, field)
+            if action_spec.name not in action_specs:
+                action_specs[action_spec.name] = action_spec
+                action_fields[action_spec.name] = fields
+            if action_spec.id not in action_specs_by_id:
+                action_specs_by_id[action_spec.id] = action_spec
+                action_fields_by_id[action_spec.id] = fields_by_id
+
+        data_fields = {}
+        data_fields_by_id = {}
+        for field in table.data:
+            if field.singleton is not None:
+                data_fields.setdefault(field.singleton.name, field)
+                data_fields_by_id.setdefault(field.singleton.id, field)
+
+        if by_name:
+            self._tables[table.name] = table
+            self._keys[table.name] = keys
+            self._action_specs[table.name] = action_specs
+            for action_name, fields in action_fields.items():
+                self._action_fields[(table.name, action_name)] = fields
+            self._data_fields[table.name] = data_fields
+
+        if by_id:
+            self._tables_by_id[table.id] = table
+            self._keys_by_id[table.id] = keys_by_id
+            self._action_specs_by_id[table.id] = action_specs_by_id
+            for action_id, fields in action_fields_by_id.items():
+                self._action_fields_by_id[(table.id, action_id)] = fields
+            self._data_fields_by_id[table.id] = data_fields_by_id
+
     def get_action_field(self, table_name, action_name, field_name):
-        action_spec = self.get_action_spec(table_name, action_name)
-        if action_spec is not None:
-            for field in action_spec.data:
-                if field.name == field_name:
-                    return field
+        fields = self._lookup(
+            self._action_fields, (table_name, action_name), table_name
+        )
+        if fields is not None:
+            return fields.get(field_name)
         return None
 
     def get_action_field_id(self, table_name, action_name, field_name):
@@ -263,12 +519,9 @@ class BfRtInfo(object):
         return None
 
     def get_data_field(self, table_name, field_name):
-        table = self.get_table(table_name)
-        if table is not None:
-            for field in table.data:
-                if field.singleton is not None:
-                    if field.singleton.name == field_name:
-                        return field
+        fields = self._lookup(self._data_fields, table_name, table_name)
+        if fields is not None:
+            return fields.get(field_name)
         return None
 
     def get_data_field_id(self, table_name, field_name):
@@ -279,18 +532,12 @@ class BfRtInfo(object):
         return None
 
     def get_table(self, table_name):
-        if "tables" in self.__dict__:
-            for table in self.tables:
-                if table.name == table_name:
-                    return table
-        return None
+        return self._lookup(self._tables, table_name, table_name)
 
     def get_key(self, table_name, key_name):
-        table = self.get_table(table_name)
-        if table is not None:
-            for key in table.key:
-                if key.name == key_name:
-                    return key
+        keys = self._lookup(self._keys, table_name, table_name)
+        if keys is not None:
+            return keys.get(key_name)
         return None
 
     def get_table_id(self, table_name):
@@ -306,12 +553,9 @@ class BfRtInfo(object):
         return None
 
     def get_action_spec(self, table_name, action_spec_name):
-        table = self.get_table(table_name)
-        if table is not None:
-            for action_spec in table.action_specs:
-                if action_spec.name == action_spec_name:
-                    return action_spec
-
+        action_specs = self._lookup(self._action_specs, table_name, table_name)
+        if action_specs is not None:
+            return action_specs.get(action_spec_name)
         return None
 
     def get_action_spec_id(self, table_name, action_spec_name):
@@ -319,3 +563,84 @@ class BfRtInfo(object):
         if action_spec is not None:
             return action_spec.id
         return None
+
+    def table_by_id(self, table_id):
+        """Retrieves a table by it's ID.
+
+        Messages returned by the server, e.g. a ``ReadResponse``, only refer to
+        tables, fields and actions by their IDs. This and the following
+        ``*_by_id`` methods are the reverse of the name based lookups, and are
+        used to decode such messages.
+
+        Args:
+            table_id (int): ``TableEntry.table_id``
+
+        Returns:
+            BfRtTable: The table, or ``None`` if not found.
+        """
+        return self._lookup_by_id(self._tables_by_id, table_id, table_id)
+
+    def key_by_id(self, table_id, field_id):
+        """Retrieves a key field by it's table and field IDs.
+
+        Args:
+            table_id (int): ``TableEntry.table_id``
+            field_id (int): ``KeyField.field_id``
+
+        Returns:
+            BfRtTableKey: The key field, or ``None`` if not found.
+        """
+        keys = self._lookup_by_id(self._keys_by_id, table_id, table_id)
+        if keys is not None:
+            return keys.get(field_id)
+        return None
+
+    def action_by_id(self, table_id, action_id):
+        """Retrieves an action specification by it's table and action IDs.
+
+        Args:
+            table_id (int): ``TableEntry.table_id``
+            action_id (int): ``TableData.action_id``
+
+        Returns:
+            BfRtTableActionSpec: The action, or ``None`` if not found.
+        """
+        action_specs = self._lookup_by_id(
+            self._action_specs_by_id, table_id, table_id
+        )
+        if action_specs is not None:
+            return action_specs.get(action_id)
+        return None
+
+    def action_field_by_id(self, table_id, action_id, field_id):
+        """Retrieves an action parameter by it's table, action and field IDs.
+
+        Args:
+            table_id (int): ``TableEntry.table_id``
+            action_id (int): ``TableData.action_id``
+            field_id (int): ``DataField.field_id``
+
+        Returns:
+            BfRtTableActionData: The parameter, or ``None`` if not found.
+        """
+        fields = self._lookup_by_id(
+            self._action_fields_by_id, (table_id, action_id), table_id
+        )
+        if fields is not None:
+            return fields.get(field_id)
+        return None
+
+    def data_field_by_id(self, table_id, field_id):
+        """Retrieves a (non-action) data field by it's table and field IDs.
+
+        Args:
+            table_id (int): ``TableEntry.table_id``
+            field_id (int): ``DataField.field_id``
+
+        Returns:
+            BfRtTableDataField: The data field, or ``None`` if not found.
+        """
+        fields = self._lookup_by_id(self._data_fields_by_id, table_id, table_id)
+        if fields is not None:
+            return fields.get(field_id)
+        return None
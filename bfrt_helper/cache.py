@@ -0,0 +1,182 @@
+"""On-disk caching of parsed BfRt info.
+
+Parsing a BfRt info file (``json.loads`` followed by building the
+:py:class:`BfRtInfo` object graph and it's indexes) can take seconds for a
+large program. When controllers are restarted frequently, the same file is
+parsed over and over. This module stores the parsed object on disk, keyed by a
+hash of the raw file contents, so that subsequent loads are a single unpickle.
+
+Warning:
+
+    Cache entries are stored using ``pickle``. Only point the cache at a
+    directory which is not writable by untrusted users.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+from bfrt_helper.bfrt_info import BfRtInfo
+
+
+CACHE_VERSION = 3
+"""Version of the cached object layout. Bumped whenever the classes in
+:py:mod:`bfrt_helper.bfrt_info` change in a way that would make previously
+cached objects invalid."""
+
+
+def content_digest(*blobs):
+    """Calculates a hex digest over one or more byte strings.
+
+    Each blob's length is included in the hash, so that ``(b"ab", b"c")`` and
+    ``(b"a", b"bc")`` produce different digests.
+
+    Args:
+        blobs (bytes): Raw contents to hash, e.g. ``bfruntime_info``.
+
+    Returns:
+        str: SHA-256 hex digest.
+    """
+    sha = hashlib.sha256()
+    for blob in blobs:
+        if isinstance(blob, str):
+            blob = blob.encode("utf-8")
+        sha.update(len(blob).to_bytes(8, "big"))
+        sha.update(blob)
+    return sha.hexdigest()
+
+
+class BfRtInfoCache:
+    """Directory of parsed :py:class:`BfRtInfo` objects.
+
+    Entries are keyed by :py:func:`content_digest` of the raw BfRt info bytes
+    they were parsed from. A changed file therefore hashes to a different
+    entry, and stale entries are simply never read again. Entries which cannot
+    be read, or were written by a different :py:data:`CACHE_VERSION`, are
+    rebuilt.
+
+    Example::
+
+        cache = BfRtInfoCache("/var/cache/bfrt-helper")
+        raw = open("bfrt.json", "rb").read()
+        bfrt_info = cache.load([raw], lambda: BfRtInfo(json.loads(raw)))
+
+    Args:
+        cache_dir (str): Directory in which to store entries. Created if it
+            does not exist.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def path(self, digest):
+        """Path of the cache entry for ``digest``."""
+        return os.path.join(
+            self.cache_dir, f"bfrt_info-v{CACHE_VERSION}-{digest}.pickle"
+        )
+
+    def get(self, digest):
+        """Retrieves a cached entry.
+
+        Returns:
+            BfRtInfo: The cached object, or ``None`` if there is no valid entry.
+        """
+        try:
+            with open(self.path(digest), "rb") as f:
+                version, entry_digest, bfrt_info = pickle.load(f)
+        except Exception:
+            # Missing, truncated or otherwise unreadable entry; treat as a miss
+            # so that it is rebuilt and replaced.
+            return None
+        if version != CACHE_VERSION or entry_digest != digest:
+            return None
+        if not isinstance(bfrt_info, BfRtInfo):
+            return None
+        return bfrt_info
+
+    def put(self, digest, bfrt_info):
+        """Stores an entry.
+
+        The entry is written to a temporary file and moved into place, so
+        concurrent readers (e.g. other controller processes) never see a
+        partially written entry.
+
+        The cache is only an optimisation, so failing to write the entry,
+        e.g. to a full or read only disk, is not an error.
+
+        Returns:
+            bool: Whether the entry was stored.
+        """
+        temp_path = None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(
+                    (CACHE_VERSION, digest, bfrt_info),
+                    f,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+            os.replace(temp_path, self.path(digest))
+        except OSError:
+            self._remove(temp_path)
+            return False
+        except BaseException:
+            self._remove(temp_path)
+            raise
+        return True
+
+    @staticmethod
+    def _remove(temp_path):
+        if temp_path is None:
+            return
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+
+    def load(self, blobs, build):
+        """Retrieves an entry, building and storing it on a miss.
+
+        Args:
+            blobs (list): Raw byte strings the BfRt info is derived from.
+            build (callable): Called with no arguments to create the
+                :py:class:`BfRtInfo` on a miss.
+
+        Returns:
+            BfRtInfo
+        """
+        digest = content_digest(*blobs)
+        bfrt_info = self.get(digest)
+        if bfrt_info is None:
+            bfrt_info = build()
+            self.put(digest, bfrt_info)
+        return bfrt_info
+
+
+def load_bfrt_info(raw, cache_dir=None, lazy=False):
+    """Creates a :py:class:`BfRtInfo` from the raw contents of a BfRt info file.
+
+    If ``cache_dir`` is given, the parsed object is cached there; see
+    :py:class:`BfRtInfoCache`. Objects are always cached fully parsed, so
+    ``lazy`` cannot be combined with a cache.
+
+    Args:
+        raw (bytes): Contents of the BfRt info file.
+        cache_dir (str, optional): Directory of the cache.
+        lazy (bool, optional): See :py:class:`BfRtInfo`.
+
+    Returns:
+        BfRtInfo
+
+    Raises:
+        ValueError: If both ``cache_dir`` and ``lazy`` are given.
+    """
+    if cache_dir is None:
+        return BfRtInfo(json.loads(raw), lazy=lazy)
+    if lazy:
+        raise ValueError("Lazy parsing cannot be combined with a cache")
+    cache = BfRtInfoCache(cache_dir)
+    return cache.load([raw], lambda: BfRtInfo(json.loads(raw)))
@@ -0,0 +1,290 @@
+"""Bulk collection of counter and register values.
+
+Reading counters an entry at a time, with a request each, is far too slow
+for telemetry. Instead, :py:class:`TableCollector` asks the driver to sync
+it's software shadow of a whole table's counters or registers from the
+hardware, with a single table operation, then reads the whole table from the
+shadow in one streamed request.
+
+Values are returned as NumPy arrays, one per data field, rather than as
+objects per entry. Fixed width values are copied into the arrays straight
+from the bytes of the response. Rates between successive polls are then
+computed on the arrays as a whole::
+
+    collector = TableCollector(connection, "pipe.Ingress.port_counter")
+    while True:
+        sample, rates = collector.poll()
+        if rates is not None:
+            print(sample.index, rates["$COUNTER_SPEC_PKTS"])
+        time.sleep(1)
+
+Entries are identified by their index, for counter and register tables,
+which are keyed by ``$COUNTER_INDEX`` or ``$REGISTER_INDEX``. For other
+tables, e.g. match-action tables with direct counters, each distinct key is
+given a number, in the order the collector first sees it, and the same key
+keeps it's number in later samples.
+
+Note:
+    NumPy is an optional dependency of this package, and must be installed to
+    use this module, e.g. with ``pip install bfrt-helper[collector]``.
+"""
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import time
+
+from bfrt_helper.bfrt import UnknownDataField
+from bfrt_helper.bfrt import UnknownTable
+
+
+SYNC_COUNTERS = "SyncCounters"
+SYNC_REGISTERS = "SyncRegisters"
+
+INDEX_KEYS = ("$COUNTER_INDEX", "$REGISTER_INDEX")
+"""Names of the key fields of counter and register tables."""
+
+COUNTER_FIELDS = ("$COUNTER_SPEC_BYTES", "$COUNTER_SPEC_PKTS")
+"""Names of the data fields of counters, direct or indirect."""
+
+
+def values_array(values):
+    """Converts the values of a data field read from each entry to an array.
+
+    Entries without the field are ``None``, and are given a value of zero of
+    the same width as the others, so the array keeps it's type. Which entries
+    they were is given by :py:attr:`Sample.missing`.
+
+    Args:
+        values (list): Per entry, the big endian bytes of a ``stream``
+            value, a list of the values of an ``int_arr_val``, e.g. a
+            register's value in each pipe, or ``None`` if the entry did not
+            have the field.
+
+    Returns:
+        numpy.ndarray: ``uint64`` array of one value per entry, or for
+        arrays, a row per entry. Values too wide for ``uint64`` are held as
+        Python integers.
+    """
+    present = next((value for value in values if value is not None), None)
+    if present is None:
+        return numpy.zeros(len(values), dtype=numpy.uint64)
+    if isinstance(present, list):
+        zero = [0] * len(present)
+        if None in values:
+            values = [zero if value is None else value for value in values]
+        return numpy.array(values, dtype=numpy.uint64)
+    size = len(present)
+    if None in values:
+        zero = bytes(size)
+        values = [zero if value is None else value for value in values]
+    data = b"".join(values)
+    if size in (1, 2, 4, 8) and len(data) == size * len(values):
+        return numpy.frombuffer(data, dtype=f">u{size}").astype(numpy.uint64)
+    ints = [int.from_bytes(value, "big") for value in values]
+    if max(ints).bit_length() > 64:
+        return numpy.array(ints, dtype=object)
+    return numpy.array(ints, dtype=numpy.uint64)
+
+
+class Sample:
+    """The values of a table's data fields, as read at one time.
+
+    Attributes:
+        time (float): ``time.monotonic()`` when the read completed.
+        index (numpy.ndarray): The index, or number, of each entry.
+        values (dict): Arrays of each data field's values by name, in the
+            same order as ``index``.
+        missing (dict): For data fields which some entries did not have,
+            ``bool`` arrays which are ``True`` for those entries, by name.
+            Their values are zero. Fields not in it were read from every
+            entry.
+    """
+
+    def __init__(self, time_, index, values, missing=None):
+        self.time = time_
+        self.index = index
+        self.values = values
+        self.missing = missing if missing is not None else {}
+
+    def __len__(self):
+        return len(self.index)
+
+
+def rates(previous, current):
+    """Calculates the rate of change, per second, of each value between two
+    samples.
+
+    Entries are matched by index, so entries added or removed between the
+    samples are handled. A value which has decreased, e.g. because the
+    counter was cleared, is taken to have counted up from zero.
+
+    Args:
+        previous (Sample): The earlier sample.
+        current (Sample): The later sample.
+
+    Returns:
+        dict: ``float64`` arrays of the rate of each value by name, in the
+        order of ``current.index``. Entries not in ``previous``, or missing
+        the value in either sample, are ``nan``.
+    """
+    elapsed = current.time - previous.time
+    if numpy.array_equal(previous.index, current.index):
+        current_rows = previous_rows = slice(None)
+    else:
+        _, current_rows, previous_rows = numpy.intersect1d(
+            current.index, previous.index, assume_unique=True, return_indices=True
+        )
+    result = {}
+    for name, values in current.values.items():
+        rate = numpy.full(values.shape, numpy.nan)
+        new = values[current_rows]
+        old = previous.values[name][previous_rows]
+        delta = numpy.where(new >= old, new - old, new)
+        rate[current_rows] = delta.astype(numpy.float64) / elapsed
+        missing = current.missing.get(name)
+        previous_missing = previous.missing.get(name)
+        if previous_missing is not None:
+            stale = numpy.zeros(len(current.index), dtype=bool)
+            stale[current_rows] = previous_missing[previous_rows]
+            missing = stale if missing is None else missing | stale
+        if missing is not None:
+            rate[missing] = numpy.nan
+        result[name] = rate
+    return result
+
+
+class TableCollector:
+    """Collects the values of counter or register data fields of every entry
+    in a table.
+
+    Args:
+        connection (BfRtConnection): The connection to read with.
+        table_name (str): Name of the table within the program.
+        field_names (list, optional): Names of the data fields to collect.
+            Default is the counter fields, if the table has any, otherwise
+            all of it's data fields.
+        sync (str, optional): Table operation executed before each read. By
+            default, ``"SyncCounters"`` for tables with counter fields, and
+            ``"SyncRegisters"`` for register tables. ``False`` to not sync.
+        from_hw (bool): Whether to read from the hardware rather than the
+            software shadow. Only needed without a sync.
+        program_name (str, optional): Default is the connected program.
+
+    Raises:
+        UnknownTable: If the table does not exist.
+        UnknownDataField: If a data field does not exist in the table.
+    """
+
+    def __init__(
+        self,
+        connection,
+        table_name,
+        field_names=None,
+        sync=None,
+        from_hw=False,
+        program_name=None,
+    ):
+        if numpy is None:
+            raise ImportError(
+                "Collecting values requires numpy, install bfrt-helper[collector]"
+            )
+        self.connection = connection
+        self.table_name = table_name
+        self.from_hw = from_hw
+        self.program_name = program_name or connection.p4_name
+
+        table = connection.helper.bfrt_info.get_table(table_name)
+        if table is None:
+            raise UnknownTable(table_name)
+
+        self.index_field_id = None
+        if len(table.key) == 1 and table.key[0].name in INDEX_KEYS:
+            self.index_field_id = table.key[0].id
+
+        data_fields = {field.singleton.name: field.singleton for field in table.data}
+        if field_names is None:
+            field_names = [name for name in COUNTER_FIELDS if name in data_fields]
+            if not field_names:
+                field_names = list(data_fields)
+        self.field_names = list(field_names)
+        self.field_slots = {}
+        for slot, name in enumerate(self.field_names):
+            if name not in data_fields:
+                raise UnknownDataField(table_name, name)
+            self.field_slots[data_fields[name].id] = slot
+
+        if sync is None:
+            if any(name in COUNTER_FIELDS for name in self.field_names):
+                sync = SYNC_COUNTERS
+            elif table.table_type == "Register":
+                sync = SYNC_REGISTERS
+        self.sync = sync
+
+        self.previous = None
+        self._rows = {}
+
+    def collect(self):
+        """Syncs the table, if configured to, and reads every entry.
+
+        Returns:
+            Sample
+        """
+        if self.sync:
+            self.connection.sync_table(self.table_name, self.sync, self.program_name)
+        request = self.connection.helper.create_table_read(
+            self.program_name, self.table_name, from_hw=self.from_hw
+        )
+        index = []
+        columns = [[] for _ in self.field_names]
+        empty = [None] * len(self.field_names)
+        field_slots = self.field_slots
+        for response in self.connection.client.Read(request):
+            for entity in response.entities:
+                table_entry = entity.table_entry
+                index.append(self._entry_index(table_entry))
+                row = list(empty)
+                for data_field in table_entry.data.fields:
+                    slot = field_slots.get(data_field.field_id)
+                    if slot is None:
+                        continue
+                    if data_field.WhichOneof("value") == "int_arr_val":
+                        row[slot] = list(data_field.int_arr_val.val)
+                    else:
+                        row[slot] = data_field.stream
+                for column, value in zip(columns, row):
+                    column.append(value)
+        now = time.monotonic()
+        values = {}
+        missing = {}
+        for name, column in zip(self.field_names, columns):
+            values[name] = values_array(column)
+            if None in column:
+                missing[name] = numpy.array([value is None for value in column])
+        return Sample(now, numpy.array(index, dtype=numpy.uint64), values, missing)
+
+    def _entry_index(self, table_entry):
+        if self.index_field_id is not None:
+            for key_field in table_entry.key.fields:
+                if key_field.field_id == self.index_field_id:
+                    return int.from_bytes(key_field.exact.value, "big")
+        key = table_entry.key.SerializeToString()
+        row = self._rows.get(key)
+        if row is None:
+            row = self._rows[key] = len(self._rows)
+        return row
+
+    def poll(self):
+        """Collects a sample, and the rates of change since the last poll.
+
+        Returns:
+            tuple: The :py:class:`Sample`, and the result of :py:func:`rates`,
+            or ``None`` on the first poll.
+        """
+        sample = self.collect()
+        previous, self.previous = self.previous, sample
+        if previous is None:
+            return sample, None
+        return sample, rates(previous, sample)
@@ -0,0 +1,408 @@
+"""Columnar encoding of match-action table entries.
+
+Entries often come from a source which is already column oriented, e.g.
+millions of route prefixes, prefix lengths and next hop IDs held in NumPy
+arrays. Constructing a :py:class:`LongestPrefixMatch` of an
+:py:class:`IPv4Address` per row only to convert it back to bytes costs far
+more than the encoding itself.
+
+This module validates and byte encodes whole columns at once using NumPy, and
+produces serialised ``Update`` messages, identical to those from
+:py:class:`WireTableWrite`, without creating any :py:class:`Field` or
+:py:class:`Masked` objects.
+
+Columns are given per key field, in the form required by the field's match
+type:
+
+* ``Exact``: An array of values.
+* ``LongestPrefixMatch``: A tuple of arrays of values and prefix lengths.
+* ``Ternary``: A tuple of arrays of values and masks.
+
+And per action parameter, as an array of values. Anything accepted by
+``numpy.asarray`` can be used as an array. As with the corresponding match
+classes, LPM and ternary values are masked before being sent.
+
+Example::
+
+    batch = bfrt_helper.create_column_write(
+        "router",
+        "pipe.Ingress.ipv4_route",
+        key={"hdr.ipv4.dst_addr": (addresses, prefix_lens)},
+        action_name="Ingress.set_nexthop",
+        action_params={"nexthop": nexthops, "port": ports},
+    )
+    connection.write_batch(batch)
+
+Columns of fields up to 64 bits wide are processed as ``uint64`` arrays.
+Wider fields (e.g. IPv6 addresses) are accepted as sequences of Python
+integers, and are validated and encoded row by row.
+
+Note:
+    NumPy is an optional dependency of this package, and must be installed to
+    use this module, e.g. with ``pip install bfrt-helper[columns]``.
+"""
+
+import operator
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from bfrt_helper.bfrt import InvalidActionParameter
+from bfrt_helper.bfrt import UnknownActionParameter
+from bfrt_helper.bfrt import UnknownKeyField
+from bfrt_helper.bfrt import data_field_bitwidth
+from bfrt_helper.util import InvalidValue
+from bfrt_helper.wire import _TAG_1_BYTES
+from bfrt_helper.wire import _TAG_1_VARINT
+from bfrt_helper.wire import _TAG_2_BYTES
+from bfrt_helper.wire import _TAG_2_VARINT
+from bfrt_helper.wire import _TAG_3_BYTES
+from bfrt_helper.wire import _TAG_4_BYTES
+from bfrt_helper.wire import encode_message
+from bfrt_helper.wire import encode_uint
+from bfrt_helper.wire import encode_varint
+
+
+class UnsupportedColumn(Exception):
+    """Exception raised when a key field or action parameter cannot be given
+    as a column, e.g. because it is not an integer type.
+
+    Args:
+        table_name (str): String containing the name of the table.
+        field_name (str): String containing the name of the field.
+        reason (str): Why the column is not supported.
+    """
+
+    def __init__(self, table_name: str, field_name: str, reason: str):
+        super().__init__(f"{table_name}::{field_name}: {reason}")
+
+
+def _byte_width(bitwidth):
+    return (bitwidth + 7) // 8
+
+
+def uint_column(values, bitwidth, name="column"):
+    """Validates a column of unsigned integers.
+
+    Args:
+        values: Array-like of integers.
+        bitwidth (int): Width of the field.
+        name (str, optional): Name of the column, used in error messages.
+
+    Returns:
+        A ``uint64`` array if ``bitwidth`` is at most 64, otherwise a list of
+        Python integers.
+
+    Raises:
+        InvalidValue: If a value is negative, does not fit in ``bitwidth``
+            bits, or is not an integer.
+    """
+    if bitwidth > 64:
+        values = values.tolist() if hasattr(values, "tolist") else list(values)
+        limit = 1 << bitwidth
+        for row, value in enumerate(values):
+            try:
+                if isinstance(value, bool):
+                    raise TypeError
+                value = values[row] = operator.index(value)
+            except TypeError:
+                raise InvalidValue(
+                    f"{name}: value {value!r} in row {row} is not an integer"
+                ) from None
+            if not 0 <= value < limit:
+                raise InvalidValue(
+                    f"{name}: value {value} in row {row} does not fit in "
+                    f"{bitwidth} bits"
+                )
+        return values
+
+    array = numpy.asarray(values)
+    if array.dtype.kind not in "iu":
+        if array.size > 0 or array.dtype.kind not in "fO":
+            raise InvalidValue(f"{name}: expected integers, have {array.dtype}")
+        array = array.astype(numpy.uint64)
+    bad = None
+    if array.dtype.kind == "i":
+        negative = numpy.flatnonzero(array < 0)
+        if negative.size > 0:
+            bad = negative[0]
+    array = array.astype(numpy.uint64)
+    if bad is None and bitwidth < 64:
+        too_big = numpy.flatnonzero(array >> numpy.uint64(bitwidth))
+        if too_big.size > 0:
+            bad = too_big[0]
+    if bad is not None:
+        raise InvalidValue(
+            f"{name}: value {numpy.asarray(values)[bad]} in row {bad} does not "
+            f"fit in {bitwidth} bits"
+        )
+    return array
+
+
+def prefix_column(prefix_lens, bitwidth, name="column"):
+    """Validates a column of prefix lengths.
+
+    Returns:
+        An ``int64`` array.
+
+    Raises:
+        InvalidValue: If a prefix length is greater than ``bitwidth``.
+    """
+    array = numpy.asarray(prefix_lens)
+    if array.dtype.kind not in "iu" and array.size > 0:
+        raise InvalidValue(f"{name}: expected integers, have {array.dtype}")
+    array = array.astype(numpy.int64)
+    bad = numpy.flatnonzero((array < 0) | (array > bitwidth))
+    if bad.size > 0:
+        raise InvalidValue(
+            f"{name}: prefix {array[bad[0]]} in row {bad[0]} is greater than "
+            f"the maximum allowed for this field. [bitwidth={bitwidth}]"
+        )
+    return array
+
+
+def prefix_masks(prefix_lens, bitwidth):
+    """Calculates the mask of each prefix length in a column."""
+    if bitwidth > 64:
+        full = (1 << bitwidth) - 1
+        return [full ^ (full >> int(prefix)) for prefix in prefix_lens]
+    full = numpy.uint64((1 << bitwidth) - 1)
+    shift = (bitwidth - prefix_lens).astype(numpy.uint64)
+    with numpy.errstate(all="ignore"):
+        masks = (full >> shift) << shift
+    # Shifting by the full width of the type is undefined.
+    return numpy.where(prefix_lens == 0, numpy.uint64(0), masks)
+
+
+def masked(values, masks):
+    """ANDs each value in a column with a mask."""
+    if isinstance(values, list):
+        return [value & mask for value, mask in zip(values, masks)]
+    return values & masks
+
+
+def encode_column(values, bitwidth):
+    """Encodes each value of a validated column as big endian bytes.
+
+    Each value is encoded in the smallest number of bytes capable of holding
+    ``bitwidth`` bits, as with :py:func:`encode_number`.
+
+    Returns:
+        list: ``bytes`` of each row.
+    """
+    n_bytes = _byte_width(bitwidth)
+    if isinstance(values, list):
+        return [value.to_bytes(n_bytes, "big") for value in values]
+    raw = values.astype(">u8").view(numpy.uint8).reshape(-1, 8)[:, 8 - n_bytes:]
+    data = raw.tobytes()
+    return [data[i:i + n_bytes] for i in range(0, len(data), n_bytes)]
+
+
+def _message_head(tag, size):
+    return tag + encode_varint(size)
+
+
+class ColumnTableWrite:
+    """Encodes columns of entries to a match-action table as serialised
+    ``Update`` messages.
+
+    Instances are created with :py:meth:`BfRtHelper.prepare_column_write`, or
+    from an existing :py:class:`PreparedTableWrite`.
+
+    Args:
+        prepared (PreparedTableWrite): The prepared write for the table and
+            action.
+
+    Raises:
+        ImportError: If NumPy is not installed.
+    """
+
+    def __init__(self, prepared):
+        if numpy is None:
+            raise ImportError(
+                "Columnar encoding requires numpy, install bfrt-helper[columns]"
+            )
+        self.prepared = prepared
+        bfrt_info = prepared.helper.bfrt_info
+        table = bfrt_info.get_table(prepared.table_name)
+        self.info_key_fields = {}
+        for info_key_field in table.key:
+            self.info_key_fields.setdefault(info_key_field.name, info_key_field)
+        self.update_types = {}
+
+    def _bitwidth(self, field_name, bitwidth):
+        if bitwidth is None:
+            raise UnsupportedColumn(
+                self.prepared.table_name, field_name, "not an integer field"
+            )
+        return bitwidth
+
+    def encode_key_column(self, field_name, column):
+        """Encodes a key field column.
+
+        Returns:
+            list: The encoded ``KeyField``, including the tag and length of the
+            ``TableKey.fields`` field it is in, of each row.
+
+        Raises:
+            UnknownKeyField: If the key field does not exist in the table.
+            UnsupportedColumn: If the key field has an unsupported match type
+                or type.
+            InvalidValue: If a value is out of range.
+        """
+        prepared = self.prepared
+        try:
+            field_id, match_type, _ = prepared.key_fields[field_name]
+        except KeyError:
+            raise UnknownKeyField(prepared.table_name, field_name)
+        info_key_field = self.info_key_fields[field_name]
+        bitwidth = self._bitwidth(field_name, data_field_bitwidth(info_key_field))
+        n_bytes = _byte_width(bitwidth)
+        field_id = encode_uint(_TAG_1_VARINT, field_id)
+        value = _TAG_1_BYTES + encode_varint(n_bytes)
+
+        if match_type == "Exact":
+            values = encode_column(uint_column(column, bitwidth, field_name), bitwidth)
+            exact = _message_head(_TAG_2_BYTES, len(value) + n_bytes)
+            key_field = field_id + exact + value
+            head = _message_head(_TAG_1_BYTES, len(key_field) + n_bytes) + key_field
+            return [head + v for v in values]
+
+        if match_type == "Ternary":
+            values, masks = column
+            masks = uint_column(masks, bitwidth, field_name)
+            values = masked(uint_column(values, bitwidth, field_name), masks)
+            values = encode_column(values, bitwidth)
+            masks = encode_column(masks, bitwidth)
+            mask = _TAG_2_BYTES + encode_varint(n_bytes)
+            size = len(value) + len(mask) + 2 * n_bytes
+            key_field = field_id + _message_head(_TAG_3_BYTES, size) + value
+            head = _message_head(_TAG_1_BYTES, len(key_field) + len(mask) + 2 * n_bytes)
+            head += key_field
+            return [head + v + mask + m for v, m in zip(values, masks)]
+
+        if match_type == "LongestPrefixMatch":
+            values, prefix_lens = column
+            prefix_lens = prefix_column(prefix_lens, bitwidth, field_name)
+            values = uint_column(values, bitwidth, field_name)
+            values = masked(values, prefix_masks(prefix_lens, bitwidth))
+            values = encode_column(values, bitwidth)
+            # The prefix length is omitted when zero, so the encoding of the
+            # rest of the field depends on it.
+            heads = []
+            tails = []
+            for prefix in range(bitwidth + 1):
+                tail = encode_uint(_TAG_2_VARINT, prefix)
+                lpm = _message_head(_TAG_4_BYTES, len(value) + n_bytes + len(tail))
+                key_field = field_id + lpm + value
+                size = len(key_field) + n_bytes + len(tail)
+                heads.append(_message_head(_TAG_1_BYTES, size) + key_field)
+                tails.append(tail)
+            return [
+                heads[p] + v + tails[p] for v, p in zip(values, prefix_lens.tolist())
+            ]
+
+        raise UnsupportedColumn(
+            prepared.table_name, field_name, f"unsupported match type {match_type}"
+        )
+
+    def encode_param_column(self, param_name, column):
+        """Encodes an action parameter column.
+
+        Returns:
+            list: The encoded ``DataField``, including the tag and length of the
+            ``TableData.fields`` field it is in, of each row.
+
+        Raises:
+            UnknownActionParameter: If the parameter does not exist.
+            InvalidActionParameter: If a value is out of range.
+            UnsupportedColumn: If the parameter is not an integer.
+        """
+        prepared = self.prepared
+        try:
+            info_field, bitwidth = prepared.action_params[param_name]
+        except KeyError:
+            raise UnknownActionParameter(
+                prepared.table_name, prepared.action_name, param_name
+            )
+        bitwidth = self._bitwidth(param_name, bitwidth)
+        try:
+            values = uint_column(column, bitwidth, param_name)
+        except InvalidValue as err:
+            raise InvalidActionParameter(
+                prepared.table_name, prepared.action_name, param_name, str(err)
+            )
+        n_bytes = _byte_width(bitwidth)
+        field_id = encode_uint(_TAG_1_VARINT, info_field.id)
+        data_field = field_id + _message_head(_TAG_2_BYTES, n_bytes)
+        head = _message_head(_TAG_2_BYTES, len(data_field) + n_bytes) + data_field
+        return [head + v for v in encode_column(values, bitwidth)]
+
+    def _update_header(self, update_type):
+        header = self.update_types.get(update_type)
+        if header is None:
+            header = encode_uint(_TAG_1_VARINT, update_type)
+            self.update_types[update_type] = header
+        return header
+
+    def __call__(self, key, action_params=None, update_type=None):
+        """Encodes the ``Update`` of every row.
+
+        Args:
+            key (dict): Dictionary of key field names to their column.
+            action_params (dict, optional): Dictionary of parameter names to
+                their column.
+            update_type (Update.Type, optional): Overrides the type of
+                operation given when prepared.
+
+        Returns:
+            list: The serialised ``Update`` of each row.
+
+        Raises:
+            ValueError: If the columns are not all the same length, or
+                parameters are given for a write prepared without an action.
+        """
+        prepared = self.prepared
+        if action_params and prepared.action_id is None:
+            raise ValueError(
+                f"{prepared.table_name}: action parameters given for a write "
+                "prepared without an action"
+            )
+        if update_type is None:
+            update_type = prepared.update_type
+        columns = [self.encode_key_column(n, c) for n, c in key.items()]
+        n_rows = len(columns[0]) if columns else None
+        params = []
+        if action_params:
+            params = [
+                self.encode_param_column(n, c) for n, c in action_params.items()
+            ]
+        if n_rows is None:
+            n_rows = len(params[0]) if params else 0
+        for column in columns + params:
+            if len(column) != n_rows:
+                raise ValueError(f"Columns have {len(column)} and {n_rows} rows")
+
+        table_entry_header = encode_uint(_TAG_1_VARINT, prepared.table_id)
+        data_header = None
+        if prepared.action_id is not None:
+            data_header = encode_uint(_TAG_1_VARINT, prepared.action_id)
+        update_header = self._update_header(update_type)
+
+        keys = [b"".join(row) for row in zip(*columns)] if columns else None
+        datas = [data_header] * n_rows if data_header is not None else None
+        if params:
+            datas = [data_header + b"".join(row) for row in zip(*params)]
+
+        updates = []
+        for row in range(n_rows):
+            table_entry = table_entry_header
+            if keys is not None:
+                table_entry += encode_message(_TAG_2_BYTES, keys[row])
+            if datas is not None:
+                table_entry += encode_message(_TAG_3_BYTES, datas[row])
+            entity = encode_message(_TAG_1_BYTES, table_entry)
+            updates.append(update_header + encode_message(_TAG_2_BYTES, entity))
+        return updates
@@ -1,16 +1,85 @@
 from queue import Queue
 from threading import Thread
+import time
 
 import grpc
 
 import bfrt_helper.pb2.bfruntime_pb2_grpc as bfruntime_pb2_grpc
+from bfrt_helper.pb2.bfruntime_pb2 import (
+    SetForwardingPipelineConfigRequest as SetPipelineReq,
+)
+from bfrt_helper.pb2.bfruntime_pb2 import SetForwardingPipelineConfigResponse
 from bfrt_helper.pb2.bfruntime_pb2 import Update
+from bfrt_helper.pb2.bfruntime_pb2 import WriteRequest
+from bfrt_helper.pb2.bfruntime_pb2 import WriteResponse
 
 from bfrt_helper.bfrt_info import BfRtInfo
+from bfrt_helper.cache import BfRtInfoCache
+from bfrt_helper.bfrt import DEFAULT_MAX_REQUEST_BYTES
 from bfrt_helper.bfrt import make_empty_bfrt_helper
 from bfrt_helper.bfrt import make_merged_config
 from bfrt_helper.bfrt import make_port_map
 from bfrt_helper.fields import PortId
+from bfrt_helper.pipeline import encode_set_pipeline_request
+from bfrt_helper.read import read_entries
+from bfrt_helper.wire import WireWriteBatch
+
+
+class BatchWriteError(Exception):
+    """Raised when a request written by :py:meth:`BfRtConnection.write_batch`
+    fails.
+
+    Requests before the failed one were written. Depending on the batch's
+    atomicity, some of the failed request's updates may have been applied.
+
+    Args:
+        failed (range): Numbers of the updates in the failed request.
+        unsent (list): Ranges of the updates in requests not sent.
+        error (grpc.RpcError): The error returned for the failed request.
+        unit (str): What the ranges number, e.g. ``"lines"`` of a file the
+            updates were loaded from.
+    """
+
+    def __init__(self, failed, unsent, error, unit="updates"):
+        self.failed = failed
+        self.unsent = unsent
+        self.error = error
+        self.unit = unit
+        super().__init__(
+            f"Write of {unit} {failed.start}-{failed.stop - 1} failed: {error}"
+        )
+
+
+class WarmInitTimings:
+    """Durations, in seconds, of the phases of a
+    :py:meth:`BfRtConnection.warm_init`.
+
+    Attributes:
+        capture (float): Reading the table state from the running program.
+        begin (float): Pushing the program, up to the device accepting it,
+            and retrieving it's BfRt info.
+        replay (float): Writing the saved table state.
+        end (float): Switching traffic over to the new program.
+        entries (int): Number of entries replayed, or, for a replay callback,
+            what it returned.
+    """
+
+    def __init__(self):
+        self.capture = 0.0
+        self.begin = 0.0
+        self.replay = 0.0
+        self.end = 0.0
+        self.entries = None
+
+    @property
+    def total(self):
+        return self.capture + self.begin + self.replay + self.end
+
+    def __repr__(self):
+        return (
+            f"WarmInitTimings(capture={self.capture:.3f}, begin={self.begin:.3f}, "
+            f"replay={self.replay:.3f}, end={self.end:.3f}, entries={self.entries})"
+        )
 
 
 class PortMap:
@@ -26,11 +95,37 @@ class BfRtConnection:
 
     This class represents a an instance of the gRPC interface, which manages
     it's own connection.
+
+    If ``lazy`` is set, the retrieved BfRt info, which includes all non-P4
+    tables, is parsed a table at a time as tables are used. See
+    :py:class:`BfRtInfo`.
+
+    If ``cache_dir`` is set, the parsed BfRt info is cached on disk, keyed by
+    a hash of the retrieved program and non-P4 BfRt info. See
+    :py:class:`BfRtInfoCache`. Cached objects are always fully parsed, so
+    ``lazy`` and ``cache_dir`` cannot both be set, as for
+    :py:func:`load_bfrt_info`.
+
+    Raises:
+        ValueError: If both ``lazy`` and ``cache_dir`` are set.
     """
-    def __init__(self, host, device_id, client_id):
+    def __init__(self, host, device_id, client_id, lazy=False, cache_dir=None):
+        if lazy and cache_dir is not None:
+            raise ValueError("Lazy parsing cannot be combined with a cache")
         self.host = host
+        self.lazy = lazy
+        self.cache_dir = cache_dir
         self.channel = grpc.insecure_channel(self.host)
         self.client = bfruntime_pb2_grpc.BfRuntimeStub(self.channel)
+        # Write call for already serialised requests, which are sent as is.
+        self.raw_write = self.channel.unary_unary(
+            '/bfrt_proto.BfRuntime/Write',
+            request_serializer=None,
+            response_deserializer=WriteResponse.FromString)
+        self.raw_set_forwarding_pipeline = self.channel.unary_unary(
+            '/bfrt_proto.BfRuntime/SetForwardingPipelineConfig',
+            request_serializer=None,
+            response_deserializer=SetForwardingPipelineConfigResponse.FromString)
         self.queue_out = Queue()
         self.queue_in = Queue()
         self.stream = self.client.StreamChannel(self.__stream_out())
@@ -46,8 +141,18 @@ class BfRtConnection:
         response = self.get_forwarding_pipeline(request)
         if len(response.config) > 0:
             self.p4_name = response.config[0].p4_name
+        if self.cache_dir is not None and len(response.config) > 0:
+            blobs = [
+                response.config[0].bfruntime_info,
+                response.non_p4_config.bfruntime_info,
+            ]
+            cache = BfRtInfoCache(self.cache_dir)
+            self.helper.bfrt_info = cache.load(
+                blobs, lambda: BfRtInfo(make_merged_config(response)[0])
+            )
+            return
         configs = make_merged_config(response)
-        self.helper.bfrt_info = BfRtInfo(configs[0])
+        self.helper.bfrt_info = BfRtInfo(configs[0], lazy=self.lazy)
 
     def get_port_map(self, ports: list) -> PortMap:
         if self.p4_name is None:
@@ -96,6 +201,137 @@ class BfRtConnection:
         )
         return self.client.Write(request)
 
+    def read_table(self, table_name, key=None, program_name=None, from_hw=None):
+        """ Read the entries of a table.
+
+        If no key is given, every entry in the table is read. Entries are
+        yielded as they are received, and decoded as they are accessed, see
+        :py:class:`ReadEntry`, so reading a large table does not hold all of
+        it in memory.
+
+        If ``from_hw`` is given, the entries are read from the hardware if
+        ``True``, or the driver's software shadow if ``False``. See
+        :py:meth:`BfRtHelper.set_table_read`.
+
+        Yields:
+            ReadEntry
+        """
+        if program_name is None and self.p4_name is None:
+            raise Exception('Cannot read table without a program name')
+        request = self.helper.create_table_read(
+            program_name if program_name is not None else self.p4_name,
+            table_name,
+            key,
+            from_hw)
+        return read_entries(self.helper.bfrt_info, self.client.Read(request))
+
+    def read_handles(self, table_name, keys, program_name=None):
+        """ Read the handles of a table's entries, by key. See
+        :py:class:`HandleCache`.
+
+        Returns:
+            list: The handle of each entry, in the order of ``keys``.
+        """
+        if program_name is None and self.p4_name is None:
+            raise Exception('Cannot read table without a program name')
+        request = self.helper.create_handle_read(
+            program_name if program_name is not None else self.p4_name,
+            table_name,
+            keys)
+        return [
+            entity.handle.handle_id
+            for response in self.client.Read(request)
+            for entity in response.entities
+        ]
+
+    def sync_table(self, table_name, operation, program_name=None):
+        """ Execute an operation on a whole table, e.g. ``"SyncCounters"``.
+        See :py:meth:`BfRtHelper.create_table_operation`.
+        """
+        if program_name is None and self.p4_name is None:
+            raise Exception('Cannot write table without a program name')
+        request = self.helper.create_table_operation(
+            program_name if program_name is not None else self.p4_name,
+            table_name,
+            operation)
+        return self.client.Write(request)
+
+    def create_write_batch(
+            self,
+            program_name=None,
+            atomicity=WriteRequest.Atomicity.CONTINUE_ON_ERROR,
+            max_bytes=DEFAULT_MAX_REQUEST_BYTES,
+            max_updates=None):
+        """ Create a batch of updates to be sent with :py:meth:`write_batch`.
+
+        If no program name is given, the connected program is targeted.
+        """
+        if program_name is None and self.p4_name is None:
+            raise Exception('Cannot write table without a program name')
+        return self.helper.create_write_batch(
+            program_name if program_name is not None else self.p4_name,
+            atomicity=atomicity,
+            max_bytes=max_bytes,
+            max_updates=max_updates)
+
+    def create_wire_write_batch(
+            self,
+            program_name=None,
+            atomicity=WriteRequest.Atomicity.CONTINUE_ON_ERROR,
+            max_bytes=DEFAULT_MAX_REQUEST_BYTES,
+            max_updates=None):
+        """ Create a batch of directly encoded updates to be sent with
+        :py:meth:`write_batch`. See :py:class:`WireWriteBatch`.
+
+        If no program name is given, the connected program is targeted.
+        """
+        if program_name is None and self.p4_name is None:
+            raise Exception('Cannot write table without a program name')
+        return WireWriteBatch(
+            self.helper,
+            program_name if program_name is not None else self.p4_name,
+            atomicity=atomicity,
+            max_bytes=max_bytes,
+            max_updates=max_updates)
+
+    def write_batch(self, batch):
+        """ Write all updates in a :py:class:`WriteBatch` or
+        :py:class:`WireWriteBatch`.
+
+        Each of the batch's requests is written in turn, and the batch is left
+        empty. If a request fails, the error is raised as a
+        :py:class:`BatchWriteError`, detailing which updates were and were not
+        written.
+
+        Returns:
+            list: The response to each request.
+        """
+        return self.write_requests(batch.pop_all())
+
+    def write_requests(self, pairs, unit="updates"):
+        """ Write ``(request, range)`` pairs taken from a batch, e.g. with
+        :py:meth:`WriteBatch.pop_full`.
+
+        Requests may be ``WriteRequest`` messages or already serialised bytes.
+        Errors are raised as with :py:meth:`write_batch`, with ``unit`` naming
+        what the ranges number in the :py:class:`BatchWriteError`.
+
+        Returns:
+            list: The response to each request.
+        """
+        responses = []
+        for index, (request, entries) in enumerate(pairs):
+            try:
+                if isinstance(request, bytes):
+                    responses.append(self.raw_write(request))
+                else:
+                    responses.append(self.client.Write(request))
+            except grpc.RpcError as err:
+                raise BatchWriteError(
+                    entries, [r for _, r in pairs[index + 1:]], err, unit
+                ) from err
+        return responses
+
     def post(self, message):
         """ Post a message to BfRt """
         self.queue_out.put(message)
@@ -104,6 +340,10 @@ class BfRtConnection:
         """ Write a message over BfRt """
         return self.client.Write(message)
 
+    def write_raw(self, data):
+        """ Write an already serialised ``WriteRequest`` over BfRt """
+        return self.raw_write(data)
+
     def get_forwarding_pipeline(self, request):
         """ """
         return self.client.GetForwardingPipelineConfig(request)
@@ -112,6 +352,195 @@ class BfRtConnection:
         """ """
         self.client.SetForwardingPipelineConfig(request)
 
+    def push_pipeline(
+            self,
+            pipelines,
+            action=SetPipelineReq.VERIFY_AND_WARM_INIT_BEGIN_AND_END,
+            dev_init_mode=SetPipelineReq.DevInitMode.FAST_RECONFIG,
+            cache=None):
+        """ Push programs to the device, encoding the request directly from
+        the memory mapped artifacts. See :py:mod:`bfrt_helper.pipeline`.
+
+        Args:
+            pipelines (list): The :py:class:`Pipeline` of each program.
+            action (SetForwardingPipelineConfigRequest.Action): What the
+                device does with the programs.
+            dev_init_mode (SetForwardingPipelineConfigRequest.DevInitMode):
+                How the device is reinitialised.
+            cache (PipelineCache, optional): Cache of encoded requests.
+
+        Returns:
+            SetForwardingPipelineConfigResponse
+        """
+        request = encode_set_pipeline_request(
+            self.helper,
+            pipelines,
+            action=action,
+            dev_init_mode=dev_init_mode,
+            cache=cache)
+        return self.raw_set_forwarding_pipeline(request)
+
+    def begin_warm_init(
+            self,
+            pipelines,
+            dev_init_mode=SetPipelineReq.DevInitMode.FAST_RECONFIG,
+            cache=None):
+        """ Push programs to the device without switching traffic over to
+        them, so that their tables can be populated first, then retrieve the
+        new BfRt info. See :py:meth:`warm_init`.
+        """
+        self.push_pipeline(
+            pipelines,
+            SetPipelineReq.VERIFY_AND_WARM_INIT_BEGIN,
+            dev_init_mode,
+            cache)
+        self.retrieve_config()
+
+    def end_warm_init(self):
+        """ Switch traffic over to the programs pushed by
+        :py:meth:`begin_warm_init`. """
+        return self.push_pipeline([], SetPipelineReq.WARM_INIT_END)
+
+    def capture_tables(self, table_names, program_name=None, from_hw=None):
+        """ Read and keep every entry of tables, to be written again with
+        :py:meth:`replay_tables`, e.g. into a new program.
+
+        Default entries are skipped. Entries are decoded with the BfRt info
+        at the time of reading, so can be replayed by name after it changes.
+
+        Args:
+            table_names (list): Names of the tables to read.
+            program_name (str, optional): Default is the connected program.
+            from_hw (bool, optional): See :py:meth:`read_table`.
+
+        Returns:
+            list: The :py:class:`ReadEntry` of each entry, table by table.
+        """
+        entries = []
+        for table_name in table_names:
+            for entry in self.read_table(table_name, None, program_name, from_hw):
+                if not entry.is_default_entry:
+                    entries.append(entry)
+        return entries
+
+    def replay_tables(
+            self,
+            entries,
+            program_name=None,
+            max_bytes=DEFAULT_MAX_REQUEST_BYTES,
+            max_updates=None):
+        """ Insert entries saved by :py:meth:`capture_tables`, with batched
+        writes.
+
+        Entries are inserted with their action and it's parameters, if they
+        have one, and their other data fields, e.g. ``$ENTRY_TTL`` or direct
+        meter specs, less any which are read only. Requests are written as
+        soon as they are full, so only one is held in memory at a time.
+
+        Errors are raised as with :py:meth:`write_batch`.
+
+        Returns:
+            int: Number of entries written.
+        """
+        bfrt_info = self.helper.bfrt_info
+        batch = self.create_write_batch(
+            program_name, max_bytes=max_bytes, max_updates=max_updates)
+        written = 0
+        for entry in entries:
+            data = {}
+            for name, value in entry.data.items():
+                field = bfrt_info.get_data_field(entry.table_name, name)
+                if field is not None and not field.read_only:
+                    data[name] = value
+            action_name = entry.action_name
+            batch.add_data(
+                entry.table_name,
+                entry.key,
+                data,
+                action_name=action_name,
+                action_params=entry.action_params if action_name else None)
+            written += 1
+            if len(batch.requests) > 1:
+                self.write_requests(batch.pop_full())
+        self.write_requests(batch.pop_all())
+        return written
+
+    def warm_init(
+            self,
+            pipelines,
+            tables=(),
+            replay=None,
+            from_hw=None,
+            dev_init_mode=SetPipelineReq.DevInitMode.FAST_RECONFIG,
+            cache=None):
+        """ Push programs to the device, and replay the state of tables into
+        them before they carry traffic.
+
+        Rather than pushing with ``VERIFY_AND_WARM_INIT_BEGIN_AND_END`` and
+        then repopulating the tables of a live program, the entries of
+        ``tables`` are read from the running program with
+        :py:meth:`capture_tables`, the program is pushed with
+        ``VERIFY_AND_WARM_INIT_BEGIN``, the entries are written into it with
+        batched writes by :py:meth:`replay_tables`, and ``WARM_INIT_END``
+        switches over to the populated program::
+
+            timings = connection.warm_init(
+                pipelines, ["pipe.Ingress.ipv4_route", "pipe.Ingress.acl"]
+            )
+
+        The state can instead come from elsewhere, e.g. a file, by giving a
+        ``replay`` callback, in which case no tables are captured::
+
+            def replay(connection):
+                loader = TableLoader(
+                    connection.helper,
+                    connection.p4_name,
+                    "pipe.Ingress.ipv4_route",
+                    "Ingress.route",
+                )
+                with open("routes.csv", newline="") as f:
+                    return load(connection, loader, read_csv(f))
+
+            timings = connection.warm_init(pipelines, replay=replay)
+
+        If the replay raises, the exception is passed on without ending the
+        warm init, so that the state can be replayed again before calling
+        :py:meth:`end_warm_init`.
+
+        Args:
+            pipelines (list): The :py:class:`Pipeline` of each program.
+            tables (list): Names of the tables whose entries are replayed.
+            replay (callable, optional): Called with the connection, once it
+                has the new BfRt info, to write the table state instead. May
+                return the number of entries written.
+            from_hw (bool, optional): See :py:meth:`read_table`.
+            dev_init_mode (SetForwardingPipelineConfigRequest.DevInitMode):
+                How the device is reinitialised.
+            cache (PipelineCache, optional): Cache of encoded requests.
+
+        Returns:
+            WarmInitTimings
+        """
+        timings = WarmInitTimings()
+        start = time.monotonic()
+        entries = []
+        if replay is None:
+            entries = self.capture_tables(tables, from_hw=from_hw)
+        begin_start = time.monotonic()
+        timings.capture = begin_start - start
+        self.begin_warm_init(pipelines, dev_init_mode, cache)
+        replay_start = time.monotonic()
+        timings.begin = replay_start - begin_start
+        if replay is None:
+            timings.entries = self.replay_tables(entries)
+        else:
+            timings.entries = replay(self)
+        end_start = time.monotonic()
+        timings.replay = end_start - replay_start
+        self.end_warm_init()
+        timings.end = time.monotonic() - end_start
+        return timings
+
     def close(self):
         """ Close connection to the gRPC interface."""
         self.queue_out.put(None)
@@ -3,6 +3,7 @@
 
 
 import ipaddress
+import operator
 
 from enum import Enum
 from bfrt_helper.util import InvalidValue
@@ -21,13 +22,56 @@ class MismatchedTypes(Exception):
         )
 
 
+_slot_names_cache = {}
+
+
+def _slot_names(cls):
+    """Retrieves the names of all slots declared by a class and it's bases.
+
+    Names are ordered from the base class down, and in declaration order
+    within each class. ``__dict__`` and ``__weakref__`` are excluded.
+    """
+    names = _slot_names_cache.get(cls)
+    if names is None:
+        names = []
+        for klass in reversed(cls.__mro__):
+            slots = klass.__dict__.get("__slots__", ())
+            if isinstance(slots, str):
+                slots = (slots,)
+            for name in slots:
+                if name not in ("__dict__", "__weakref__") and name not in names:
+                    names.append(name)
+        names = tuple(names)
+        _slot_names_cache[cls] = names
+    return names
+
+
 class JSONSerialisable:
     """Base class that enables converting a derived's contents to JSON"""
 
+    __slots__ = ()
+
+    def _members(self):
+        """Returns the ``(name, value)`` pairs of an object's attributes.
+
+        These are taken from the object's slots, in declaration order, followed
+        by the contents of it's ``__dict__``, if it has one. Unset slots are
+        skipped.
+        """
+        pairs = []
+        for name in _slot_names(self.__class__):
+            try:
+                pairs.append((name, getattr(self, name)))
+            except AttributeError:
+                pass
+        if hasattr(self, "__dict__"):
+            pairs.extend(self.__dict__.items())
+        return pairs
+
     def json(self):
         """Generates a dictionary representation of a classes contents."""
         result = {}
-        for key, value in self.__dict__.items():
+        for key, value in self._members():
             result[key] = JSONSerialisable.serialise(value)
         return result
 
@@ -48,6 +92,16 @@ class JSONSerialisable:
             return value
 
 
+_set_slot = object.__setattr__
+
+_FIELD_SLOTS = frozenset(("value", "_bytes"))
+"""Attributes of :py:class:`Field` which cannot be set once a field is
+created."""
+
+FLYWEIGHT_MAX_BITWIDTH = 16
+"""Widest fields whose instances are shared by :py:meth:`Field.flyweight`."""
+
+
 def type_check(a, b):
     if type(a) is not type(b):
         raise MismatchedTypes(a, b)
@@ -63,35 +117,94 @@ class Field(JSONSerialisable):
     Internally, the value is stored as an integer, since bitwise operations are
     easier to apply.
 
+    Fields are slotted, so that holding many of them, e.g. a copy of a large
+    table, does not cost a ``__dict__`` each. Subclasses should declare
+    ``__slots__ = ()`` to keep this. The bitwidth is only held by the class,
+    which also precomputes the maximum value when it is defined.
+
+    Fields are immutable, so can be shared, e.g. as the masks of many matches.
+    This lets a field encode it's value to bytes once, on the first call to
+    :py:meth:`to_bytes`, and reuse it afterwards.
+
     Raises:
         InvalidValue:
             Raised if the value assigned to the object is greater than the
             maximum permissable value
     """
 
+    __slots__ = ("value", "_bytes")
+
+    _max_value = None
+    _n_bytes = None
+    _flyweights = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        bitwidth = getattr(cls, "bitwidth", None)
+        if bitwidth is None:
+            cls._max_value = cls._n_bytes = None
+        else:
+            cls._max_value = (1 << bitwidth) - 1
+            cls._n_bytes = (bitwidth + 7) // 8
+        narrow = bitwidth is not None and bitwidth <= FLYWEIGHT_MAX_BITWIDTH
+        cls._flyweights = {} if narrow else None
+
     def __init__(self, value=0):
+        max_value = self._max_value
+        if max_value is not None and value > max_value:
+            msg = f"Value {value} is greater than the maximum allowed for "
+            msg += "this "
+            msg += f" field. [max={max_value}, bitwidth={self.bitwidth}]"
+            raise InvalidValue(msg)
+        _set_slot(self, "value", value)
+        _set_slot(self, "_bytes", None)
+
+    def __setattr__(self, name, value):
+        if name in _FIELD_SLOTS:
+            raise AttributeError(f"{self.__class__.__qualname__} is immutable")
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name):
+        if name in _FIELD_SLOTS:
+            raise AttributeError(f"{self.__class__.__qualname__} is immutable")
+        object.__delattr__(self, name)
+
+    def __setstate__(self, state):
+        # Restores a pickled or copied field, which would otherwise be set
+        # with ``setattr``.
+        instance_dict, slots = state if isinstance(state, tuple) else (state, None)
+        for items in (instance_dict, slots):
+            for name, value in (items or {}).items():
+                _set_slot(self, name, value)
 
-        if hasattr(self, "bitwidth"):
-            max_value = self.__class__.max_value()
-            if value > max_value:
-                msg = f"Value {value} is greater than the maximum allowed for "
-                msg += "this "
-                msg += f" field. [max={max_value}, bitwidth={self.bitwidth}]"
-                raise InvalidValue(msg)
-        self.value = value
-
-    def __new__(cls, *args, **kwargs):
-        instance = super().__new__(cls)
-        if hasattr(cls, "bitwidth"):
-            instance.bitwidth = cls.bitwidth
-        return instance
+    def json(self):
+        """Generates a dictionary of the field's bitwidth, if it has one, and
+        value."""
+        result = {}
+        if self._max_value is not None:
+            result["bitwidth"] = self.bitwidth
+        result["value"] = JSONSerialisable.serialise(self.value)
+        if hasattr(self, "__dict__"):
+            for key, value in self.__dict__.items():
+                result[key] = JSONSerialisable.serialise(value)
+        return result
 
     def to_bytes(self):
         """Converts internal value to a byte array representing the contents
 
-        When marshalling to gRPC, the byte representation is used.
+        When marshalling to gRPC, the byte representation is used. It is
+        calculated once, then reused.
         """
-        return encode_number(self.value, self.bitwidth)
+        data = self._bytes
+        if data is not None:
+            return data
+        n_bytes = self._n_bytes
+        if n_bytes is None:
+            data = encode_number(self.value, self.bitwidth)
+        else:
+            data = self.value.to_bytes(n_bytes, "big")
+        _set_slot(self, "_bytes", data)
+        return data
 
     @classmethod
     def from_bytes(cls, data):
@@ -100,12 +213,55 @@ class Field(JSONSerialisable):
         """
         return cls(int.from_bytes(data, "big"))
 
+    @classmethod
+    def flyweight(cls, value):
+        """Retrieves the shared instance of the field with the given value.
+
+        Fields of up to :py:data:`FLYWEIGHT_MAX_BITWIDTH` bits, e.g.
+        :py:class:`PortId` or :py:class:`VlanID`, take few distinct values,
+        which repeat across many table entries. Rather than creating an
+        instance per entry, this creates one per value, already encoded, and
+        returns it every time. As fields are immutable, sharing them does not
+        change how they behave.
+
+        Example::
+
+            entries = [
+                ({"ig_intr_md.ingress_port": Exact(PortId.flyweight(port))}, ...)
+                for port in ports
+            ]
+
+        Wider fields have too many values to hold, so a new instance is
+        returned.
+
+        Values are converted to ``int`` first, so that e.g. ``True`` and
+        ``1``, which are equal keys, give an instance whose value is ``1``.
+
+        Args:
+            value: The value, as accepted by the class's constructor.
+
+        Raises:
+            TypeError: If a narrow field's value is not an integer.
+        """
+        instances = cls._flyweights
+        if instances is None:
+            return cls(value)
+        value = operator.index(value)
+        instance = instances.get(value)
+        if instance is None:
+            instance = cls(value)
+            instance.to_bytes()
+            instances[value] = instance
+        return instance
+
     @classmethod
     def max_value(cls):
         """Using the derived classes bitwidth, retrieve the maximum value. This
         is :math:`2^x-1`.
         """
-        return 2**cls.bitwidth - 1
+        if cls._max_value is None:
+            return 2**cls.bitwidth - 1
+        return cls._max_value
 
     def __str__(self):
         if isinstance(self.value, str):
@@ -172,6 +328,8 @@ class StringField(Field):
         even required), by any available gRPC function (so far).
     """
 
+    __slots__ = ()
+
     def __and__(self, other):
         raise InvalidOperation("StringField.__and__ not allowed")
 
@@ -207,6 +365,8 @@ class IPv4Address(Field):
         address (str): Dotted decimal IPv4 address string
     """
 
+    __slots__ = ()
+
     bitwidth = 32
 
     def __init__(self, address: str):
@@ -241,6 +401,8 @@ class MACAddress(Field):
         address (str): Colon seperated 6 byte hexadecimal address string.
     """
 
+    __slots__ = ()
+
     bitwidth = 48
 
     def __init__(self, address):
@@ -266,6 +428,8 @@ class PortId(Field):
         value (int): Port id.
     """
 
+    __slots__ = ()
+
     bitwidth = 9
 
 
@@ -276,14 +440,20 @@ class MulticastGroupId(Field):
         value (int): Group id.
     """
 
+    __slots__ = ()
+
     bitwidth = 16
 
 
 class MulticastNodeId(Field):
+    __slots__ = ()
+
     bitwidth = 32
 
 
 class DevPort(Field):
+    __slots__ = ()
+
     bitwidth = 32
 
 
@@ -294,12 +464,16 @@ class VlanID(Field):
         value (int): VLAN id.
     """
 
+    __slots__ = ()
+
     bitwidth = 12
 
 
 class EgressSpec(Field):
     """Legacy port representation"""
 
+    __slots__ = ()
+
     bitwidth = 9
 
 
@@ -320,6 +494,8 @@ class DigestType(Field):
     is useful for storing when received.
     """
 
+    __slots__ = ()
+
     bitwidth = 3
 
 
@@ -330,8 +506,32 @@ class ReplicationId(Field):
     perform additional operations when moving packets across multicast groups.
     """
 
+    __slots__ = ()
+
     bitwidth = 16
 
 
 class Layer2Port(Field):
+    __slots__ = ()
+
     bitwidth = 16
+
+
+_field_classes = {}
+
+
+def field_class(bitwidth):
+    """Retrieves a :py:class:`Field` class of the given bitwidth, for values
+    which have no more specific type, e.g. those parsed from a file or read
+    from the server.
+
+    Classes are created once per bitwidth, so values of the same width are of
+    the same type.
+    """
+    cls = _field_classes.get(bitwidth)
+    if cls is None:
+        cls = type(
+            f"Bits{bitwidth}", (Field,), {"__slots__": (), "bitwidth": bitwidth}
+        )
+        _field_classes[bitwidth] = cls
+    return cls
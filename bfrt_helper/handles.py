@@ -0,0 +1,215 @@
+"""Modification and deletion of table entries by handle.
+
+The server gives every table entry a handle. Modifying or deleting an entry
+by it's handle, rather than it's key, makes for a smaller request, which is
+cheaper to encode, and saves the server looking up the key. This matters most
+for tables with wide keys, e.g. ternary matches on IPv6 addresses, which see
+a lot of churn.
+
+Neither write responses nor the entries of a table read include handles, so
+they are read, in bulk, for the keys of existing entries, and cached by
+:py:class:`HandleCache`. The keys can be given, taken from a read of the
+whole table, or be those of the entries inserted through the cache::
+
+    handles = HandleCache("pipe.Ingress.acl")
+    handles.fetch_table(connection)
+
+    batch = connection.create_wire_write_batch()
+    for key, params in changes:
+        handles.modify(batch, key, "Ingress.permit", params)
+    for key, params in additions:
+        handles.insert(batch, key, "Ingress.permit", params)
+    connection.write_batch(batch)
+    # Picks up the handles of the inserted entries.
+    handles.fetch(connection)
+
+Entries without a cached handle are modified or deleted by key, so a partly
+filled cache is still correct.
+"""
+
+import itertools
+
+from bfrt_helper.match import LongestPrefixMatch
+from bfrt_helper.match import Optional
+from bfrt_helper.match import Range
+from bfrt_helper.match import Ternary
+
+
+DEFAULT_HANDLE_READ_SIZE = 4096
+"""Default number of handles read per request by :py:meth:`HandleCache.fetch`."""
+
+
+class MismatchedHandles(Exception):
+    """Exception raised when a read of handles returns a different number of
+    handles than keys were read, so the handles cannot be matched to their
+    keys.
+
+    Args:
+        table_name (str): Name of the table read.
+        n_keys (int): Number of keys read.
+        n_handles (int): Number of handles returned.
+    """
+
+    def __init__(self, table_name: str, n_keys: int, n_handles: int):
+        super().__init__(
+            f"Read of {n_keys} handles of table {table_name} returned {n_handles}"
+        )
+
+
+def match_key(match):
+    """Converts a match to the bytes it is encoded as in a key field, with
+    it's kind.
+
+    Fields of different classes but the same value, e.g. a :py:class:`PortId`
+    and the field a key read from the server is decoded to, are encoded the
+    same, and, unlike the fields themselves, can be compared.
+
+    Returns:
+        tuple
+    """
+    if isinstance(match, Ternary):
+        return ("ternary", match.value_bytes(), match.mask_bytes())
+    elif isinstance(match, LongestPrefixMatch):
+        return ("lpm", match.value_bytes(), match.prefix)
+    elif isinstance(match, Optional):
+        return ("optional", match.value_bytes(), match.is_valid)
+    elif isinstance(match, Range):
+        return ("range", match.low_bytes(), match.high_bytes())
+    return ("exact", match.value_bytes())
+
+
+def handle_key(key):
+    """Converts the key of an entry to the form used to look it up in a
+    :py:class:`HandleCache`, which does not depend on the order of it's
+    fields, or the classes of it's fields' values.
+
+    Args:
+        key (dict): Dictionary of match field names to their match.
+
+    Returns:
+        tuple: The name and :py:func:`match_key` of each field, by name.
+    """
+    return tuple(sorted((name, match_key(match)) for name, match in key.items()))
+
+
+class HandleCache:
+    """The handles of a table's entries, by key.
+
+    Keys are compared by the encoded values of their matches, so need not be
+    the same objects used to fetch the handles, e.g. they can be the keys of
+    entries read with :py:meth:`BfRtConnection.read_table`.
+
+    Args:
+        table_name (str): Name of the table within the program.
+    """
+
+    def __init__(self, table_name):
+        self.table_name = table_name
+        self.handles = {}
+        self.pending = {}
+
+    def get(self, key):
+        """Retrieves the handle of an entry, or ``None`` if not cached."""
+        return self.handles.get(handle_key(key))
+
+    def add(self, key, handle_id):
+        """Caches the handle of an entry."""
+        self.handles[handle_key(key)] = handle_id
+
+    def discard(self, key):
+        """Removes the handle of an entry, e.g. once it is deleted."""
+        cache_key = handle_key(key)
+        self.handles.pop(cache_key, None)
+        self.pending.pop(cache_key, None)
+
+    def clear(self):
+        self.handles.clear()
+        self.pending.clear()
+
+    def fetch(
+        self,
+        connection,
+        keys=None,
+        program_name=None,
+        chunk_size=DEFAULT_HANDLE_READ_SIZE,
+    ):
+        """Reads and caches the handles of existing entries.
+
+        Args:
+            connection (BfRtConnection): The connection to read with.
+            keys: Iterable of the keys of the entries. Default is those of the
+                entries inserted with :py:meth:`insert` since they were last
+                fetched.
+            program_name (str, optional): Default is the connected program.
+            chunk_size (int): Number of handles read per request.
+
+        Raises:
+            MismatchedHandles: If a read returns a different number of handles
+                than keys were read. Handles of earlier reads are kept.
+        """
+        if keys is None:
+            keys = list(self.pending.values())
+        keys = iter(keys)
+        while True:
+            chunk = list(itertools.islice(keys, chunk_size))
+            if not chunk:
+                break
+            handles = connection.read_handles(self.table_name, chunk, program_name)
+            if len(handles) != len(chunk):
+                raise MismatchedHandles(self.table_name, len(chunk), len(handles))
+            for key, handle_id in zip(chunk, handles):
+                cache_key = handle_key(key)
+                self.handles[cache_key] = handle_id
+                self.pending.pop(cache_key, None)
+
+    def fetch_table(
+        self,
+        connection,
+        program_name=None,
+        from_hw=None,
+        chunk_size=DEFAULT_HANDLE_READ_SIZE,
+    ):
+        """Reads the entries of the table, with
+        :py:meth:`BfRtConnection.read_table`, and caches their handles.
+
+        Entries are read as their handles are fetched, so only a chunk of
+        their keys is held at a time. Arguments are as for :py:meth:`fetch`
+        and :py:meth:`BfRtConnection.read_table`.
+        """
+        entries = connection.read_table(self.table_name, None, program_name, from_hw)
+        keys = (entry.key for entry in entries if not entry.is_default_entry)
+        self.fetch(connection, keys, program_name, chunk_size)
+
+    def insert(self, batch, key, action_name=None, action_params=None):
+        """Adds an INSERT of an entry to a batch. Once the batch is written,
+        the entry's handle is read by the next :py:meth:`fetch` without
+        keys."""
+        batch.insert(self.table_name, key, action_name, action_params)
+        self.pending[handle_key(key)] = key
+
+    def modify(self, batch, key, action_name=None, action_params=None):
+        """Adds a MODIFY of an entry to a :py:class:`WriteBatch` or
+        :py:class:`WireWriteBatch`, by handle if it is cached, otherwise by
+        key."""
+        handle_id = self.get(key)
+        if handle_id is None:
+            batch.modify(self.table_name, key, action_name, action_params)
+        else:
+            batch.modify_handle(self.table_name, handle_id, action_name, action_params)
+
+    def delete(self, batch, key):
+        """Adds a DELETE of an entry to a batch, by handle if it is cached,
+        otherwise by key. The handle is removed from the cache."""
+        cache_key = handle_key(key)
+        self.pending.pop(cache_key, None)
+        handle_id = self.handles.pop(cache_key, None)
+        if handle_id is None:
+            batch.delete(self.table_name, key)
+        else:
+            batch.delete_handle(self.table_name, handle_id)
+
+    def __contains__(self, key):
+        return handle_key(key) in self.handles
+
+    def __len__(self):
+        return len(self.handles)
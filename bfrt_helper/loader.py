@@ -0,0 +1,508 @@
+"""Streaming bulk loading of table entries from files.
+
+Entries are read from a CSV or JSON lines file a record at a time, converted
+to key fields and action parameters using the table's schema in
+:py:class:`BfRtInfo`, and collected into batched write requests. Requests are
+handed on as soon as they are full, so memory use does not depend on the size
+of the file.
+
+Each record maps key field and action parameter names to their values. A
+CSV file has a header line naming it's columns::
+
+    hdr.ipv4.dst_addr,nexthop,port
+    10.0.0.0/24,1,64
+    10.0.1.0/24,2,65
+
+and each line of a JSON lines file is an object::
+
+    {"hdr.ipv4.dst_addr": "10.0.0.0/24", "nexthop": 1, "port": 64}
+
+Values are written as follows, depending on the key field's match type:
+
+* ``Exact``: ``value``
+* ``LongestPrefixMatch``: ``value/prefix_len``, or ``value`` for a full
+  length prefix.
+* ``Ternary``: ``value &&& mask``, or ``value`` to match on every bit.
+* ``Range``: ``low..high``, or ``value`` to match on only that value.
+* ``Optional``: ``value``, or ``_`` to match on any value.
+
+A value of a ``bytes``, ``uint16`` or ``uint32`` field may be an integer in
+decimal or ``0x`` prefixed hexadecimal, or, for fields of the right width, an
+IPv4, IPv6 or MAC address. Values of ``string`` fields are used as is, and
+``bool`` fields accept ``true`` and ``false``.
+
+The action is given when loading, or per record in a column named
+:py:data:`ACTION_COLUMN`. Empty values are ignored, so that a CSV file can
+hold records of actions with different parameters.
+
+The ``bfrt-load`` command loads a file into a table of a running device; run
+``bfrt-load --help`` for it's options.
+"""
+
+import argparse
+import csv
+import ipaddress
+import json
+import sys
+import time
+
+from bfrt_helper.pb2.bfruntime_pb2 import Update
+from bfrt_helper.pb2.bfruntime_pb2 import WriteRequest
+
+from bfrt_helper.bfrt import DEFAULT_MAX_REQUEST_BYTES
+from bfrt_helper.bfrt import UnknownKeyField
+from bfrt_helper.fields import StringField
+from bfrt_helper.fields import field_class
+from bfrt_helper.match import Exact
+from bfrt_helper.match import LongestPrefixMatch
+from bfrt_helper.match import Optional
+from bfrt_helper.match import Range
+from bfrt_helper.match import Ternary
+from bfrt_helper.wire import WireWriteBatch
+
+
+ACTION_COLUMN = "action"
+"""Name of the column giving the action of a record, if it differs from the
+one given when loading."""
+
+
+class LoaderError(Exception):
+    """Exception raised when a record cannot be loaded.
+
+    Args:
+        line (int): Line number of the record in the file.
+        reason (str): Why the record could not be loaded.
+    """
+
+    def __init__(self, line: int, reason: str):
+        self.line = line
+        super().__init__(f"Line {line}: {reason}")
+
+
+def parse_int(value, bitwidth):
+    """Parses an integer, or an address of a matching width.
+
+    Integers are decimal, unless prefixed with ``0x``, ``0o`` or ``0b``.
+
+    Args:
+        value (int or str): The value to parse.
+        bitwidth (int): The width of the field.
+
+    Returns:
+        int
+    """
+    if isinstance(value, bool):
+        raise ValueError(f"Expected an integer, have {value}")
+    if isinstance(value, int):
+        return value
+    value = value.strip()
+    if bitwidth == 48 and ":" in value:
+        return int(value.replace(":", ""), 16)
+    if (bitwidth == 32 and "." in value) or (bitwidth == 128 and ":" in value):
+        return int(ipaddress.ip_address(value))
+    if value[:2].lower() in ("0x", "0o", "0b"):
+        return int(value, 0)
+    # Zero padded decimals, e.g. "007" from a spreadsheet, are decimal.
+    return int(value, 10)
+
+
+def parse_bool(value):
+    """Parses a ``bool`` field value."""
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ("true", "1"):
+        return True
+    if text in ("false", "0"):
+        return False
+    raise ValueError(f"Expected true or false, have {value}")
+
+
+def field_bitwidth(info_type):
+    """Retrieves the bitwidth of an integer field type, or ``None`` if it is
+    not an integer."""
+    type_ = info_type.get("type")
+    if type_ == "bytes":
+        return info_type.get("width")
+    if type_ in ("uint8", "uint16", "uint32", "uint64"):
+        return int(type_[4:])
+    return None
+
+
+def parse_field(value, info_type):
+    """Parses a value of the given BfRt info type to a :py:class:`Field`.
+
+    Returns:
+        Field
+    """
+    bitwidth = field_bitwidth(info_type)
+    if bitwidth is not None:
+        return field_class(bitwidth)(parse_int(value, bitwidth))
+    if info_type.get("type") == "string":
+        return StringField(str(value))
+    raise ValueError(f"Unsupported type {info_type.get('type')}")
+
+
+def parse_param(value, info_type):
+    """Parses an action parameter value of the given BfRt info type."""
+    if info_type.get("type") == "bool":
+        return parse_bool(value)
+    if info_type.get("type") == "string":
+        return str(value)
+    return parse_field(value, info_type)
+
+
+def parse_match(value, match_type, info_type):
+    """Parses a key field value to a match of the given type."""
+    if match_type == "Exact":
+        return Exact(parse_field(value, info_type))
+    if match_type == "LongestPrefixMatch":
+        value = str(value)
+        if "/" in value:
+            value, prefix = value.rsplit("/", 1)
+            return LongestPrefixMatch(parse_field(value, info_type), int(prefix))
+        field = parse_field(value, info_type)
+        return LongestPrefixMatch(field, field.bitwidth)
+    if match_type == "Ternary":
+        value = str(value)
+        if "&&&" in value:
+            value, mask = value.split("&&&", 1)
+            return Ternary(
+                parse_field(value, info_type), parse_field(mask, info_type)
+            )
+        return Ternary(parse_field(value, info_type))
+    if match_type == "Range":
+        value = str(value)
+        if ".." in value:
+            low, high = value.split("..", 1)
+            return Range(parse_field(low, info_type), parse_field(high, info_type))
+        field = parse_field(value, info_type)
+        return Range(field, field)
+    if match_type == "Optional":
+        if str(value).strip() == "_":
+            return Optional(parse_field(0, info_type), is_valid=False)
+        return Optional(parse_field(value, info_type))
+    raise ValueError(f"Unsupported match type {match_type}")
+
+
+def read_csv(f):
+    """Reads records from a CSV file with a header line.
+
+    Yields:
+        ``(line, record)`` tuples.
+    """
+    reader = csv.DictReader(f, skipinitialspace=True)
+    for record in reader:
+        yield reader.line_num, record
+
+
+def read_jsonl(f):
+    """Reads records from a JSON lines file. Blank lines are skipped.
+
+    Yields:
+        ``(line, record)`` tuples.
+    """
+    for line, text in enumerate(f, 1):
+        if not text.strip():
+            continue
+        try:
+            record = json.loads(text)
+        except ValueError as err:
+            raise LoaderError(line, str(err)) from err
+        yield line, record
+
+
+READERS = {
+    "csv": read_csv,
+    "jsonl": read_jsonl,
+}
+"""Maps file formats to the function which reads records from them."""
+
+
+class TableLoader:
+    """Converts records to writes of a match-action table.
+
+    Args:
+        helper (BfRtHelper): The helper for the program.
+        program_name (str): Name of program to target.
+        table_name (str): Name of table within the program.
+        action_name (str, optional): Action of records which do not name one
+            in :py:data:`ACTION_COLUMN`.
+        update_type (Update.Type): The type of operation of every record.
+        atomicity (WriteRequest.Atomicity): See
+            :py:meth:`BfRtHelper.create_write_request`.
+        max_bytes (int, optional): See :py:class:`WriteBatch`.
+        max_updates (int, optional): See :py:class:`WriteBatch`.
+
+    Raises:
+        UnknownTable: If the table does not exist.
+    """
+
+    def __init__(
+        self,
+        helper,
+        program_name,
+        table_name,
+        action_name=None,
+        update_type=Update.Type.INSERT,
+        atomicity=WriteRequest.Atomicity.CONTINUE_ON_ERROR,
+        max_bytes=DEFAULT_MAX_REQUEST_BYTES,
+        max_updates=None,
+    ):
+        self.helper = helper
+        self.table_name = table_name
+        self.action_name = action_name
+        self.update_type = update_type
+        self.batch = WireWriteBatch(
+            helper,
+            program_name,
+            atomicity,
+            max_bytes=max_bytes,
+            max_updates=max_updates,
+        )
+        # Fail early on an unknown table or action.
+        self.batch.prepared(table_name, action_name)
+        # Line numbers of the updates in the batch, from update number
+        # ``_first`` onwards.
+        self._lines = []
+        self._first = 0
+
+    def parse(self, record):
+        """Converts a record to it's key, action name and action parameters.
+
+        Returns:
+            tuple: ``(key, action_name, action_params)``
+
+        Raises:
+            UnknownKeyField: If a column is neither a key field or a parameter
+                of the action.
+        """
+        bfrt_info = self.helper.bfrt_info
+        action_name = record.get(ACTION_COLUMN) or self.action_name
+        if self.update_type == Update.Type.DELETE:
+            action_name = None
+        key = {}
+        action_params = {} if action_name is not None else None
+        for name, value in record.items():
+            # Empty CSV cells, e.g. parameters of another record's action.
+            if name == ACTION_COLUMN or value is None or value == "":
+                continue
+            info_key = bfrt_info.get_key(self.table_name, name)
+            if info_key is not None:
+                key[name] = parse_match(value, info_key.match_type, info_key.type)
+                continue
+            info_param = None
+            if action_name is not None:
+                info_param = bfrt_info.get_action_field(
+                    self.table_name, action_name, name
+                )
+            if info_param is None:
+                if self.update_type == Update.Type.DELETE:
+                    continue
+                raise UnknownKeyField(self.table_name, name)
+            action_params[name] = parse_param(value, info_param.type)
+        return key, action_name, action_params
+
+    def add(self, line, record):
+        """Adds a record to the batch.
+
+        Raises:
+            LoaderError: If the record could not be converted.
+        """
+        try:
+            key, action_name, action_params = self.parse(record)
+            writer = self.batch.prepared(self.table_name, action_name)
+            self.batch.add_prepared(writer, key, action_params, self.update_type)
+        except Exception as err:
+            raise LoaderError(line, str(err)) from err
+        self._lines.append(line)
+
+    def _with_lines(self, pairs):
+        """Adds the range of lines the updates were read from to each
+        ``(request, range)`` pair."""
+        result = []
+        for request, entries in pairs:
+            first = self._lines[entries.start - self._first]
+            last = self._lines[entries.stop - 1 - self._first]
+            result.append((request, entries, range(first, last + 1)))
+        if pairs:
+            done = pairs[-1][1].stop - self._first
+            del self._lines[:done]
+            self._first += done
+        return result
+
+    def requests(self, records):
+        """Converts records to serialised write requests.
+
+        Args:
+            records: Iterable of ``(line, record)`` tuples, e.g. from
+                :py:func:`read_csv`.
+
+        Yields:
+            ``(request, entries, lines)`` tuples, where ``entries`` is the
+            range of update numbers in the request, as with
+            :py:meth:`WriteBatch.pop_full`, and ``lines`` is the range of line
+            numbers the request's records were read from.
+        """
+        for line, record in records:
+            self.add(line, record)
+            if self.batch.requests:
+                yield from self._with_lines(self.batch.pop_full())
+        yield from self._with_lines(self.batch.pop_all())
+
+
+class Progress:
+    """Reports the number of entries loaded, and the rate they are loaded at.
+
+    Args:
+        stream (file, optional): Where to write reports. Default is
+            ``sys.stderr``.
+        interval (float, optional): Minimum seconds between reports.
+    """
+
+    def __init__(self, stream=None, interval=1.0):
+        self.stream = stream if stream is not None else sys.stderr
+        self.interval = interval
+        self.entries = 0
+        self.start = time.monotonic()
+        self.last = self.start
+
+    def rate(self, now=None):
+        """Entries loaded per second so far."""
+        elapsed = (now if now is not None else time.monotonic()) - self.start
+        return self.entries / elapsed if elapsed > 0 else 0.0
+
+    def update(self, entries):
+        """Accounts for newly loaded entries, reporting if due."""
+        self.entries += entries
+        now = time.monotonic()
+        if now - self.last >= self.interval:
+            self.last = now
+            self.report(now)
+
+    def report(self, now=None):
+        """Writes the number of entries loaded and the rate."""
+        print(
+            f"{self.entries} entries, {self.rate(now):.0f} entries/s",
+            file=self.stream,
+        )
+
+    def finish(self):
+        """Reports the final count and rate."""
+        self.report()
+
+
+def load(connection, loader, records, progress=None):
+    """Writes records to a device.
+
+    Args:
+        connection (BfRtConnection): The connection to write with.
+        loader (TableLoader): Converts the records.
+        records: Iterable of ``(line, record)`` tuples.
+        progress (Progress, optional): Reports progress.
+
+    Returns:
+        int: Number of entries written.
+
+    Raises:
+        LoaderError: If a record could not be converted.
+        BatchWriteError: If a request fails. The ``failed`` attribute is the
+            range of lines in the failed request, and the message names them
+            as lines.
+    """
+    written = 0
+    for request, entries, lines in loader.requests(records):
+        connection.write_requests([(request, lines)], unit="lines")
+        written += len(entries)
+        if progress is not None:
+            progress.update(len(entries))
+    if progress is not None:
+        progress.finish()
+    return written
+
+
+UPDATE_TYPES = {
+    "insert": Update.Type.INSERT,
+    "modify": Update.Type.MODIFY,
+    "delete": Update.Type.DELETE,
+}
+
+ATOMICITIES = {
+    "continue": WriteRequest.Atomicity.CONTINUE_ON_ERROR,
+    "rollback": WriteRequest.Atomicity.ROLLBACK_ON_ERROR,
+    "dataplane-atomic": WriteRequest.Atomicity.DATAPLANE_ATOMIC,
+}
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(
+        prog="bfrt-load",
+        description="Load table entries from a CSV or JSON lines file.",
+    )
+    parser.add_argument("file", help="File of entries, or - for stdin")
+    parser.add_argument("table", help="Name of the table to load")
+    parser.add_argument("--action", help="Action of entries without one")
+    parser.add_argument("--host", default="localhost:50052")
+    parser.add_argument("--device-id", type=int, default=0)
+    parser.add_argument("--client-id", type=int, default=0)
+    parser.add_argument(
+        "--program", help="Program to target. Default is the running program"
+    )
+    parser.add_argument(
+        "--format",
+        choices=sorted(READERS),
+        help="Format of the file. Default is taken from it's extension",
+    )
+    parser.add_argument(
+        "--update-type", choices=sorted(UPDATE_TYPES), default="insert"
+    )
+    parser.add_argument(
+        "--atomicity", choices=sorted(ATOMICITIES), default="continue"
+    )
+    parser.add_argument("--max-updates", type=int)
+    parser.add_argument("--max-bytes", type=int, default=DEFAULT_MAX_REQUEST_BYTES)
+    parser.add_argument("--cache-dir", help="Cache parsed BfRt info here")
+    parser.add_argument("--quiet", action="store_true", help="Do not report progress")
+    return parser
+
+
+def main(argv=None):
+    """Entry point of the ``bfrt-load`` command."""
+    from bfrt_helper.connection import BfRtConnection
+
+    args = make_parser().parse_args(argv)
+    file_format = args.format
+    if file_format is None:
+        file_format = "jsonl" if args.file.endswith((".jsonl", ".json")) else "csv"
+
+    connection = BfRtConnection(
+        args.host, args.device_id, args.client_id, cache_dir=args.cache_dir
+    )
+    try:
+        program_name = args.program or connection.p4_name
+        loader = TableLoader(
+            connection.helper,
+            program_name,
+            args.table,
+            args.action,
+            UPDATE_TYPES[args.update_type],
+            ATOMICITIES[args.atomicity],
+            args.max_bytes,
+            args.max_updates,
+        )
+        progress = None if args.quiet else Progress()
+        if args.file == "-":
+            load(connection, loader, READERS[file_format](sys.stdin), progress)
+        else:
+            with open(args.file, newline="") as f:
+                load(connection, loader, READERS[file_format](f), progress)
+    except Exception as err:
+        print(f"bfrt-load: {err}", file=sys.stderr)
+        return 1
+    finally:
+        connection.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,6 +15,35 @@ class MismatchedKeys(Exception):
         super().__init__(message)
 
 
+_prefix_masks = {}
+
+
+def prefix_mask(cls, prefix):
+    """Retrieves the mask of a field class which matches the first ``prefix``
+    bits of a value, e.g. ``255.255.255.0`` for ``IPv4Address`` and 24.
+
+    Fields are immutable, so each mask is created once per class and prefix
+    length, then shared by every match using it, along with it's encoded
+    bytes.
+
+    Args:
+        cls (type): The :py:class:`Field` class of the mask.
+        prefix (int): Number of leading bits matched, from zero to the
+            bitwidth of the class.
+
+    Returns:
+        Field
+    """
+    key = (cls, prefix)
+    mask = _prefix_masks.get(key)
+    if mask is None:
+        bitwidth = cls.bitwidth
+        mask_int = mask_from_prefix(bitwidth, prefix)
+        mask = cls.from_bytes(mask_int.to_bytes((bitwidth + 7) // 8, "big"))
+        _prefix_masks[key] = mask
+    return mask
+
+
 class Masked:
     """Base class for all matches which can be represented in terms of a value
     and a mask.
@@ -383,15 +412,8 @@ class Ternary(Masked):
         self.mask = mask
 
         if mask is None:
-            required_bytes = (value.bitwidth + 7) // 8
-            if dont_care:
-                mask_int = 0
-                mask_bytes = mask_int.to_bytes(required_bytes, "big")
-                mask = value.__class__.from_bytes(mask_bytes)
-            else:
-                mask_int = (1 << value.bitwidth) - 1
-                mask_bytes = mask_int.to_bytes(required_bytes, "big")
-                mask = value.__class__.from_bytes(mask_bytes)
+            prefix = 0 if dont_care else value.bitwidth
+            mask = prefix_mask(value.__class__, prefix)
         elif not isinstance(mask, value.__class__):
             mask = value.__class__(mask)
 
@@ -457,7 +479,7 @@ class LongestPrefixMatch(Masked):
             msg = f"Prefix {prefix} is greater than the maximum allowed for "
             msg += f"this field. [bitwidth={value.bitwidth}]"
             raise InvalidValue(msg)
-        self.mask = value.__class__((2**prefix - 1) << (value.bitwidth - prefix))
+        self.mask = prefix_mask(value.__class__, prefix)
         self.value = value & self.mask
         self.prefix = prefix
 
@@ -471,6 +493,58 @@ class LongestPrefixMatch(Masked):
         return self.value.to_bytes()
 
 
+class Optional(Masked):
+    """Matches either a value exactly, or any value.
+
+    An ``Optional`` match is a ternary match whose mask is either all ones or
+    all zeroes, and is declared in P4 with ``@match_kind(optional)``. It takes
+    less TCAM space than a ternary match of the same width.
+
+    As a :py:class:`Masked` match, it supports the same subset, superset and
+    overlap operations as a :py:class:`Ternary` match.
+
+    Examples:
+        A match on ``PortId`` 42::
+
+            my_field = Optional(PortId(42))
+
+        A match on any ``PortId``::
+
+            my_field = Optional(PortId(0), is_valid=False)
+
+    Args:
+        value (Field): The value to match.
+        is_valid (bool): If ``False``, any value is matched.
+    """
+
+    def __init__(self, value: Field, is_valid: bool = True):
+        super().__init__()
+        self.mask = prefix_mask(value.__class__, value.bitwidth if is_valid else 0)
+        self.value = value & self.mask
+        self.is_valid = bool(is_valid)
+
+    def intersection(self, other: "Optional") -> "Optional":
+        """See :py:meth:`Masked.intersection`"""
+        return Optional(self.value | other.value, self.is_valid or other.is_valid)
+
+    def merged(self, other: "Optional") -> "Optional":
+        """See :py:meth:`Masked.merged`"""
+        return Optional(self.value, self.is_valid and other.is_valid)
+
+    def value_bytes(self):
+        return self.value.to_bytes()
+
+    def __str__(self):
+        """Returns the value, or ``_`` if any value is matched, as it would be
+        written in P4."""
+        if not self.is_valid:
+            return "_"
+        return str(self.value)
+
+    def __repr__(self):
+        return f"Optional({repr(self.value)}, is_valid={self.is_valid})"
+
+
 class Exact:
     """An exact match
 
@@ -490,6 +564,164 @@ class Exact:
         return self.value.to_bytes()
 
 
+class Range:
+    """Matches values between two bounds, inclusive.
+
+    Both bounds are fields of the same type. As with :py:class:`Ternary`
+    masks, the upper bound can be given as any value accepted by the lower
+    bound's constructor.
+
+    Ranges can be compared and intersected in the same way as masked matches,
+    i.e. ``a <= b`` if every value in ``a`` is also in ``b``.
+
+    Example:
+        Matching on the well known TCP ports::
+
+            well_known = Range(Port(0), Port(1023))
+
+    Args:
+        low (Field): The lowest value matched.
+        high (Field): The highest value matched.
+
+    Raises:
+        InvalidValue: If ``high`` is less than ``low``.
+    """
+
+    def __init__(self, low: Field, high: Field):
+        if not isinstance(high, low.__class__):
+            high = low.__class__(high)
+        if high.value < low.value:
+            raise InvalidValue(f"Range upper bound {high} is less than {low}")
+        self.low = low
+        self.high = high
+
+    def low_bytes(self):
+        return self.low.to_bytes()
+
+    def high_bytes(self):
+        return self.high.to_bytes()
+
+    def subset_of(self, other: "Range") -> bool:
+        """Returns whether every value in ``self`` is also in ``other``."""
+        return other.low.value <= self.low.value and self.high.value <= other.high.value
+
+    def superset_of(self, other: "Range") -> bool:
+        """Returns whether every value in ``other`` is also in ``self``."""
+        return other.subset_of(self)
+
+    def proper_subset_of(self, other: "Range") -> bool:
+        return self.subset_of(other) and not self == other
+
+    def proper_superset_of(self, other: "Range") -> bool:
+        return self.superset_of(other) and not self == other
+
+    def intersection(self, other: "Range") -> "Range":
+        """Returns the values common to ``self`` and ``other``.
+
+        Raises:
+            InvalidOperation: If the ranges have no values in common.
+        """
+        low = max(self.low.value, other.low.value)
+        high = min(self.high.value, other.high.value)
+        if high < low:
+            raise InvalidOperation(f"Ranges {self} and {other} do not intersect")
+        cls = self.low.__class__
+        return Range(cls(low), cls(high))
+
+    def overlaps(self, other: "Range") -> bool:
+        """Returns whether the ranges share some, but not all, of their values,
+        i.e. neither is a subset of the other."""
+        if self.subset_of(other) or other.subset_of(self):
+            return False
+        return self.low.value <= other.high.value and other.low.value <= self.high.value
+
+    def to_ternary(self) -> list:
+        """Expands the range into ternary matches. See
+        :py:func:`range_to_ternary`."""
+        return range_to_ternary(self.low, self.high)
+
+    def __contains__(self, value: Field) -> bool:
+        return self.low.value <= value.value <= self.high.value
+
+    def __eq__(self, other: "Range") -> bool:
+        return self.low == other.low and self.high == other.high
+
+    def __hash__(self) -> int:
+        return hash((self.low, self.high))
+
+    def __le__(self, other: "Range") -> bool:
+        """See :meth:`subset_of`"""
+        return self.subset_of(other)
+
+    def __ge__(self, other: "Range") -> bool:
+        """See :meth:`superset_of`"""
+        return self.superset_of(other)
+
+    def __lt__(self, other: "Range") -> bool:
+        """See :meth:`proper_subset_of`"""
+        return self.proper_subset_of(other)
+
+    def __gt__(self, other: "Range") -> bool:
+        """See :meth:`proper_superset_of`"""
+        return self.proper_superset_of(other)
+
+    def __and__(self, other: "Range") -> "Range":
+        """See :meth:`intersection`"""
+        return self.intersection(other)
+
+    def __str__(self):
+        """Returns the range as it would be written in P4, e.g. ``0..1023``."""
+        return f"{self.low}..{self.high}"
+
+    def __repr__(self):
+        return f"Range({repr(self.low)}, {repr(self.high)})"
+
+
+def range_to_ternary(low: Field, high: Field) -> list:
+    """Expands a range of values into ternary matches, for tables which only
+    have ternary keys.
+
+    The range is covered by the fewest aligned power of two blocks, each of
+    which is a prefix, so no value outside of the range is matched and no two
+    matches overlap. For a ``w`` bit field, this takes at most ``2w - 2``
+    matches. For example, the TCP ports ``1..1023`` take 10 matches, whereas
+    ``0..1023`` takes only one.
+
+    Example:
+
+        >>> [str(t) for t in range_to_ternary(EightBit(3), EightBit(12))]
+        ['3', '4 &&& 252', '8 &&& 252', '12']
+
+    Args:
+        low (Field): The lowest value matched.
+        high (Field): The highest value matched. Can be any value accepted by
+            the lower bound's constructor.
+
+    Returns:
+        list: :py:class:`Ternary` matches, in ascending order of value.
+
+    Raises:
+        InvalidValue: If ``high`` is less than ``low``.
+    """
+    cls = low.__class__
+    if not isinstance(high, cls):
+        high = cls(high)
+    start = low.value
+    stop = high.value
+    if stop < start:
+        raise InvalidValue(f"Range upper bound {high} is less than {low}")
+    full_mask = (1 << low.bitwidth) - 1
+    matches = []
+    while start <= stop:
+        # The largest block aligned at ``start`` which doesn't pass ``stop``.
+        size = start & -start if start else 1 << low.bitwidth
+        while start + size - 1 > stop:
+            size >>= 1
+        matches.append(Ternary(cls(start), cls(full_mask ^ (size - 1))))
+        start += size
+    return matches
+
+
 class Key:
     """A collection of fields representing the key segment of a table defined in
     a P4 program.
@@ -563,7 +795,7 @@ class Key:
 
         for (k1, v1), (k2, v2) in zip(self.fields.items(), other.fields.items()):
 
-            if isinstance(v1, Ternary):
+            if isinstance(v1, (Ternary, Optional, Range)):
                 # args.append(v1.intersection(v2))
                 args[k1] = v1.intersection(v2)
             elif isinstance(v1, LongestPrefixMatch):
@@ -599,7 +831,7 @@ class Key:
 
         for (k1, v1), (k2, v2) in zip(self.fields.items(), other.fields.items()):
 
-            if isinstance(v1, Masked):
+            if isinstance(v1, (Masked, Range)):
                 acc = acc and v1 >= v2
             else:
                 acc = acc and v1 == v2
@@ -623,7 +855,7 @@ class Key:
 
         for (k1, v1), (k2, v2) in zip(self.fields.items(), other.fields.items()):
 
-            if isinstance(v1, Masked):
+            if isinstance(v1, (Masked, Range)):
                 acc = acc and v1 <= v2
             else:
                 acc = acc and v1 == v2
@@ -647,7 +879,7 @@ class Key:
 
         for (k1, v1), (k2, v2) in zip(self.fields.items(), other.fields.items()):
 
-            if isinstance(v1, Masked):
+            if isinstance(v1, (Masked, Range)):
                 acc = acc and v1 > v2
             else:
                 acc = acc and v1 == v2
@@ -671,7 +903,7 @@ class Key:
 
         for (k1, v1), (k2, v2) in zip(self.fields.items(), other.fields.items()):
 
-            if isinstance(v1, Masked):
+            if isinstance(v1, (Masked, Range)):
                 acc = acc and v1 < v2
             else:
                 acc = acc and v1 == v2
@@ -710,7 +942,7 @@ class Key:
 
         for (k1, v1), (k2, v2) in zip(self.fields.items(), other.fields.items()):
 
-            if isinstance(v1, Masked):
+            if isinstance(v1, (Masked, Range)):
                 acc = acc and (v1 >= v2 or v1 <= v2 or v1.overlaps(v2))
             else:
                 acc = acc and v1 == v2
@@ -741,7 +973,7 @@ class IPv4AddressTernary(Ternary):
         if not isinstance(value, IPv4Address):
             value = IPv4Address(value)
         if prefix:
-            mask = IPv4Address(mask_from_prefix(IPv4Address.bitwidth, prefix))
+            mask = prefix_mask(IPv4Address, prefix)
 
         super().__init__(value, mask, dont_care)
 
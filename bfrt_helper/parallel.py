@@ -0,0 +1,345 @@
+"""Encoding of table writes across a pool of processes.
+
+Encoding entries is CPU bound, and as it is performed by Python code, is
+limited to a single core by the GIL. This module shards entries across a
+``multiprocessing`` pool, where each worker encodes it's shards with a
+:py:class:`WireWriteBatch` and returns the serialised requests. The parent
+receives them in the order the entries were given, ready to be written.
+
+Workers are not given the BfRt info file. Instead, the parent's parsed
+:py:class:`BfRtInfo` is pickled once, and unpickled by each worker as it
+starts, which is much faster than parsing the file again.
+
+Example::
+
+    with ParallelEncoder(connection.helper) as encoder:
+        requests = encoder.encode(
+            "router",
+            "pipe.Ingress.ipv4_route",
+            entries,
+            action_name="Ingress.set_nexthop",
+        )
+        write_parallel(connection, requests)
+
+Entries are ``(key, action_params)`` tuples, as passed to
+:py:meth:`BfRtHelper.create_table_write`.
+
+**Shards**
+
+Entries given to :py:meth:`ParallelEncoder.encode` are pickled by the parent
+and unpickled by a worker. Pickling :py:class:`Field` and match objects costs
+more than encoding them, so the parent quickly becomes the bottleneck. To
+scale with the number of cores, the workers should instead create the entries
+themselves, with :py:meth:`ParallelEncoder.encode_shards`. The parent then
+only sends a small description of each shard, e.g. a range of rows or a
+region of a file, and a function which turns it into entries::
+
+    def route_entries(shard):
+        start, stop = shard
+        for row in range(start, stop):
+            ...
+            yield key, action_params
+
+    shards = [(start, start + 10000) for start in range(0, n_routes, 10000)]
+    requests = encoder.encode_shards(
+        "router", "pipe.Ingress.ipv4_route", shards, route_entries,
+        action_name="Ingress.set_nexthop",
+    )
+
+The function must be defined at the top level of a module, so that it can be
+pickled.
+
+Requests do not span shards, so the last request encoded from each shard may
+hold fewer updates than the limits allow. ``chunk_size`` should therefore be
+a good deal larger than the number of updates per request.
+"""
+
+import collections
+import itertools
+import multiprocessing
+import os
+import pickle
+
+from bfrt_helper.pb2.bfruntime_pb2 import Update
+from bfrt_helper.pb2.bfruntime_pb2 import WriteRequest
+
+from bfrt_helper.bfrt import BfRtHelper
+from bfrt_helper.bfrt import DEFAULT_MAX_REQUEST_BYTES
+from bfrt_helper.bfrt import PreparedTableWrite
+from bfrt_helper.wire import WireWriteBatch
+
+
+class ParallelEncodingError(Exception):
+    """Exception raised when an entry could not be encoded by a worker.
+
+    Exceptions raised by the helper cannot always be sent from a worker to the
+    parent, so are described by this exception instead.
+
+    Args:
+        number (int): Number of the entry, counting from zero.
+        reason (str): The exception raised when encoding the entry.
+    """
+
+    def __init__(self, number: int, reason: str):
+        # Both arguments are passed on, so that the exception can be pickled.
+        super().__init__(number, reason)
+        self.number = number
+        self.reason = reason
+
+    def __str__(self):
+        return f"Entry {self.number}: {self.reason}"
+
+
+_worker_helper = None
+
+
+def _init_worker(bfrt_info_data, device_id, client_id):
+    """Creates the helper of a worker process from the pickled BfRt info."""
+    global _worker_helper
+    _worker_helper = BfRtHelper(device_id, client_id, pickle.loads(bfrt_info_data))
+
+
+def _encode_shard(options, make_entries, shard):
+    """Encodes a shard of entries in a worker process.
+
+    If ``make_entries`` is ``None``, the shard is a list of entries, otherwise
+    it is called with the shard to create them.
+
+    Returns:
+        list: ``(bytes, range)`` pairs, numbered from the start of the shard.
+    """
+    entries = shard if make_entries is None else make_entries(shard)
+    batch = WireWriteBatch(
+        _worker_helper,
+        options["program_name"],
+        options["atomicity"],
+        options["target"],
+        options["max_bytes"],
+        options["max_updates"],
+    )
+    writer = batch.prepared(options["table_name"], options["action_name"])
+    update_type = options["update_type"]
+    for number, (key, action_params) in enumerate(entries):
+        try:
+            batch.add_prepared(writer, key, action_params, update_type)
+        except Exception as err:
+            raise ParallelEncodingError(number, f"{err.__class__.__name__}: {err}")
+    return batch.pop_all()
+
+
+class ParallelEncoder:
+    """A pool of processes for encoding table writes.
+
+    Args:
+        helper (BfRtHelper): The helper for the program. It's BfRt info,
+            device ID and client ID are used by each worker.
+        processes (int, optional): Number of worker processes. Default is the
+            number of CPUs.
+        chunk_size (int, optional): Number of entries in each shard.
+        context (optional): ``multiprocessing`` context to create the pool
+            with. Default is the default context.
+    """
+
+    def __init__(self, helper, processes=None, chunk_size=10000, context=None):
+        self.helper = helper
+        self.chunk_size = chunk_size
+        if context is None:
+            context = multiprocessing.get_context()
+        bfrt_info_data = pickle.dumps(helper.bfrt_info, pickle.HIGHEST_PROTOCOL)
+        self.pool = context.Pool(
+            processes,
+            initializer=_init_worker,
+            initargs=(bfrt_info_data, helper.device_id, helper.client_id),
+        )
+        self.processes = processes or os.cpu_count() or 1
+
+    def encode(
+        self,
+        program_name,
+        table_name,
+        entries,
+        action_name=None,
+        update_type=Update.Type.INSERT,
+        atomicity=WriteRequest.Atomicity.CONTINUE_ON_ERROR,
+        target: dict = {},
+        max_bytes=DEFAULT_MAX_REQUEST_BYTES,
+        max_updates=None,
+    ):
+        """Encodes writes of entries to a match-action table.
+
+        Entries are read from ``entries`` as the workers need them, in shards
+        of ``chunk_size``, so may be given by a generator. See the note on
+        shards above.
+
+        Args:
+            program_name (str): Name of program to target.
+            table_name (str): Name of table within the program.
+            entries: Iterable of ``(key, action_params)`` tuples.
+            action_name (str, optional): Name of the action of every entry.
+            update_type (Update.Type): The type of operation of every entry.
+            atomicity (WriteRequest.Atomicity): See
+                :py:meth:`BfRtHelper.create_write_request`.
+            target (dict): See :py:meth:`BfRtHelper.create_write_request`.
+            max_bytes (int, optional): See :py:class:`WriteBatch`.
+            max_updates (int, optional): See :py:class:`WriteBatch`.
+
+        Returns:
+            An iterator of ``(bytes, range)`` pairs of each serialised request
+            and the numbers of the entries in it, in order.
+
+        Raises:
+            UnknownTable: If the table does not exist, when called.
+            UnknownAction: If the table has no such action, when called.
+            ParallelEncodingError: If an entry could not be encoded, when it's
+                request is iterated.
+        """
+        entries = iter(entries)
+
+        def shards():
+            while True:
+                chunk = list(itertools.islice(entries, self.chunk_size))
+                if not chunk:
+                    return
+                yield chunk
+
+        return self._encode(
+            program_name,
+            table_name,
+            shards(),
+            None,
+            action_name,
+            update_type,
+            atomicity,
+            target,
+            max_bytes,
+            max_updates,
+        )
+
+    def encode_shards(
+        self,
+        program_name,
+        table_name,
+        shards,
+        make_entries,
+        action_name=None,
+        update_type=Update.Type.INSERT,
+        atomicity=WriteRequest.Atomicity.CONTINUE_ON_ERROR,
+        target: dict = {},
+        max_bytes=DEFAULT_MAX_REQUEST_BYTES,
+        max_updates=None,
+    ):
+        """Encodes writes of entries created by the workers.
+
+        Each shard is passed to ``make_entries`` in a worker, which returns an
+        iterable of ``(key, action_params)`` tuples. Entries are numbered in
+        order across all shards.
+
+        Args:
+            shards: Iterable of picklable shard descriptions. Read as the
+                workers need them, so may be given by a generator.
+            make_entries: Top level function creating the entries of a shard.
+
+        The remaining arguments, return value and exceptions are as for
+        :py:meth:`encode`.
+        """
+        return self._encode(
+            program_name,
+            table_name,
+            shards,
+            make_entries,
+            action_name,
+            update_type,
+            atomicity,
+            target,
+            max_bytes,
+            max_updates,
+        )
+
+    def _encode(
+        self,
+        program_name,
+        table_name,
+        shards,
+        make_entries,
+        action_name,
+        update_type,
+        atomicity,
+        target,
+        max_bytes,
+        max_updates,
+    ):
+        # Fail in the parent on an unknown table or action, rather than in
+        # every worker. This is not a generator, so fails when called, rather
+        # than when the requests are first iterated.
+        PreparedTableWrite(self.helper, table_name, action_name)
+
+        options = {
+            "program_name": program_name,
+            "table_name": table_name,
+            "action_name": action_name,
+            "update_type": update_type,
+            "atomicity": atomicity,
+            "target": target,
+            "max_bytes": max_bytes,
+            "max_updates": max_updates,
+        }
+        return self._requests(options, shards, make_entries)
+
+    def _requests(self, options, shards, make_entries):
+        shards = iter(shards)
+        pending = collections.deque()
+        offset = 0
+
+        def submit():
+            for shard in shards:
+                pending.append(
+                    self.pool.apply_async(_encode_shard, (options, make_entries, shard))
+                )
+                return True
+            return False
+
+        for _ in range(2 * self.processes):
+            if not submit():
+                break
+        while pending:
+            try:
+                pairs = pending.popleft().get()
+            except ParallelEncodingError as err:
+                raise ParallelEncodingError(offset + err.number, err.reason) from None
+            submit()
+            for request, numbers in pairs:
+                yield request, range(offset + numbers.start, offset + numbers.stop)
+            if pairs:
+                offset += pairs[-1][1].stop
+
+    def close(self):
+        """Stops the worker processes."""
+        self.pool.terminate()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def write_parallel(connection, requests):
+    """Writes requests produced by :py:meth:`ParallelEncoder.encode` in order.
+
+    Args:
+        connection (BfRtConnection): The connection to write with.
+        requests: Iterable of ``(bytes, range)`` pairs.
+
+    Returns:
+        int: Number of entries written.
+
+    Raises:
+        BatchWriteError: If a request fails. Requests after it are not
+            encoded or written.
+    """
+    written = 0
+    for request, entries in requests:
+        connection.write_requests([(request, entries)], unit="entries")
+        written += len(entries)
+    return written
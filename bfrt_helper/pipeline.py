@@ -0,0 +1,284 @@
+"""Pushing of compiled programs to the device.
+
+:py:meth:`BfRtHelper.create_set_pipeline_request` reads each of a program's
+artifacts (it's BfRt info, and the context and binary of each profile) into
+memory, copies them into a protobuf message, and the message is copied once
+more when it is serialised. For programs with several profiles, this can
+amount to hundreds of megabytes.
+
+This module instead memory maps the artifacts, and encodes the request
+straight from the mapped files into the bytes sent, so each artifact is only
+copied once. The encoded request is byte for byte identical to
+``SerializeToString()`` of the equivalent message::
+
+    pipeline = Pipeline(
+        "forwarder",
+        "install/share/tofinopd/forwarder/bf-rt.json",
+        [
+            PipelineProfile(
+                "install/share/tofinopd/forwarder/pipe0/context.json",
+                "install/share/tofinopd/forwarder/pipe0/tofino.bin",
+                profile_name="pipe0",
+                pipe_scope=[0, 1],
+            ),
+            PipelineProfile(
+                "install/share/tofinopd/forwarder/pipe1/context.json",
+                "install/share/tofinopd/forwarder/pipe1/tofino.bin",
+                profile_name="pipe1",
+                pipe_scope=[2, 3],
+            ),
+        ],
+    )
+    connection.push_pipeline([pipeline])
+
+Pushing the same build again, e.g. after a device reset, can reuse the
+request encoded the first time, by passing the same
+:py:class:`PipelineCache`. Requests are cached by the path, size and
+modification time of each artifact, so a hit reads none of them, and a
+rebuilt artifact is always pushed afresh. Caching is opt in, as each cached
+request is held in memory, and is as large as the artifacts together.
+
+To populate a new program's tables before it carries traffic, push it with
+:py:meth:`BfRtConnection.warm_init`.
+"""
+
+from collections import OrderedDict
+from contextlib import ExitStack
+import mmap
+import os
+
+from bfrt_helper.pb2.bfruntime_pb2 import (
+    SetForwardingPipelineConfigRequest as SetPipelineReq,
+)
+
+from bfrt_helper.bfrt import DEFAULT_BASE_PATH
+from bfrt_helper.bfrt import DEFAULT_PIPE_SCOPE
+from bfrt_helper.wire import encode_tag
+from bfrt_helper.wire import encode_uint
+from bfrt_helper.wire import encode_varint
+
+
+_TAG_1_VARINT = encode_tag(1, 0)
+_TAG_2_VARINT = encode_tag(2, 0)
+_TAG_3_VARINT = encode_tag(3, 0)
+_TAG_4_VARINT = encode_tag(4, 0)
+_TAG_1_BYTES = encode_tag(1, 2)
+_TAG_2_BYTES = encode_tag(2, 2)
+_TAG_3_BYTES = encode_tag(3, 2)
+_TAG_4_BYTES = encode_tag(4, 2)
+_TAG_5_BYTES = encode_tag(5, 2)
+_TAG_6_BYTES = encode_tag(6, 2)
+
+
+class PipelineProfile:
+    """The compiled artifacts of one profile of a program.
+
+    Args:
+        context_path (str): Path of the profile's ``context.json``.
+        binary_path (str): Path of the profile's ``tofino.bin``.
+        profile_name (str): Name of the profile.
+        pipe_scope (list): Pipes the profile is loaded to.
+    """
+
+    def __init__(
+        self,
+        context_path,
+        binary_path,
+        profile_name="pipe",
+        pipe_scope=DEFAULT_PIPE_SCOPE,
+    ):
+        self.context_path = context_path
+        self.binary_path = binary_path
+        self.profile_name = profile_name
+        self.pipe_scope = list(pipe_scope)
+
+
+class Pipeline:
+    """A compiled program to push to the device.
+
+    Args:
+        program_name (str): Name of the program.
+        bfrt_path (str): Path of the program's BfRt info file.
+        profiles (list): The program's :py:class:`PipelineProfile` objects.
+    """
+
+    def __init__(self, program_name, bfrt_path, profiles):
+        self.program_name = program_name
+        self.bfrt_path = bfrt_path
+        self.profiles = list(profiles)
+
+
+class PipelineCache:
+    """Encoded pipeline push requests, keyed by their parameters and the
+    metadata of their artifacts, as given by :py:func:`request_key`.
+
+    Requests are held in memory, each as large as it's artifacts together,
+    so only the most recently used ``max_entries`` are kept. For programs of
+    hundreds of megabytes, keep the default of one, and :py:meth:`clear` the
+    cache once it is no longer needed.
+
+    Args:
+        max_entries (int): Number of requests kept.
+    """
+
+    def __init__(self, max_entries=1):
+        self.max_entries = max_entries
+        self.requests = OrderedDict()
+
+    def get(self, key):
+        """Retrieves a cached request, or ``None`` if there is none."""
+        request = self.requests.get(key)
+        if request is not None:
+            self.requests.move_to_end(key)
+        return request
+
+    def put(self, key, request):
+        """Stores a request, evicting the least recently used if full."""
+        self.requests[key] = request
+        self.requests.move_to_end(key)
+        while len(self.requests) > self.max_entries:
+            self.requests.popitem(last=False)
+
+    def clear(self):
+        self.requests.clear()
+
+    def __len__(self):
+        return len(self.requests)
+
+
+def map_file(path, stack):
+    """Memory maps a file for reading.
+
+    Args:
+        path (str): Path of the file.
+        stack (contextlib.ExitStack): The map is closed when the stack is.
+
+    Returns:
+        A ``mmap.mmap``, or ``b""`` for an empty file, which cannot be
+        mapped.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    stack.callback(mapped.close)
+    return mapped
+
+
+def file_key(path):
+    """Identifies the contents of a file without reading it.
+
+    A file rewritten in place changes it's modification time, and one
+    replaced, e.g. by a rebuild, changes it's inode.
+
+    Returns:
+        tuple: The file's path, inode, size and modification time.
+    """
+    stat = os.stat(path)
+    return (path, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def request_key(helper, pipelines, action, dev_init_mode, base_path):
+    """Identifies a pipeline push request by it's parameters, and the
+    :py:func:`file_key` of each artifact, to cache it by.
+
+    Returns:
+        tuple: A hashable key.
+    """
+    key = [helper.device_id, helper.client_id, action, dev_init_mode, base_path]
+    for pipeline in pipelines:
+        key.append((pipeline.program_name, file_key(pipeline.bfrt_path)))
+        for profile in pipeline.profiles:
+            key.append((
+                profile.profile_name,
+                file_key(profile.context_path),
+                file_key(profile.binary_path),
+                tuple(profile.pipe_scope),
+            ))
+    return tuple(key)
+
+
+def _length_delimited(tag, parts):
+    # Parts may be memory maps, so only their lengths are taken.
+    return [tag, encode_varint(sum(len(part) for part in parts))] + parts
+
+
+def _blob(tag, data):
+    if not len(data):
+        return []
+    return [tag, encode_varint(len(data)), data]
+
+
+def _string(tag, value):
+    return _blob(tag, value.encode("utf-8"))
+
+
+def _profile_parts(profile, stack):
+    parts = _string(_TAG_1_BYTES, profile.profile_name)
+    parts += _blob(_TAG_2_BYTES, map_file(profile.context_path, stack))
+    parts += _blob(_TAG_3_BYTES, map_file(profile.binary_path, stack))
+    if profile.pipe_scope:
+        pipes = b"".join(encode_varint(pipe) for pipe in profile.pipe_scope)
+        parts += _blob(_TAG_4_BYTES, pipes)
+    return parts
+
+
+def _config_parts(pipeline, stack):
+    parts = _string(_TAG_1_BYTES, pipeline.program_name)
+    parts += _blob(_TAG_2_BYTES, map_file(pipeline.bfrt_path, stack))
+    for profile in pipeline.profiles:
+        parts += _length_delimited(_TAG_3_BYTES, _profile_parts(profile, stack))
+    return parts
+
+
+def encode_set_pipeline_request(
+    helper,
+    pipelines,
+    action=SetPipelineReq.VERIFY_AND_WARM_INIT_BEGIN_AND_END,
+    dev_init_mode=SetPipelineReq.DevInitMode.FAST_RECONFIG,
+    base_path=DEFAULT_BASE_PATH,
+    cache=None,
+):
+    """Encodes a ``SetForwardingPipelineConfigRequest`` pushing programs to
+    the device.
+
+    The artifacts are mapped only while the request is encoded, and their
+    files are closed before returning.
+
+    Args:
+        helper (BfRtHelper): Gives the device and client IDs.
+        pipelines (list): The :py:class:`Pipeline` of each program.
+        action (SetForwardingPipelineConfigRequest.Action): What the device
+            does with the programs.
+        dev_init_mode (SetForwardingPipelineConfigRequest.DevInitMode): How
+            the device is reinitialised.
+        base_path (str): Directory the device stores the programs in.
+        cache (PipelineCache, optional): Cache of encoded requests to look the
+            request up in, and store it in. A hit reads none of the
+            artifacts.
+
+    Returns:
+        bytes: The serialised request.
+    """
+    key = None
+    if cache is not None:
+        key = request_key(helper, pipelines, action, dev_init_mode, base_path)
+        request = cache.get(key)
+        if request is not None:
+            return request
+
+    with ExitStack() as stack:
+        parts = [
+            encode_uint(_TAG_1_VARINT, helper.device_id),
+            encode_uint(_TAG_2_VARINT, helper.client_id),
+            encode_uint(_TAG_3_VARINT, action),
+            encode_uint(_TAG_4_VARINT, dev_init_mode),
+        ]
+        parts += _string(_TAG_5_BYTES, base_path)
+        for pipeline in pipelines:
+            parts += _length_delimited(_TAG_6_BYTES, _config_parts(pipeline, stack))
+        request = b"".join(parts)
+
+    if cache is not None:
+        cache.put(key, request)
+    return request
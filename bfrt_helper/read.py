@@ -0,0 +1,232 @@
+"""Decoding of table entries read from the server.
+
+A ``ReadResponse`` only refers to tables, fields and actions by their IDs, and
+holds every value as bytes. This module converts the table entries of a
+response back into the names, :py:mod:`bfrt_helper.match` objects and
+:py:class:`Field` values used to write them, using the program's BfRt info.
+
+Entries are decoded lazily. :py:func:`read_entries` wraps each ``TableEntry``
+message of a stream of responses in a :py:class:`ReadEntry`, which decodes
+it's key and data only when they are accessed. Responses are consumed as the
+entries are iterated, so reading a whole table only holds the response being
+iterated in memory, however many entries the table has::
+
+    for entry in connection.read_table("pipe.Ingress.ipv4_route"):
+        print(entry.key["hdr.ipv4.dst_addr"], entry.action_name)
+"""
+
+from bfrt_helper.bfrt import data_field_bitwidth
+from bfrt_helper.fields import StringField
+from bfrt_helper.fields import field_class
+from bfrt_helper.match import Exact
+from bfrt_helper.match import LongestPrefixMatch
+from bfrt_helper.match import Optional
+from bfrt_helper.match import Range
+from bfrt_helper.match import Ternary
+
+
+class UnknownTableId(Exception):
+    """Exception raised when a table entry read from the server belongs to a
+    table not in the BfRt info.
+
+    Args:
+        table_id (int): ``TableEntry.table_id``
+    """
+
+    def __init__(self, table_id: int):
+        super().__init__(f"Could not find table with ID {table_id}")
+
+
+def decode_field(info_field, data):
+    """Decodes the bytes of a key field or data field value.
+
+    Args:
+        info_field: The BfRt info key field, action parameter or data field
+            singleton, which gives the value's type.
+        data (bytes): The value.
+
+    Returns:
+        Field: A :py:class:`StringField` for string fields, otherwise an
+        instance of :py:func:`field_class` of the field's bitwidth.
+    """
+    type_ = info_field.type or {}
+    if type_.get("type") == "string":
+        return StringField.from_bytes(data)
+    bitwidth = data_field_bitwidth(info_field)
+    if bitwidth is None:
+        bitwidth = len(data) * 8
+    return field_class(bitwidth).from_bytes(data)
+
+
+def decode_key_field(info_key, key_field):
+    """Decodes a ``KeyField`` message to a match.
+
+    Args:
+        info_key (BfRtTableKey): The BfRt info key field.
+        key_field (bfruntime_pb2.KeyField): The message.
+
+    Returns:
+        The match, or ``None`` if the message has no match set.
+    """
+    kind = key_field.WhichOneof("match_type")
+    if kind == "exact":
+        return Exact(decode_field(info_key, key_field.exact.value))
+    elif kind == "ternary":
+        value = decode_field(info_key, key_field.ternary.value)
+        mask = decode_field(info_key, key_field.ternary.mask)
+        return Ternary(value, mask)
+    elif kind == "lpm":
+        value = decode_field(info_key, key_field.lpm.value)
+        return LongestPrefixMatch(value, key_field.lpm.prefix_len)
+    elif kind == "range":
+        low = decode_field(info_key, key_field.range.low)
+        high = decode_field(info_key, key_field.range.high)
+        return Range(low, high)
+    elif kind == "optional":
+        value = decode_field(info_key, key_field.optional.value)
+        return Optional(value, key_field.optional.is_valid)
+    return None
+
+
+def decode_data_field(info_field, data_field):
+    """Decodes a ``DataField`` message to a value.
+
+    Args:
+        info_field: The BfRt info action parameter or data field singleton.
+        data_field (bfruntime_pb2.DataField): The message.
+
+    Returns:
+        A :py:class:`Field` for a ``stream`` value, a ``list`` for arrays, the
+        message itself for containers, otherwise a ``bool``, ``float`` or
+        ``str``.
+    """
+    kind = data_field.WhichOneof("value")
+    if kind == "stream":
+        return decode_field(info_field, data_field.stream)
+    elif kind in ("int_arr_val", "bool_arr_val", "str_arr_val"):
+        return list(getattr(data_field, kind).val)
+    elif kind is None:
+        return None
+    return getattr(data_field, kind)
+
+
+class ReadEntry:
+    """A table entry read from the server.
+
+    The key and data are decoded from the ``TableEntry`` message the first
+    time they are accessed. Key fields, action parameters and data fields
+    unknown to the BfRt info are skipped.
+
+    Args:
+        bfrt_info (BfRtInfo): The BfRt info of the program read from.
+        table_entry (bfruntime_pb2.TableEntry): The message.
+
+    Raises:
+        UnknownTableId: If the table is not in the BfRt info.
+    """
+
+    def __init__(self, bfrt_info, table_entry):
+        self.bfrt_info = bfrt_info
+        self.table_entry = table_entry
+        self.table = bfrt_info.table_by_id(table_entry.table_id)
+        if self.table is None:
+            raise UnknownTableId(table_entry.table_id)
+        self._key = None
+        self._action = None
+        self._action_params = None
+        self._data = None
+
+    @property
+    def table_name(self):
+        return self.table.name
+
+    @property
+    def is_default_entry(self):
+        return self.table_entry.is_default_entry
+
+    @property
+    def key(self):
+        """dict: Matches of the entry's key fields, by name."""
+        if self._key is None:
+            table_id = self.table_entry.table_id
+            key = {}
+            for key_field in self.table_entry.key.fields:
+                info_key = self.bfrt_info.key_by_id(table_id, key_field.field_id)
+                if info_key is None:
+                    continue
+                key[info_key.name] = decode_key_field(info_key, key_field)
+            self._key = key
+        return self._key
+
+    @property
+    def action_name(self):
+        """str: Name of the entry's action, or ``None`` if it has none."""
+        if self._action is None:
+            action_id = self.table_entry.data.action_id
+            if not action_id:
+                return None
+            self._action = self.bfrt_info.action_by_id(
+                self.table_entry.table_id, action_id
+            )
+        return self._action.name if self._action is not None else None
+
+    @property
+    def action_params(self):
+        """dict: Values of the entry's action parameters, by name."""
+        if self._action_params is None:
+            self._decode_data()
+        return self._action_params
+
+    @property
+    def data(self):
+        """dict: Values of the entry's data fields which are not action
+        parameters, e.g. those of a non-P4 table, by name."""
+        if self._data is None:
+            self._decode_data()
+        return self._data
+
+    def _decode_data(self):
+        bfrt_info = self.bfrt_info
+        table_id = self.table_entry.table_id
+        action_id = self.table_entry.data.action_id
+        action_params = {}
+        data = {}
+        for data_field in self.table_entry.data.fields:
+            field_id = data_field.field_id
+            if action_id:
+                info_field = bfrt_info.action_field_by_id(table_id, action_id, field_id)
+                if info_field is not None:
+                    value = decode_data_field(info_field, data_field)
+                    action_params[info_field.name] = value
+                    continue
+            info_field = bfrt_info.data_field_by_id(table_id, field_id)
+            if info_field is not None:
+                singleton = info_field.singleton
+                data[singleton.name] = decode_data_field(singleton, data_field)
+        self._action_params = action_params
+        self._data = data
+
+    def __repr__(self):
+        return (
+            f"ReadEntry({self.table_name}, key={self.key}, "
+            f"action_name={self.action_name}, action_params={self.action_params})"
+        )
+
+
+def read_entries(bfrt_info, responses):
+    """Iterates over the table entries of a stream of ``ReadResponse``
+    messages, as returned by ``BfRuntime.Read``.
+
+    Entities other than table entries are skipped.
+
+    Args:
+        bfrt_info (BfRtInfo): The BfRt info of the program read from.
+        responses: Iterable of ``ReadResponse`` messages.
+
+    Yields:
+        ReadEntry
+    """
+    for response in responses:
+        for entity in response.entities:
+            if entity.WhichOneof("entity") == "table_entry":
+                yield ReadEntry(bfrt_info, entity.table_entry)
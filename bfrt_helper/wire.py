@@ -0,0 +1,488 @@
+"""Direct protobuf wire format encoding of table writes.
+
+Building a request with the protobuf object model creates a Python level
+message for every ``Update``, ``TableEntry``, ``KeyField`` and ``DataField``,
+only for all of them to be thrown away once the request has been serialised.
+When repopulating a table wholesale (e.g. after a failover), this dominates the
+cost of a load.
+
+This module instead encodes the entries of a :py:class:`PreparedTableWrite`
+straight to bytes. The encoded requests are byte for byte identical to
+``SerializeToString()`` of those built with a :py:class:`WriteBatch`, and are
+written with :py:meth:`BfRtConnection.write_batch` using a gRPC call which
+sends the bytes as they are.
+
+Example::
+
+    batch = WireWriteBatch(connection.helper, "forwarder")
+    for ingress_port, egress_port in ports:
+        batch.insert(
+            "pipe.PortForward.destination_port",
+            key={"ig_intr_md.ingress_port": Exact(PortId(ingress_port))},
+            action_name="PortForward.forward",
+            action_params={"egress_port": PortId(egress_port)},
+        )
+    connection.write_batch(batch)
+
+Only the parts of the protocol used by table writes are encoded directly. Key
+field matches and data values without a direct encoding (e.g. string or
+boolean data) are built as protobuf messages and serialised.
+"""
+
+import bfrt_helper.pb2.bfruntime_pb2 as bfruntime_pb2
+from bfrt_helper.pb2.bfruntime_pb2 import Update
+from bfrt_helper.pb2.bfruntime_pb2 import WriteRequest
+
+from bfrt_helper.bfrt import DEFAULT_MAX_REQUEST_BYTES
+from bfrt_helper.bfrt import InvalidActionParameter
+from bfrt_helper.bfrt import MismatchedDataSize
+from bfrt_helper.bfrt import MismatchedMatchType
+from bfrt_helper.bfrt import PreparedTableWrite
+from bfrt_helper.bfrt import UnknownActionParameter
+from bfrt_helper.bfrt import UnknownKeyField
+from bfrt_helper.fields import Field
+
+
+_small_varints = [bytes((value,)) for value in range(0x80)]
+
+
+def encode_varint(value):
+    """Encodes an integer as a protobuf varint.
+
+    Negative values are encoded as their 64 bit two's complement, as protobuf
+    does for ``int32`` and ``int64`` fields.
+    """
+    if 0 <= value < 0x80:
+        return _small_varints[value]
+    if value < 0:
+        value += 1 << 64
+    result = bytearray()
+    while value >= 0x80:
+        result.append((value & 0x7F) | 0x80)
+        value >>= 7
+    result.append(value)
+    return bytes(result)
+
+
+def encode_tag(number, wire_type):
+    """Encodes the tag preceding a field with the given number and wire
+    type."""
+    return encode_varint((number << 3) | wire_type)
+
+
+def encode_message(tag, payload):
+    """Encodes a length delimited field (a message, ``bytes`` or ``string``)
+    with an already encoded tag."""
+    size = len(payload)
+    if size < 0x80:
+        return tag + _small_varints[size] + payload
+    return tag + encode_varint(size) + payload
+
+
+def encode_uint(tag, value):
+    """Encodes a varint field with an already encoded tag. As in proto3, a
+    zero value is not encoded."""
+    if not value:
+        return b""
+    return tag + encode_varint(value)
+
+
+def encode_bytes(tag, value):
+    """Encodes a ``bytes`` field with an already encoded tag. As in proto3, an
+    empty value is not encoded."""
+    if not value:
+        return b""
+    return tag + encode_varint(len(value)) + value
+
+
+# Tags of the fields written. Wire type 0 is a varint, 2 is length delimited.
+_TAG_1_VARINT = encode_tag(1, 0)
+_TAG_2_VARINT = encode_tag(2, 0)
+_TAG_1_BYTES = encode_tag(1, 2)
+_TAG_2_BYTES = encode_tag(2, 2)
+_TAG_3_BYTES = encode_tag(3, 2)
+_TAG_4_BYTES = encode_tag(4, 2)
+_TAG_5_BYTES = encode_tag(5, 2)
+_TAG_6_BYTES = encode_tag(6, 2)
+
+_UPDATE_ENTITY = _TAG_2_BYTES
+_ENTITY_TABLE_ENTRY = _TAG_1_BYTES
+_TABLE_ENTRY_KEY = _TAG_2_BYTES
+_TABLE_ENTRY_DATA = _TAG_3_BYTES
+_TABLE_ENTRY_HANDLE_ID = encode_tag(7, 0)
+_TABLE_KEY_FIELDS = _TAG_1_BYTES
+_TABLE_DATA_FIELDS = _TAG_2_BYTES
+_WRITE_REQUEST_UPDATES = _TAG_3_BYTES
+
+
+def encode_exact(data):
+    """Encodes the ``exact`` match of a ``KeyField`` from an :py:class:`Exact`
+    match."""
+    return encode_message(_TAG_2_BYTES, encode_bytes(_TAG_1_BYTES, data.value_bytes()))
+
+
+def encode_ternary(data):
+    """Encodes the ``ternary`` match of a ``KeyField`` from a
+    :py:class:`Ternary` match."""
+    value = encode_bytes(_TAG_1_BYTES, data.value_bytes())
+    mask = encode_bytes(_TAG_2_BYTES, data.mask_bytes())
+    return encode_message(_TAG_3_BYTES, value + mask)
+
+
+def encode_lpm(data):
+    """Encodes the ``lpm`` match of a ``KeyField`` from a
+    :py:class:`LongestPrefixMatch`."""
+    value = encode_bytes(_TAG_1_BYTES, data.value_bytes())
+    prefix_len = encode_uint(_TAG_2_VARINT, data.prefix)
+    return encode_message(_TAG_4_BYTES, value + prefix_len)
+
+
+def encode_range(data):
+    """Encodes the ``range`` match of a ``KeyField`` from a :py:class:`Range`
+    match."""
+    low = encode_bytes(_TAG_1_BYTES, data.low_bytes())
+    high = encode_bytes(_TAG_2_BYTES, data.high_bytes())
+    return encode_message(_TAG_5_BYTES, low + high)
+
+
+def encode_optional(data):
+    """Encodes the ``optional`` match of a ``KeyField`` from an
+    :py:class:`Optional` match."""
+    value = encode_bytes(_TAG_1_BYTES, data.value_bytes())
+    is_valid = encode_uint(_TAG_2_VARINT, data.is_valid)
+    return encode_message(_TAG_6_BYTES, value + is_valid)
+
+
+KEY_FIELD_WIRE_ENCODERS = {
+    "Exact": encode_exact,
+    "LongestPrefixMatch": encode_lpm,
+    "Ternary": encode_ternary,
+    "Range": encode_range,
+    "Optional": encode_optional,
+}
+"""Maps a BfRt info key field match type to a function which encodes it's match
+from an instance of the class given in :py:data:`KEY_FIELD_ENCODERS`. Match
+types with an entry in :py:data:`KEY_FIELD_ENCODERS` but not here are encoded
+by building a ``KeyField`` message."""
+
+
+def _serialised_key_field(set_key_field):
+    """Creates a wire encoder for a match type from it's protobuf setter."""
+
+    def encode(data):
+        bfrt_key_field = bfruntime_pb2.KeyField()
+        set_key_field(bfrt_key_field, data)
+        return bfrt_key_field.SerializeToString()
+
+    return encode
+
+
+class WireTableWrite:
+    """Encodes entries of a :py:class:`PreparedTableWrite` as serialised
+    ``Update`` messages.
+
+    Calling an instance gives the same ``Update`` as calling the prepared write
+    it was created from, already serialised, and raises the same exceptions.
+
+    Args:
+        prepared (PreparedTableWrite): The prepared write to encode entries of.
+    """
+
+    def __init__(self, prepared):
+        self.prepared = prepared
+        self.table_entry_header = encode_uint(_TAG_1_VARINT, prepared.table_id)
+
+        self.key_fields = {}
+        for field_name, (field_id, match_type, encoder) in prepared.key_fields.items():
+            match_cls = None
+            encode = None
+            if encoder is not None:
+                match_cls, set_key_field = encoder
+                encode = KEY_FIELD_WIRE_ENCODERS.get(match_type)
+                if encode is None:
+                    encode = _serialised_key_field(set_key_field)
+            self.key_fields[field_name] = (
+                encode_uint(_TAG_1_VARINT, field_id),
+                match_type,
+                match_cls,
+                encode,
+            )
+
+        self.data_header = None
+        self.action_params = {}
+        if prepared.action_id is not None:
+            self.data_header = encode_uint(_TAG_1_VARINT, prepared.action_id)
+            for param_name, (info_field, bitwidth) in prepared.action_params.items():
+                self.action_params[param_name] = (
+                    info_field,
+                    bitwidth,
+                    encode_uint(_TAG_1_VARINT, info_field.id),
+                )
+
+        self.update_types = {}
+
+    def encode_key(self, key):
+        """Encodes the ``TableKey`` of an entry.
+
+        Returns:
+            bytes: The encoded key, or ``None`` if ``key`` is empty, in which
+            case no key is sent.
+
+        Raises:
+            UnknownKeyField: If a key field does not exist in the table.
+            MismatchedMatchType: If a key field's match is of the wrong type.
+        """
+        if not key:
+            return None
+        key_fields = self.key_fields
+        encoded = []
+        for field_name, data in key.items():
+            try:
+                field_id, match_type, match_cls, encode = key_fields[field_name]
+            except KeyError:
+                raise UnknownKeyField(self.prepared.table_name, field_name)
+            if encode is None:
+                encoded.append(encode_message(_TABLE_KEY_FIELDS, field_id))
+                continue
+            if data.__class__ is not match_cls and not isinstance(data, match_cls):
+                raise MismatchedMatchType(field_name, data, match_type)
+            encoded.append(encode_message(_TABLE_KEY_FIELDS, field_id + encode(data)))
+        return b"".join(encoded)
+
+    def encode_action(self, action_params):
+        """Encodes the ``TableData`` of an entry, containing the action and it's
+        parameters.
+
+        Raises:
+            UnknownActionParameter: If a parameter does not exist.
+            InvalidActionParameter: If a parameter's value has the wrong size.
+        """
+        if action_params is None:
+            return self.data_header
+        prepared = self.prepared
+        encoded = [self.data_header]
+        for param_name, param_data in action_params.items():
+            try:
+                info_field, bitwidth, field_id = self.action_params[param_name]
+            except KeyError:
+                raise UnknownActionParameter(
+                    prepared.table_name, prepared.action_name, param_name
+                )
+            if isinstance(param_data, Field):
+                if bitwidth is not None and param_data.bitwidth != bitwidth:
+                    raise InvalidActionParameter(
+                        prepared.table_name,
+                        prepared.action_name,
+                        param_name,
+                        str(MismatchedDataSize(bitwidth, param_data.bitwidth)),
+                    )
+                # ``stream`` is part of a oneof, so is encoded even if empty.
+                data_field = field_id + encode_message(
+                    _TAG_2_BYTES, param_data.to_bytes()
+                )
+            else:
+                bfrt_data_field = bfruntime_pb2.DataField()
+                try:
+                    prepared.helper.set_data_field(
+                        bfrt_data_field, info_field, param_data
+                    )
+                except MismatchedDataSize as err:
+                    raise InvalidActionParameter(
+                        prepared.table_name, prepared.action_name, param_name, str(err)
+                    )
+                data_field = bfrt_data_field.SerializeToString()
+            encoded.append(encode_message(_TABLE_DATA_FIELDS, data_field))
+        return b"".join(encoded)
+
+    def _update_header(self, update_type):
+        header = self.update_types.get(update_type)
+        if header is None:
+            header = encode_uint(_TAG_1_VARINT, update_type)
+            self.update_types[update_type] = header
+        return header
+
+    def __call__(self, key, action_params=None, update_type=None, handle_id=None):
+        """Encodes the ``Update`` for a single entry.
+
+        The arguments are the same as :py:meth:`PreparedTableWrite.__call__`.
+
+        Returns:
+            bytes: The serialised ``Update``.
+        """
+        if update_type is None:
+            update_type = self.prepared.update_type
+        table_entry = self.table_entry_header
+        if handle_id is None:
+            encoded_key = self.encode_key(key)
+            if encoded_key is not None:
+                table_entry += encode_message(_TABLE_ENTRY_KEY, encoded_key)
+        if self.data_header is not None:
+            table_entry += encode_message(
+                _TABLE_ENTRY_DATA, self.encode_action(action_params)
+            )
+        if handle_id is not None:
+            # ``handle_id`` is part of a oneof, so is encoded even if zero.
+            table_entry += _TABLE_ENTRY_HANDLE_ID + encode_varint(handle_id)
+        entity = encode_message(_ENTITY_TABLE_ENTRY, table_entry)
+        return self._update_header(update_type) + encode_message(
+            _UPDATE_ENTITY, entity
+        )
+
+
+class WireWriteBatch:
+    """A :py:class:`WriteBatch` of serialised requests.
+
+    Updates are encoded with :py:class:`WireTableWrite` and collected into
+    serialised ``WriteRequest`` messages, split by ``max_bytes`` and
+    ``max_updates`` in the same way as :py:class:`WriteBatch`. Completed
+    requests are only held as bytes.
+
+    Requests are written with :py:meth:`BfRtConnection.write_batch`.
+
+    Args:
+        helper (BfRtHelper): The helper for the program.
+        program_name (str): Name of program to target.
+        atomicity (WriteRequest.Atomicity): See
+            :py:meth:`BfRtHelper.create_write_request`.
+        target (dict): See :py:meth:`BfRtHelper.create_write_request`.
+        max_bytes (int, optional): See :py:class:`WriteBatch`.
+        max_updates (int, optional): See :py:class:`WriteBatch`.
+    """
+
+    def __init__(
+        self,
+        helper,
+        program_name,
+        atomicity=WriteRequest.Atomicity.CONTINUE_ON_ERROR,
+        target: dict = {},
+        max_bytes=DEFAULT_MAX_REQUEST_BYTES,
+        max_updates=None,
+    ):
+        self.helper = helper
+        self.program_name = program_name
+        self.atomicity = atomicity
+        self.target = target
+        self.max_bytes = max_bytes
+        self.max_updates = max_updates
+
+        # Updates (field 3) are encoded between the target and client id, and
+        # the atomicity and program name.
+        request = helper.create_write_request(program_name, atomicity, target)
+        head = WriteRequest()
+        head.target.CopyFrom(request.target)
+        head.client_id = request.client_id
+        tail = WriteRequest()
+        tail.atomicity = request.atomicity
+        tail.p4_name = request.p4_name
+        self.head = head.SerializeToString()
+        self.tail = tail.SerializeToString()
+
+        self.requests = []
+        self.ranges = []
+        self._updates = []
+        self._start = 0
+        self._count = 0
+        self._size = len(self.head) + len(self.tail)
+        self._prepared = {}
+
+    def __len__(self):
+        """Number of updates in the batch."""
+        return sum(len(r) for r in self.ranges) + len(self._updates)
+
+    def _finish(self):
+        """Completes the request currently being added to."""
+        self.requests.append(self.head + b"".join(self._updates) + self.tail)
+        self.ranges.append(range(self._start, self._count))
+        self._updates = []
+        self._start = self._count
+        self._size = len(self.head) + len(self.tail)
+
+    def add_encoded(self, update):
+        """Adds a serialised ``Update``, starting a new request if the current
+        one would exceed the limits."""
+        field = encode_message(_WRITE_REQUEST_UPDATES, update)
+        size = len(field)
+        if self._updates:
+            over_bytes = self.max_bytes is not None and self._size + size > self.max_bytes
+            over_updates = (
+                self.max_updates is not None and len(self._updates) >= self.max_updates
+            )
+            if over_bytes or over_updates:
+                self._finish()
+        self._updates.append(field)
+        self._size += size
+        self._count += 1
+
+    def prepared(self, table_name, action_name=None):
+        """Retrieves the (cached) encoder for a table and action."""
+        writer = self._prepared.get((table_name, action_name))
+        if writer is None:
+            writer = WireTableWrite(
+                PreparedTableWrite(self.helper, table_name, action_name)
+            )
+            self._prepared[(table_name, action_name)] = writer
+        return writer
+
+    def add_prepared(
+        self, writer, key, action_params=None, update_type=None, handle_id=None
+    ):
+        """Adds an entry using a :py:class:`WireTableWrite`."""
+        self.add_encoded(writer(key, action_params, update_type, handle_id))
+
+    def add(
+        self,
+        table_name,
+        key,
+        action_name=None,
+        action_params=None,
+        update_type=Update.Type.INSERT,
+    ):
+        """Adds a match-action table entry update. See :py:meth:`WriteBatch.add`."""
+        writer = self.prepared(table_name, action_name)
+        self.add_prepared(writer, key, action_params, update_type)
+
+    def insert(self, table_name, key, action_name=None, action_params=None):
+        """Adds an INSERT of a match-action table entry. See :py:meth:`add`."""
+        self.add(table_name, key, action_name, action_params, Update.Type.INSERT)
+
+    def modify(self, table_name, key, action_name=None, action_params=None):
+        """Adds a MODIFY of a match-action table entry. See :py:meth:`add`."""
+        self.add(table_name, key, action_name, action_params, Update.Type.MODIFY)
+
+    def delete(self, table_name, key):
+        """Adds a DELETE of a match-action table entry. See :py:meth:`add`."""
+        self.add(table_name, key, update_type=Update.Type.DELETE)
+
+    def modify_handle(self, table_name, handle_id, action_name=None, action_params=None):
+        """Adds a MODIFY of the match-action table entry with the given handle.
+        See :py:class:`HandleCache`."""
+        writer = self.prepared(table_name, action_name)
+        self.add_prepared(writer, None, action_params, Update.Type.MODIFY, handle_id)
+
+    def delete_handle(self, table_name, handle_id):
+        """Adds a DELETE of the match-action table entry with the given handle.
+        See :py:class:`HandleCache`."""
+        writer = self.prepared(table_name)
+        self.add_prepared(writer, None, None, Update.Type.DELETE, handle_id)
+
+    def pop_full(self):
+        """Removes and returns every completed request.
+
+        Returns:
+            list: ``(bytes, range)`` pairs, in order.
+        """
+        full = list(zip(self.requests, self.ranges))
+        self.requests = []
+        self.ranges = []
+        return full
+
+    def pop_all(self):
+        """Removes and returns every request that contains updates, leaving the
+        batch empty.
+
+        Returns:
+            list: ``(bytes, range)`` pairs, in order.
+        """
+        if self._updates:
+            self._finish()
+        return self.pop_full()
@@ -0,0 +1,539 @@
+import json
+import os
+
+from bfrt_helper.bfrt import BfRtHelper
+from bfrt_helper.bfrt import InvalidActionParameter
+from bfrt_helper.bfrt import MismatchedMatchType
+from bfrt_helper.bfrt import UnknownAction
+from bfrt_helper.bfrt import UnknownActionParameter
+from bfrt_helper.bfrt import UnknownDataField
+from bfrt_helper.bfrt import UnknownKeyField
+from bfrt_helper.bfrt import UnknownTable
+from bfrt_helper.bfrt import make_port_map
+from bfrt_helper.bfrt_info import BfRtInfo
+from bfrt_helper.fields import DevPort
+from bfrt_helper.fields import Field
+from bfrt_helper.fields import MACAddress
+from bfrt_helper.fields import PortId
+from bfrt_helper.fields import StringField
+from bfrt_helper.match import Exact
+from bfrt_helper.match import LongestPrefixMatch
+from bfrt_helper.match import Ternary
+from bfrt_helper.pb2.bfruntime_pb2 import DataField
+from bfrt_helper.pb2.bfruntime_pb2 import ReadResponse
+from bfrt_helper.pb2.bfruntime_pb2 import TableModIncFlag
+from bfrt_helper.pb2.bfruntime_pb2 import Update
+from bfrt_helper.pb2.bfruntime_pb2 import WriteRequest
+
+import pytest
+
+
+DEVICE_ID = 0
+CLIENT_ID = 0
+
+EXACT_TABLE = "pipe.TestIngressControl.port_forward_exact"
+TERNARY_TABLE = "pipe.TestIngressControl.port_forward_ternary"
+LPM_TABLE = "pipe.TestIngressControl.port_forward_lpm"
+FORWARD = "TestIngressControl.forward"
+
+
+class TooBigForAPortId(Field):
+    bitwidth = 10
+
+
+bfrt_file = os.path.join(
+    os.path.abspath(os.path.dirname(__file__)), "resources/bfrt.json"
+)
+
+bfrt_data = json.loads(open(bfrt_file).read())
+bfrt_info = BfRtInfo(bfrt_data)
+bfrt_helper = BfRtHelper(DEVICE_ID, CLIENT_ID, bfrt_info)
+
+
+class FakeStream:
+    def __init__(self, responses):
+        self.responses = iter(responses)
+
+    def __iter__(self):
+        return self.responses
+
+    def next(self):
+        return next(self.responses)
+
+
+class FakeClient:
+    def __init__(self, responses):
+        self.responses = responses
+        self.requests = []
+
+    def Read(self, request):
+        self.requests.append(request)
+        return FakeStream(self.responses)
+
+
+def test_make_port_map_decodes_by_field_id():
+    response = ReadResponse()
+    table_entry = response.entities.add().table_entry
+    table_entry.table_id = bfrt_info.get_table_id("$PORT_STR_INFO")
+    # Data field deliberately precedes an unknown field to check it is not
+    # decoded by position.
+    unknown = table_entry.data.fields.add()
+    unknown.field_id = 42
+    unknown.stream = b"\xff"
+    dev_port = table_entry.data.fields.add()
+    dev_port.field_id = 2
+    dev_port.stream = b"\x00\x00\x01\x28"
+    key_field = table_entry.key.fields.add()
+    key_field.field_id = 1
+    key_field.exact.value = b"1/0"
+
+    client = FakeClient([response])
+    result = make_port_map("test", bfrt_helper, client, ["1/0"])
+
+    assert result == {"1/0": 296}
+    assert len(client.requests[0].entities) == 1
+
+
+def test_create_table_write_matches_copied_parts():
+    key = {"ig_intr_md.ingress_port": Exact(PortId(64))}
+    params = {"egress_port": PortId(65)}
+    request = bfrt_helper.create_table_write("test", EXACT_TABLE, key, FORWARD, params)
+
+    expected = bfrt_helper.create_write_request("test")
+    table_entry = bfrt_helper.create_table_entry(EXACT_TABLE)
+    table_entry.key.fields.extend(bfrt_helper.create_key_fields(EXACT_TABLE, key))
+    table_entry.data.CopyFrom(bfrt_helper.create_action(EXACT_TABLE, FORWARD, params))
+    update = expected.updates.add()
+    update.type = Update.Type.INSERT
+    update.entity.table_entry.CopyFrom(table_entry)
+
+    assert request.SerializeToString() == expected.SerializeToString()
+
+
+def test_create_table_write_unknown_table():
+    with pytest.raises(UnknownTable):
+        bfrt_helper.create_table_write("test", "pipe.TestIngressControl.nope", {})
+
+
+def test_create_table_data_write_without_data():
+    key = {"$DEV_PORT": Exact(DevPort(55))}
+    request = bfrt_helper.create_table_data_write("test", "$PORT", key, {})
+    table_entry = request.updates[0].entity.table_entry
+    assert table_entry.HasField("data")
+    assert len(table_entry.data.fields) == 0
+
+
+def test_create_table_read():
+    key = {"$PORT_NAME": Exact(StringField("1/0"))}
+    request = bfrt_helper.create_table_read("test", "$PORT_STR_INFO", key)
+    table_entry = request.entities[0].table_entry
+    assert request.target.pipe_id == 0xFFFF
+    assert table_entry.table_id == bfrt_info.get_table_id("$PORT_STR_INFO")
+    assert table_entry.key.fields[0].exact.value == b"1/0"
+
+
+def test_create_table_read_wildcard():
+    request = bfrt_helper.create_table_read("test", EXACT_TABLE)
+    table_entry = request.entities[0].table_entry
+    assert table_entry.table_id == bfrt_info.get_table_id(EXACT_TABLE)
+    assert not table_entry.HasField("key")
+
+
+@pytest.mark.parametrize("from_hw", [True, False])
+def test_create_table_read_from_hw(from_hw):
+    request = bfrt_helper.create_table_read("test", EXACT_TABLE, from_hw=from_hw)
+    table_entry = request.entities[0].table_entry
+    assert table_entry.HasField("table_flags")
+    assert table_entry.table_flags.from_hw == from_hw
+
+
+def test_create_table_read_from_hw_default():
+    request = bfrt_helper.create_table_read("test", EXACT_TABLE)
+    assert not request.entities[0].table_entry.HasField("table_flags")
+
+
+def test_set_table_read_per_entity():
+    request = bfrt_helper.create_table_read("test", EXACT_TABLE, from_hw=True)
+    bfrt_helper.set_table_read(
+        request.entities.add().table_entry, LPM_TABLE, from_hw=False
+    )
+    assert request.entities[0].table_entry.table_flags.from_hw
+    assert not request.entities[1].table_entry.table_flags.from_hw
+    assert request.entities[1].table_entry.table_id == bfrt_info.get_table_id(LPM_TABLE)
+
+
+def test_create_table_operation():
+    request = bfrt_helper.create_table_operation("test", EXACT_TABLE, "SyncCounters")
+    operation = request.updates[0].entity.table_operation
+    assert request.updates[0].type == Update.Type.INSERT
+    assert operation.table_id == bfrt_info.get_table_id(EXACT_TABLE)
+    assert operation.table_operations_type == "SyncCounters"
+    with pytest.raises(UnknownTable):
+        bfrt_helper.create_table_operation("test", "pipe.nope", "SyncCounters")
+
+
+def test_make_port_map_reads_every_response():
+    responses = []
+    for name, dev_port in [("1/0", 1), ("2/0", 2)]:
+        response = ReadResponse()
+        table_entry = response.entities.add().table_entry
+        table_entry.table_id = bfrt_info.get_table_id("$PORT_STR_INFO")
+        key_field = table_entry.key.fields.add()
+        key_field.field_id = 1
+        key_field.exact.value = name.encode()
+        data_field = table_entry.data.fields.add()
+        data_field.field_id = 2
+        data_field.stream = dev_port.to_bytes(4, "big")
+        responses.append(response)
+
+    client = FakeClient(responses)
+    result = make_port_map("test", bfrt_helper, client, ["1/0", "2/0"])
+    assert result == {"1/0": 1, "2/0": 2}
+
+
+def test_create_subscribe_request():
+    request = bfrt_helper.create_subscribe_request(timeout=False)
+    notifications = request.subscribe.notifications
+    assert request.subscribe.device_id == DEVICE_ID
+    assert notifications.enable_learn_notifications
+    assert not notifications.enable_idletimeout_notifications
+    assert notifications.enable_port_status_change_notifications
+
+
+def test_prepared_write_exact_matches_create_table_write():
+    key = {"ig_intr_md.ingress_port": Exact(PortId(64))}
+    params = {"egress_port": PortId(65)}
+    expected = bfrt_helper.create_table_write("test", EXACT_TABLE, key, FORWARD, params)
+
+    forward = bfrt_helper.prepare_table_write(EXACT_TABLE, FORWARD)
+    update = forward(key, params)
+
+    assert update == expected.updates[0]
+    assert update.entity.table_entry.key.fields[0].exact.value == b"\x00\x40"
+
+
+def test_prepared_write_ternary_matches_create_table_write():
+    key = {
+        "hdr.ethernet.srcAddr": Ternary(
+            MACAddress("aa:bb:cc:dd:ee:ff"), MACAddress("ff:ff:ff:00:00:00")
+        )
+    }
+    params = {"egress_port": PortId(65)}
+    expected = bfrt_helper.create_table_write(
+        "test", TERNARY_TABLE, key, FORWARD, params
+    )
+
+    forward = bfrt_helper.prepare_table_write(TERNARY_TABLE, FORWARD)
+    assert forward(key, params) == expected.updates[0]
+
+
+def test_prepared_write_lpm_matches_create_table_write():
+    key = {
+        "hdr.ethernet.srcAddr": LongestPrefixMatch(
+            MACAddress("aa:bb:cc:dd:ee:ff"), prefix=24
+        )
+    }
+    params = {"egress_port": PortId(65)}
+    expected = bfrt_helper.create_table_write("test", LPM_TABLE, key, FORWARD, params)
+
+    forward = bfrt_helper.prepare_table_write(LPM_TABLE, FORWARD)
+    assert forward(key, params) == expected.updates[0]
+
+
+def test_prepared_write_fills_existing_update():
+    request = bfrt_helper.create_write_request("test")
+    delete = bfrt_helper.prepare_table_write(EXACT_TABLE, update_type=Update.DELETE)
+    for port in range(4):
+        delete({"ig_intr_md.ingress_port": Exact(PortId(port))},
+               update=request.updates.add())
+
+    assert len(request.updates) == 4
+    assert request.updates[3].type == Update.DELETE
+    assert request.updates[3].entity.table_entry.key.fields[0].exact.value == b"\x00\x03"
+    assert not request.updates[3].entity.table_entry.HasField("data")
+
+
+def test_prepared_write_update_type_override():
+    forward = bfrt_helper.prepare_table_write(EXACT_TABLE, FORWARD)
+    update = forward(
+        {"ig_intr_md.ingress_port": Exact(PortId(1))},
+        {"egress_port": PortId(2)},
+        update_type=Update.MODIFY,
+    )
+    assert update.type == Update.MODIFY
+
+
+def test_prepared_write_unknown_table():
+    with pytest.raises(UnknownTable):
+        bfrt_helper.prepare_table_write("pipe.TestIngressControl.nope", FORWARD)
+
+
+def test_prepared_write_unknown_action():
+    with pytest.raises(UnknownAction):
+        bfrt_helper.prepare_table_write(EXACT_TABLE, "TestIngressControl.nope")
+
+
+def test_prepared_write_unknown_key_field():
+    forward = bfrt_helper.prepare_table_write(EXACT_TABLE, FORWARD)
+    with pytest.raises(UnknownKeyField):
+        forward({"nope": Exact(PortId(1))}, {"egress_port": PortId(2)})
+
+
+def test_prepared_write_mismatched_match_type():
+    forward = bfrt_helper.prepare_table_write(EXACT_TABLE, FORWARD)
+    with pytest.raises(MismatchedMatchType):
+        forward({"ig_intr_md.ingress_port": Ternary(PortId(1))},
+                {"egress_port": PortId(2)})
+
+
+def test_prepared_write_unknown_action_parameter():
+    forward = bfrt_helper.prepare_table_write(EXACT_TABLE, FORWARD)
+    with pytest.raises(UnknownActionParameter):
+        forward({"ig_intr_md.ingress_port": Exact(PortId(1))}, {"nope": PortId(2)})
+
+
+def test_prepared_write_invalid_action_parameter():
+    forward = bfrt_helper.prepare_table_write(EXACT_TABLE, FORWARD)
+    with pytest.raises(InvalidActionParameter):
+        forward(
+            {"ig_intr_md.ingress_port": Exact(PortId(1))},
+            {"egress_port": TooBigForAPortId(2)},
+        )
+
+
+def test_write_batch_accumulates_updates():
+    batch = bfrt_helper.create_write_batch("test")
+    for port in range(3):
+        batch.insert(
+            EXACT_TABLE,
+            {"ig_intr_md.ingress_port": Exact(PortId(port))},
+            FORWARD,
+            {"egress_port": PortId(port + 1)},
+        )
+    batch.modify(
+        LPM_TABLE,
+        {"hdr.ethernet.srcAddr": LongestPrefixMatch(MACAddress("aa:bb:cc:00:00:00"), 24)},
+        FORWARD,
+        {"egress_port": PortId(4)},
+    )
+    batch.delete(EXACT_TABLE, {"ig_intr_md.ingress_port": Exact(PortId(7))})
+
+    assert len(batch) == 5
+    request = batch.request
+    assert request.p4_name == "test"
+    assert [u.type for u in request.updates] == [
+        Update.INSERT, Update.INSERT, Update.INSERT, Update.MODIFY, Update.DELETE
+    ]
+    expected = bfrt_helper.create_table_write(
+        "test",
+        EXACT_TABLE,
+        {"ig_intr_md.ingress_port": Exact(PortId(2))},
+        FORWARD,
+        {"egress_port": PortId(3)},
+    )
+    assert request.updates[2] == expected.updates[0]
+    assert request.updates[3].entity.table_entry.table_id == 39533813
+
+
+def test_write_batch_atomicity():
+    batch = bfrt_helper.create_write_batch(
+        "test", atomicity=WriteRequest.Atomicity.ROLLBACK_ON_ERROR
+    )
+    assert batch.request.atomicity == WriteRequest.Atomicity.ROLLBACK_ON_ERROR
+
+
+def test_write_batch_data_matches_create_table_data_write():
+    key = {"$DEV_PORT": Exact(DevPort(55))}
+    data = {"$SPEED": "BF_SPEED_10G", "$PORT_ENABLE": True}
+    expected = bfrt_helper.create_table_data_write("test", "$PORT", key, data)
+
+    batch = bfrt_helper.create_write_batch("test")
+    batch.add_data("$PORT", key, data)
+    assert batch.request == expected
+
+
+def test_write_batch_unknown_data_field():
+    batch = bfrt_helper.create_write_batch("test")
+    with pytest.raises(UnknownDataField):
+        batch.add_data("$PORT", {"$DEV_PORT": Exact(DevPort(55))}, {"$NOPE": True})
+
+
+mgid_info = BfRtInfo(
+    {
+        "tables": [
+            {
+                "id": 1,
+                "name": "$pre.mgid",
+                "key": [
+                    {
+                        "id": 1,
+                        "name": "$MGID",
+                        "match_type": "Exact",
+                        "type": {"type": "uint32"},
+                    }
+                ],
+                "data": [
+                    {
+                        "mandatory": False,
+                        "read_only": False,
+                        "singleton": {
+                            "id": 1,
+                            "name": "$MULTICAST_NODE_ID",
+                            "repeated": True,
+                            "type": {"type": "uint32"},
+                        },
+                    },
+                    {
+                        "mandatory": False,
+                        "read_only": False,
+                        "singleton": {
+                            "id": 2,
+                            "name": "$MULTICAST_NODE_L1_XID_VALID",
+                            "repeated": True,
+                            "type": {"type": "bool"},
+                        },
+                    },
+                ],
+            }
+        ]
+    }
+)
+mgid_helper = BfRtHelper(DEVICE_ID, CLIENT_ID, mgid_info)
+MGID_KEY = {"$MGID": Exact(DevPort(1))}
+
+
+def test_create_table_data_modify_inc():
+    data = {"$MULTICAST_NODE_ID": [42, 43], "$MULTICAST_NODE_L1_XID_VALID": [True, False]}
+    request = mgid_helper.create_table_data_modify_inc("test", "$pre.mgid", MGID_KEY, data)
+    update = request.updates[0]
+    table_entry = update.entity.table_entry
+    assert update.type == Update.Type.MODIFY_INC
+    assert table_entry.HasField("table_mod_inc_flag")
+    assert table_entry.table_mod_inc_flag.type == TableModIncFlag.Type.MOD_INC_ADD
+    assert list(table_entry.data.fields[0].int_arr_val.val) == [42, 43]
+    assert list(table_entry.data.fields[1].bool_arr_val.val) == [True, False]
+
+
+def test_create_table_data_modify_inc_delete():
+    request = mgid_helper.create_table_data_modify_inc(
+        "test",
+        "$pre.mgid",
+        MGID_KEY,
+        {"$MULTICAST_NODE_ID": [42]},
+        TableModIncFlag.Type.MOD_INC_DELETE,
+    )
+    table_entry = request.updates[0].entity.table_entry
+    assert table_entry.table_mod_inc_flag.type == TableModIncFlag.Type.MOD_INC_DELETE
+
+
+def test_create_table_data_modify_inc_unknown_data_field():
+    with pytest.raises(UnknownDataField):
+        mgid_helper.create_table_data_modify_inc(
+            "test", "$pre.mgid", MGID_KEY, {"$NOPE": [1]}
+        )
+
+
+def test_modify_inc_is_smaller_than_full_rewrite():
+    nodes = list(range(1000))
+    full = mgid_helper.create_table_data_write(
+        "test",
+        "$pre.mgid",
+        MGID_KEY,
+        {"$MULTICAST_NODE_ID": nodes + [1000]},
+        Update.Type.MODIFY,
+    )
+    inc = mgid_helper.create_table_data_modify_inc(
+        "test", "$pre.mgid", MGID_KEY, {"$MULTICAST_NODE_ID": [1000]}
+    )
+    assert inc.updates[0].ByteSize() * 50 < full.updates[0].ByteSize()
+
+
+def test_set_data_field_containers():
+    inner = DataField(field_id=1, stream=b"\x01")
+    data_field = DataField()
+    field = mgid_info.get_data_field("$pre.mgid", "$MULTICAST_NODE_ID").singleton
+    mgid_helper.set_data_field(data_field, field, [[inner], [inner, inner]])
+    containers = data_field.container_arr_val.container
+    assert [len(container.val) for container in containers] == [1, 2]
+    assert containers[1].val[0] == inner
+
+
+def test_write_batch_data_modify_inc():
+    data = {"$MULTICAST_NODE_ID": [42]}
+    mod_inc_type = TableModIncFlag.Type.MOD_INC_DELETE
+    expected = mgid_helper.create_table_data_modify_inc(
+        "test", "$pre.mgid", MGID_KEY, data, mod_inc_type
+    )
+
+    batch = mgid_helper.create_write_batch("test")
+    batch.add_data("$pre.mgid", MGID_KEY, data, mod_inc_type=mod_inc_type)
+    assert batch.request == expected
+
+
+def add_exact_entries(batch, n_entries):
+    for port in range(n_entries):
+        batch.insert(
+            EXACT_TABLE,
+            {"ig_intr_md.ingress_port": Exact(PortId(port))},
+            FORWARD,
+            {"egress_port": PortId(port)},
+        )
+
+
+def test_write_batch_splits_by_update_count():
+    batch = bfrt_helper.create_write_batch("test", max_updates=4)
+    add_exact_entries(batch, 10)
+
+    assert [len(r.updates) for r in batch.requests] == [4, 4, 2]
+    assert batch.ranges == [range(0, 4), range(4, 8), range(8, 10)]
+    assert len(batch) == 10
+    ports = [
+        u.entity.table_entry.key.fields[0].exact.value
+        for r in batch.requests
+        for u in r.updates
+    ]
+    assert ports == [PortId(p).to_bytes() for p in range(10)]
+
+
+def test_write_batch_splits_by_size():
+    max_bytes = 200
+    batch = bfrt_helper.create_write_batch("test", max_bytes=max_bytes)
+    add_exact_entries(batch, 50)
+
+    assert len(batch.requests) > 1
+    assert all(r.ByteSize() <= max_bytes for r in batch.requests)
+    assert sum(len(r.updates) for r in batch.requests) == 50
+    for request, entries in zip(batch.requests, batch.ranges):
+        assert len(request.updates) == len(entries)
+        assert request.p4_name == "test"
+    assert batch.ranges[-1].stop == 50
+
+
+def test_write_batch_oversized_update_is_alone():
+    batch = bfrt_helper.create_write_batch("test", max_bytes=1)
+    add_exact_entries(batch, 3)
+    assert [len(r.updates) for r in batch.requests] == [1, 1, 1]
+
+
+def test_write_batch_pop_full():
+    batch = bfrt_helper.create_write_batch("test", max_updates=4)
+    add_exact_entries(batch, 10)
+
+    full = batch.pop_full()
+    assert [entries for _, entries in full] == [range(0, 4), range(4, 8)]
+    assert batch.ranges == [range(8, 10)]
+
+    add_exact_entries(batch, 3)
+    rest = batch.pop_all()
+    assert [entries for _, entries in rest] == [range(8, 12), range(12, 13)]
+    assert len(batch) == 0
+    assert batch.pop_all() == []
+
+
+def test_write_batch_failed_update_is_discarded():
+    batch = bfrt_helper.create_write_batch("test")
+    add_exact_entries(batch, 2)
+    with pytest.raises(UnknownKeyField):
+        batch.insert(EXACT_TABLE, {"nope": Exact(PortId(1))}, FORWARD, {})
+    assert len(batch.request.updates) == 2
+    assert batch.ranges == [range(0, 2)]
@@ -0,0 +1,227 @@
+import json
+import os
+
+from bfrt_helper.bfrt_info import BfRtInfo
+
+
+bfrt_file = os.path.join(
+    os.path.abspath(os.path.dirname(__file__)), "resources/bfrt.json"
+)
+
+bfrt_data = json.loads(open(bfrt_file).read())
+bfrt_info = BfRtInfo(bfrt_data)
+
+
+EXACT_TABLE = "pipe.TestIngressControl.port_forward_exact"
+FORWARD = "TestIngressControl.forward"
+
+
+def test_get_table():
+    table = bfrt_info.get_table(EXACT_TABLE)
+    assert table.name == EXACT_TABLE
+    assert table.id == 50148134
+    assert bfrt_info.get_table_id(EXACT_TABLE) == 50148134
+
+
+def test_get_table_unknown():
+    assert bfrt_info.get_table("pipe.TestIngressControl.nope") is None
+    assert bfrt_info.get_table_id("pipe.TestIngressControl.nope") is None
+
+
+def test_get_key():
+    key = bfrt_info.get_key(EXACT_TABLE, "ig_intr_md.ingress_port")
+    assert key.match_type == "Exact"
+    assert key.type == {"type": "bytes", "width": 9}
+    assert bfrt_info.get_key_id(EXACT_TABLE, "ig_intr_md.ingress_port") == 1
+
+
+def test_get_key_unknown():
+    assert bfrt_info.get_key(EXACT_TABLE, "hdr.ethernet.srcAddr") is None
+    assert bfrt_info.get_key("unknown", "ig_intr_md.ingress_port") is None
+
+
+def test_get_action_spec():
+    action_spec = bfrt_info.get_action_spec(EXACT_TABLE, FORWARD)
+    assert action_spec.id == 29582296
+    assert bfrt_info.get_action_spec_id(EXACT_TABLE, FORWARD) == 29582296
+    assert bfrt_info.get_action_spec(EXACT_TABLE, "unknown") is None
+
+
+def test_get_action_field():
+    field = bfrt_info.get_action_field(EXACT_TABLE, FORWARD, "egress_port")
+    assert field.id == 1
+    assert field.type == {"type": "bytes", "width": 9}
+    assert bfrt_info.get_action_field(EXACT_TABLE, FORWARD, "unknown") is None
+    assert bfrt_info.get_action_field(EXACT_TABLE, "unknown", "egress_port") is None
+
+
+def test_get_data_field():
+    field = bfrt_info.get_data_field("$PORT", "$SPEED")
+    assert field.singleton.name == "$SPEED"
+    assert bfrt_info.get_data_field_id("$PORT", "$SPEED") == 2
+    assert bfrt_info.get_data_field("$PORT", "unknown") is None
+    assert bfrt_info.get_data_field_id("$PORT", "unknown") is None
+
+
+def test_lookups_return_parsed_objects():
+    table = bfrt_info.get_table(EXACT_TABLE)
+    assert table in bfrt_info.tables
+    assert bfrt_info.get_key(EXACT_TABLE, "ig_intr_md.ingress_port") is table.key[0]
+
+
+def test_duplicate_names_return_first():
+    data = {
+        "tables": [
+            {"id": 1, "name": "table", "key": [{"id": 1, "name": "a"}]},
+            {"id": 2, "name": "table", "key": [{"id": 2, "name": "a"}]},
+        ]
+    }
+    info = BfRtInfo(data)
+    assert info.get_table_id("table") == 1
+    assert info.get_key_id("table", "a") == 1
+
+
+def test_empty_info():
+    info = BfRtInfo({})
+    assert info.get_table(EXACT_TABLE) is None
+    assert info.get_key(EXACT_TABLE, "ig_intr_md.ingress_port") is None
+    assert info.get_data_field("$PORT", "$SPEED") is None
+
+
+def test_table_by_id():
+    assert bfrt_info.table_by_id(50148134).name == EXACT_TABLE
+    assert bfrt_info.table_by_id(1234) is None
+
+
+def test_key_by_id():
+    key = bfrt_info.key_by_id(38152076, 65537)
+    assert key.name == "$MATCH_PRIORITY"
+    assert bfrt_info.key_by_id(38152076, 2) is None
+    assert bfrt_info.key_by_id(1234, 1) is None
+
+
+def test_action_by_id():
+    assert bfrt_info.action_by_id(50148134, 29582296).name == FORWARD
+    assert bfrt_info.action_by_id(50148134, 1234) is None
+
+
+def test_action_field_by_id():
+    field = bfrt_info.action_field_by_id(50148134, 29582296, 1)
+    assert field.name == "egress_port"
+    assert bfrt_info.action_field_by_id(50148134, 21257015, 1) is None
+
+
+def test_data_field_by_id():
+    field = bfrt_info.data_field_by_id(4278321153, 2)
+    assert field.singleton.name == "$DEV_PORT"
+    assert bfrt_info.data_field_by_id(4278321153, 3) is None
+
+
+def test_lazy_parses_nothing_up_front():
+    info = BfRtInfo(bfrt_data, lazy=True)
+    assert info.table_count == len(bfrt_data["tables"])
+    assert info.parsed_table_count == 0
+
+
+def test_lazy_parses_on_lookup_by_name():
+    info = BfRtInfo(bfrt_data, lazy=True)
+    assert info.get_action_field_id(EXACT_TABLE, FORWARD, "egress_port") == 1
+    assert info.get_key_id(EXACT_TABLE, "ig_intr_md.ingress_port") == 1
+    assert info.parsed_table_count == 1
+    assert info.get_table("unknown") is None
+    assert info.parsed_table_count == 1
+
+
+def test_lazy_parses_on_lookup_by_id():
+    info = BfRtInfo(bfrt_data, lazy=True)
+    assert info.key_by_id(38152076, 65537).name == "$MATCH_PRIORITY"
+    assert info.get_table_id("pipe.TestIngressControl.port_forward_ternary") == 38152076
+    assert info.parsed_table_count == 1
+
+
+def test_lazy_lookups_match_eager():
+    info = BfRtInfo(bfrt_data, lazy=True)
+    for table in bfrt_info.tables:
+        assert repr(info.get_table(table.name)) == repr(table)
+    assert info.parsed_table_count == info.table_count
+
+
+def test_lazy_tables_parses_everything():
+    info = BfRtInfo(bfrt_data, lazy=True)
+    assert [t.name for t in info.tables] == [t.name for t in bfrt_info.tables]
+    assert info.parsed_table_count == info.table_count
+
+
+def test_lazy_duplicate_names_return_first():
+    data = {
+        "tables": [
+            {"id": 1, "name": "table", "key": [{"id": 1, "name": "a"}]},
+            {"id": 2, "name": "table", "key": [{"id": 2, "name": "a"}]},
+        ]
+    }
+    info = BfRtInfo(data, lazy=True)
+    assert info.table_by_id(2).id == 2
+    assert info.get_table_id("table") == 1
+
+
+def test_schema_objects_are_slotted():
+    table = bfrt_info.get_table(EXACT_TABLE)
+    assert not hasattr(table, "__dict__")
+    assert not hasattr(table.key[0], "__dict__")
+    assert not hasattr(table.action_specs[0], "__dict__")
+
+
+def test_key_representation():
+    key = bfrt_info.get_key(EXACT_TABLE, "ig_intr_md.ingress_port")
+    assert repr(key) == (
+        "BfRtTableKey(id=1, name='ig_intr_md.ingress_port', repeated=False, "
+        "annotations=[], mandatory=True, match_type='Exact', "
+        "type={'type': 'bytes', 'width': 9})"
+    )
+
+
+def test_data_field_json():
+    field = bfrt_info.get_data_field("$PORT_STR_INFO", "$DEV_PORT")
+    assert field.json() == {
+        "mandatory": False,
+        "read_only": True,
+        "singleton": {
+            "id": 2,
+            "name": "$DEV_PORT",
+            "repeated": False,
+            "annotations": [],
+            "type": {"type": "uint32"},
+        },
+    }
+
+
+def test_equal_types_are_shared():
+    exact = bfrt_info.get_key(EXACT_TABLE, "ig_intr_md.ingress_port")
+    param = bfrt_info.get_action_field(EXACT_TABLE, FORWARD, "egress_port")
+    assert exact.type is param.type
+
+
+def test_shared_values_are_dropped_after_parsing():
+    lazy_info = BfRtInfo(bfrt_data, lazy=True)
+    lazy_info.get_table(EXACT_TABLE)
+    assert lazy_info._shared_values
+    lazy_info.tables
+    assert lazy_info._shared_values is None
+    assert bfrt_info._shared_values is None
+
+    # Values are only shared within one BfRt info.
+    other = BfRtInfo(json.loads(json.dumps(bfrt_data)))
+    exact = other.get_key(EXACT_TABLE, "ig_intr_md.ingress_port")
+    assert exact.type == bfrt_info.get_key(EXACT_TABLE, "ig_intr_md.ingress_port").type
+    assert exact.type is not bfrt_info.get_key(EXACT_TABLE, "ig_intr_md.ingress_port").type
+
+
+def test_tables_is_mutable():
+    info = BfRtInfo(json.loads(json.dumps(bfrt_data)), lazy=True)
+    tables = info.tables
+    assert info.tables is tables
+    removed = tables.pop()
+    assert removed not in info.tables
+    # Lookups use the indexes built when parsing.
+    assert info.get_table(removed.name) is removed
+    assert info.get_table("pipe.nope") is None
@@ -0,0 +1,97 @@
+import json
+import os
+
+import pytest
+
+from bfrt_helper.bfrt_info import BfRtInfo
+from bfrt_helper.cache import BfRtInfoCache
+from bfrt_helper.cache import content_digest
+from bfrt_helper.cache import load_bfrt_info
+
+
+bfrt_file = os.path.join(
+    os.path.abspath(os.path.dirname(__file__)), "resources/bfrt.json"
+)
+
+bfrt_raw = open(bfrt_file, "rb").read()
+
+EXACT_TABLE = "pipe.TestIngressControl.port_forward_exact"
+
+
+def test_content_digest_is_length_prefixed():
+    assert content_digest(b"ab", b"c") != content_digest(b"a", b"bc")
+    assert content_digest(b"abc") == content_digest(b"abc")
+
+
+def test_load_without_cache():
+    bfrt_info = load_bfrt_info(bfrt_raw)
+    assert bfrt_info.get_table_id(EXACT_TABLE) == 50148134
+
+
+def test_cache_miss_then_hit(tmp_path):
+    calls = []
+
+    def build():
+        calls.append(None)
+        return BfRtInfo(json.loads(bfrt_raw))
+
+    cache = BfRtInfoCache(str(tmp_path))
+    first = cache.load([bfrt_raw], build)
+    second = cache.load([bfrt_raw], build)
+
+    assert len(calls) == 1
+    assert second is not first
+    assert second.get_table_id(EXACT_TABLE) == 50148134
+    assert second.key_by_id(50148134, 1).name == "ig_intr_md.ingress_port"
+    assert repr(second.get_table(EXACT_TABLE)) == repr(first.get_table(EXACT_TABLE))
+
+
+def test_cache_invalidated_by_content(tmp_path):
+    cache = BfRtInfoCache(str(tmp_path))
+    load_bfrt_info(bfrt_raw, cache_dir=str(tmp_path))
+
+    data = json.loads(bfrt_raw)
+    data["tables"] = data["tables"][:1]
+    changed = json.dumps(data).encode("utf-8")
+    bfrt_info = load_bfrt_info(changed, cache_dir=str(tmp_path))
+
+    assert bfrt_info.table_count == 1
+    assert cache.get(content_digest(changed)).table_count == 1
+    assert cache.get(content_digest(bfrt_raw)).table_count == len(
+        json.loads(bfrt_raw)["tables"]
+    )
+
+
+def test_corrupt_entry_is_rebuilt(tmp_path):
+    cache = BfRtInfoCache(str(tmp_path))
+    digest = content_digest(bfrt_raw)
+    with open(cache.path(digest), "wb") as f:
+        f.write(b"not a pickle")
+
+    assert cache.get(digest) is None
+    bfrt_info = load_bfrt_info(bfrt_raw, cache_dir=str(tmp_path))
+    assert bfrt_info.get_table_id(EXACT_TABLE) == 50148134
+    assert cache.get(digest) is not None
+
+
+def test_unwritable_cache_is_not_fatal(tmp_path):
+    # The cache directory cannot be created under a file.
+    blocker = tmp_path / "file"
+    blocker.write_bytes(b"")
+    bfrt_info = load_bfrt_info(bfrt_raw, cache_dir=str(blocker / "cache"))
+    assert bfrt_info.get_table_id(EXACT_TABLE) == 50148134
+
+
+def test_failed_put_removes_temporary_file(tmp_path, monkeypatch):
+    def replace(source, destination):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(os, "replace", replace)
+    cache = BfRtInfoCache(str(tmp_path))
+    assert not cache.put(content_digest(bfrt_raw), BfRtInfo(json.loads(bfrt_raw)))
+    assert os.listdir(tmp_path) == []
+
+
+def test_lazy_rejected_with_cache(tmp_path):
+    with pytest.raises(ValueError):
+        load_bfrt_info(bfrt_raw, cache_dir=str(tmp_path), lazy=True)
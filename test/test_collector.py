@@ -0,0 +1,227 @@
+from bfrt_helper.bfrt import BfRtHelper
+from bfrt_helper.bfrt import UnknownDataField
+from bfrt_helper.bfrt import UnknownTable
+from bfrt_helper.bfrt_info import BfRtInfo
+from bfrt_helper.pb2.bfruntime_pb2 import ReadResponse
+
+import pytest
+
+numpy = pytest.importorskip("numpy")
+
+from bfrt_helper.collector import Sample  # noqa: E402
+from bfrt_helper.collector import TableCollector  # noqa: E402
+from bfrt_helper.collector import rates  # noqa: E402
+from bfrt_helper.collector import values_array  # noqa: E402
+
+
+COUNTER_TABLE = "pipe.Ingress.port_counter"
+REGISTER_TABLE = "pipe.Ingress.flow_bytes"
+ROUTE_TABLE = "pipe.Ingress.route"
+
+
+def counter_fields():
+    return [
+        {"singleton": {"id": 65553, "name": "$COUNTER_SPEC_BYTES",
+                       "type": {"type": "uint64"}}},
+        {"singleton": {"id": 65554, "name": "$COUNTER_SPEC_PKTS",
+                       "type": {"type": "uint64"}}},
+    ]
+
+
+bfrt_info = BfRtInfo(
+    {
+        "tables": [
+            {
+                "id": 1,
+                "name": COUNTER_TABLE,
+                "table_type": "Counter",
+                "key": [
+                    {"id": 65556, "name": "$COUNTER_INDEX", "match_type": "Exact",
+                     "type": {"type": "uint32"}}
+                ],
+                "data": counter_fields(),
+            },
+            {
+                "id": 2,
+                "name": REGISTER_TABLE,
+                "table_type": "Register",
+                "key": [
+                    {"id": 65557, "name": "$REGISTER_INDEX", "match_type": "Exact",
+                     "type": {"type": "uint32"}}
+                ],
+                "data": [
+                    {"singleton": {"id": 1, "name": "Ingress.flow_bytes.f1",
+                                   "repeated": True,
+                                   "type": {"type": "bytes", "width": 32}}},
+                ],
+            },
+            {
+                "id": 3,
+                "name": ROUTE_TABLE,
+                "table_type": "MatchAction_Direct",
+                "key": [
+                    {"id": 1, "name": "dst_addr", "match_type": "Exact",
+                     "type": {"type": "bytes", "width": 32}}
+                ],
+                "action_specs": [{"id": 2, "name": "drop", "data": []}],
+                "data": counter_fields(),
+            },
+        ]
+    }
+)
+
+
+class FakeClient:
+    def __init__(self):
+        self.responses = []
+
+    def Read(self, request):
+        self.request = request
+        return iter(self.responses.pop(0))
+
+
+class FakeConnection:
+    def __init__(self):
+        self.helper = BfRtHelper(0, 0, bfrt_info)
+        self.p4_name = "test"
+        self.client = FakeClient()
+        self.syncs = []
+
+    def sync_table(self, table_name, operation, program_name=None):
+        self.syncs.append((table_name, operation))
+
+
+def counter_responses(table_id, key_id, counts, per_response=2):
+    responses = []
+    for start in range(0, len(counts), per_response):
+        response = ReadResponse()
+        for index, (n_bytes, n_packets) in counts[start:start + per_response]:
+            table_entry = response.entities.add().table_entry
+            table_entry.table_id = table_id
+            key_field = table_entry.key.fields.add()
+            key_field.field_id = key_id
+            key_field.exact.value = index.to_bytes(4, "big")
+            for field_id, value in [(65553, n_bytes), (65554, n_packets)]:
+                data_field = table_entry.data.fields.add()
+                data_field.field_id = field_id
+                data_field.stream = value.to_bytes(8, "big")
+        responses.append(response)
+    return responses
+
+
+def test_values_array():
+    assert values_array([b"\x00\x01", b"\x01\x00"]).tolist() == [1, 256]
+    # Widths other than 1, 2, 4 and 8 bytes.
+    assert values_array([b"\x00\x00\x01", b"\x00\x01\x00"]).tolist() == [1, 256]
+    # Missing values are zero, of the same type as the others.
+    missing = values_array([None, b"\x00\x00\x00\x05", None])
+    assert missing.dtype == numpy.uint64 and missing.tolist() == [0, 5, 0]
+    assert values_array([[1, 2], None]).tolist() == [[1, 2], [0, 0]]
+    assert values_array([None, None]).tolist() == [0, 0]
+    assert values_array([[1, 2], [3, 4]]).shape == (2, 2)
+    assert values_array([]).shape == (0,)
+
+
+def test_collect_counters():
+    connection = FakeConnection()
+    connection.client.responses.append(
+        counter_responses(1, 65556, [(0, (100, 1)), (3, (200, 2)), (7, (300, 3))])
+    )
+    collector = TableCollector(connection, COUNTER_TABLE)
+    sample = collector.collect()
+
+    assert connection.syncs == [(COUNTER_TABLE, "SyncCounters")]
+    table_entry = connection.client.request.entities[0].table_entry
+    assert not table_entry.table_flags.from_hw
+    assert sample.index.tolist() == [0, 3, 7]
+    assert sample.values["$COUNTER_SPEC_BYTES"].tolist() == [100, 200, 300]
+    assert sample.values["$COUNTER_SPEC_PKTS"].dtype == numpy.uint64
+
+
+def test_poll_rates():
+    connection = FakeConnection()
+    connection.client.responses.append(
+        counter_responses(1, 65556, [(0, (100, 10)), (1, (200, 20))])
+    )
+    connection.client.responses.append(
+        counter_responses(1, 65556, [(0, (300, 15)), (1, (50, 5))])
+    )
+    collector = TableCollector(connection, COUNTER_TABLE, ["$COUNTER_SPEC_BYTES"])
+    sample, result = collector.poll()
+    assert result is None
+    assert list(sample.values) == ["$COUNTER_SPEC_BYTES"]
+    # As if the first poll was two seconds earlier.
+    collector.previous.time -= 2.0
+    sample, result = collector.poll()
+    # The second counter was cleared, so counted up from zero.
+    numpy.testing.assert_allclose(
+        result["$COUNTER_SPEC_BYTES"], [100.0, 25.0], rtol=1e-3
+    )
+
+
+def test_rates_match_entries_by_index():
+    previous = Sample(0.0, numpy.array([1, 2], dtype=numpy.uint64),
+                      {"n": numpy.array([10, 20], dtype=numpy.uint64)})
+    current = Sample(1.0, numpy.array([2, 3], dtype=numpy.uint64),
+                     {"n": numpy.array([25, 5], dtype=numpy.uint64)})
+    result = rates(previous, current)["n"]
+    assert result[0] == 5.0
+    assert numpy.isnan(result[1])
+
+
+def test_missing_fields():
+    connection = FakeConnection()
+    for counts in ([(0, (100, 1)), (1, (200, 2))], [(0, (300, 3)), (1, (400, 4))]):
+        responses = counter_responses(1, 65556, counts)
+        # The second entry has no packet count.
+        del responses[0].entities[1].table_entry.data.fields[1]
+        connection.client.responses.append(responses)
+    collector = TableCollector(connection, COUNTER_TABLE)
+    sample, _ = collector.poll()
+    assert sample.values["$COUNTER_SPEC_PKTS"].tolist() == [1, 0]
+    assert sample.missing["$COUNTER_SPEC_PKTS"].tolist() == [False, True]
+    assert "$COUNTER_SPEC_BYTES" not in sample.missing
+
+    collector.previous.time -= 1.0
+    _, result = collector.poll()
+    assert result["$COUNTER_SPEC_PKTS"][0] == pytest.approx(2.0, rel=1e-3)
+    assert numpy.isnan(result["$COUNTER_SPEC_PKTS"][1])
+    assert not numpy.isnan(result["$COUNTER_SPEC_BYTES"]).any()
+
+
+def test_direct_counters_are_numbered_by_key():
+    connection = FakeConnection()
+    for counts in ([(10, (1, 1)), (20, (2, 2))], [(20, (3, 3)), (10, (4, 4))]):
+        connection.client.responses.append(counter_responses(3, 1, counts))
+    collector = TableCollector(connection, ROUTE_TABLE)
+    assert collector.collect().index.tolist() == [0, 1]
+    sample = collector.collect()
+    assert sample.index.tolist() == [1, 0]
+    assert sample.values["$COUNTER_SPEC_PKTS"].tolist() == [3, 4]
+
+
+def test_registers():
+    connection = FakeConnection()
+    response = ReadResponse()
+    for index in range(2):
+        table_entry = response.entities.add().table_entry
+        table_entry.table_id = 2
+        key_field = table_entry.key.fields.add()
+        key_field.field_id = 65557
+        key_field.exact.value = index.to_bytes(4, "big")
+        data_field = table_entry.data.fields.add()
+        data_field.field_id = 1
+        data_field.int_arr_val.val.extend([index, index + 10])
+    connection.client.responses.append([response])
+    collector = TableCollector(connection, REGISTER_TABLE)
+    sample = collector.collect()
+    assert connection.syncs == [(REGISTER_TABLE, "SyncRegisters")]
+    assert sample.values["Ingress.flow_bytes.f1"].tolist() == [[0, 10], [1, 11]]
+
+
+def test_errors():
+    connection = FakeConnection()
+    with pytest.raises(UnknownTable):
+        TableCollector(connection, "pipe.Ingress.nope")
+    with pytest.raises(UnknownDataField):
+        TableCollector(connection, COUNTER_TABLE, ["$NOPE"])
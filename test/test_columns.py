@@ -0,0 +1,238 @@
+import json
+import os
+
+from bfrt_helper.bfrt import BfRtHelper
+from bfrt_helper.bfrt import InvalidActionParameter
+from bfrt_helper.bfrt import UnknownActionParameter
+from bfrt_helper.bfrt import UnknownKeyField
+from bfrt_helper.bfrt_info import BfRtInfo
+from bfrt_helper.fields import DevPort
+from bfrt_helper.fields import Field
+from bfrt_helper.fields import MACAddress
+from bfrt_helper.fields import PortId
+from bfrt_helper.match import Exact
+from bfrt_helper.match import LongestPrefixMatch
+from bfrt_helper.match import Ternary
+from bfrt_helper.pb2.bfruntime_pb2 import Update
+from bfrt_helper.util import InvalidValue
+from bfrt_helper.wire import WireTableWrite
+from bfrt_helper.wire import WireWriteBatch
+
+import pytest
+
+numpy = pytest.importorskip("numpy")
+
+from bfrt_helper.columns import UnsupportedColumn  # noqa: E402
+from bfrt_helper.columns import uint_column  # noqa: E402
+
+
+EXACT_TABLE = "pipe.TestIngressControl.port_forward_exact"
+TERNARY_TABLE = "pipe.TestIngressControl.port_forward_ternary"
+LPM_TABLE = "pipe.TestIngressControl.port_forward_lpm"
+FORWARD = "TestIngressControl.forward"
+DROP = "TestIngressControl.drop"
+
+
+bfrt_file = os.path.join(
+    os.path.abspath(os.path.dirname(__file__)), "resources/bfrt.json"
+)
+
+bfrt_data = json.loads(open(bfrt_file).read())
+bfrt_info = BfRtInfo(bfrt_data)
+bfrt_helper = BfRtHelper(0, 0, bfrt_info)
+
+
+class IPv6(Field):
+    bitwidth = 128
+
+
+ipv6_info = BfRtInfo(
+    {
+        "tables": [
+            {
+                "id": 1,
+                "name": "pipe.ipv6_route",
+                "key": [
+                    {
+                        "id": 1,
+                        "name": "dst_addr",
+                        "match_type": "LongestPrefixMatch",
+                        "type": {"type": "bytes", "width": 128},
+                    }
+                ],
+                "action_specs": [{"id": 2, "name": "drop", "data": []}],
+            }
+        ]
+    }
+)
+
+
+def expected_updates(helper, table_name, keys, action_name=None, params=None):
+    writer = WireTableWrite(helper.prepare_table_write(table_name, action_name))
+    params = params or [None] * len(keys)
+    return [writer(k, p) for k, p in zip(keys, params)]
+
+
+def test_exact_columns():
+    ports = numpy.arange(0, 300, dtype=numpy.uint16)
+    egress = 511 - ports
+    writer = bfrt_helper.prepare_column_write(EXACT_TABLE, FORWARD)
+    actual = writer(
+        {"ig_intr_md.ingress_port": ports}, {"egress_port": egress}
+    )
+    expected = expected_updates(
+        bfrt_helper,
+        EXACT_TABLE,
+        [{"ig_intr_md.ingress_port": Exact(PortId(int(p)))} for p in ports],
+        FORWARD,
+        [{"egress_port": PortId(int(p))} for p in egress],
+    )
+    assert actual == expected
+
+
+def test_ternary_columns():
+    values = [0x0000_0000_0001, 0xFFFF_FFFF_FFFF, 0x1234_5678_9ABC]
+    masks = [0xFFFF_FFFF_FFFF, 0xFF00_0000_0000, 0]
+    priorities = [1, 2, 0]
+    writer = bfrt_helper.prepare_column_write(TERNARY_TABLE, DROP)
+    actual = writer(
+        {
+            "hdr.ethernet.srcAddr": (values, masks),
+            "$MATCH_PRIORITY": priorities,
+        }
+    )
+    expected = expected_updates(
+        bfrt_helper,
+        TERNARY_TABLE,
+        [
+            {
+                "hdr.ethernet.srcAddr": Ternary(MACAddress(v), MACAddress(m)),
+                "$MATCH_PRIORITY": Exact(DevPort(p)),
+            }
+            for v, m, p in zip(values, masks, priorities)
+        ],
+        DROP,
+    )
+    assert actual == expected
+
+
+def test_lpm_columns():
+    values = numpy.array([0xFFFF_FFFF_FFFF] * 49, dtype=numpy.uint64)
+    prefixes = numpy.arange(49)
+    writer = bfrt_helper.prepare_column_write(LPM_TABLE, FORWARD, Update.Type.MODIFY)
+    actual = writer(
+        {"hdr.ethernet.srcAddr": (values, prefixes)},
+        {"egress_port": numpy.full(49, 3)},
+    )
+    writer = WireTableWrite(
+        bfrt_helper.prepare_table_write(LPM_TABLE, FORWARD, Update.Type.MODIFY)
+    )
+    expected = [
+        writer(
+            {"hdr.ethernet.srcAddr": LongestPrefixMatch(MACAddress(int(v)), int(p))},
+            {"egress_port": PortId(3)},
+        )
+        for v, p in zip(values, prefixes)
+    ]
+    assert actual == expected
+
+
+def test_wide_lpm_columns():
+    helper = BfRtHelper(0, 0, ipv6_info)
+    values = [(1 << 128) - 1, 0x2001_0DB8 << 96, 0]
+    prefixes = [128, 32, 0]
+    actual = helper.prepare_column_write("pipe.ipv6_route", "drop")(
+        {"dst_addr": (values, prefixes)}
+    )
+    expected = expected_updates(
+        helper,
+        "pipe.ipv6_route",
+        [{"dst_addr": LongestPrefixMatch(IPv6(v), p)} for v, p in zip(values, prefixes)],
+        "drop",
+    )
+    assert actual == expected
+
+
+def test_delete_columns():
+    ports = [1, 2, 3]
+    writer = bfrt_helper.prepare_column_write(EXACT_TABLE)
+    actual = writer({"ig_intr_md.ingress_port": ports}, update_type=Update.Type.DELETE)
+    prepared = bfrt_helper.prepare_table_write(EXACT_TABLE)
+    expected = [
+        WireTableWrite(prepared)(
+            {"ig_intr_md.ingress_port": Exact(PortId(p))},
+            update_type=Update.Type.DELETE,
+        )
+        for p in ports
+    ]
+    assert actual == expected
+
+
+def test_create_column_write_matches_wire_batch():
+    ports = numpy.arange(100)
+    batch = bfrt_helper.create_column_write(
+        "test",
+        EXACT_TABLE,
+        {"ig_intr_md.ingress_port": ports},
+        FORWARD,
+        {"egress_port": ports},
+        max_updates=30,
+    )
+    expected = WireWriteBatch(bfrt_helper, "test", max_updates=30)
+    for port in range(100):
+        expected.insert(
+            EXACT_TABLE,
+            {"ig_intr_md.ingress_port": Exact(PortId(port))},
+            FORWARD,
+            {"egress_port": PortId(port)},
+        )
+    assert batch.pop_all() == expected.pop_all()
+
+
+def test_value_out_of_range():
+    writer = bfrt_helper.prepare_column_write(EXACT_TABLE, FORWARD)
+    with pytest.raises(InvalidValue, match="row 1"):
+        writer({"ig_intr_md.ingress_port": [0, 512]})
+    with pytest.raises(InvalidValue):
+        writer({"ig_intr_md.ingress_port": [-1]})
+    with pytest.raises(InvalidActionParameter):
+        writer({"ig_intr_md.ingress_port": [0]}, {"egress_port": [512]})
+
+
+def test_wide_values_must_be_integers():
+    assert uint_column([1, numpy.uint64(2)], 128) == [1, 2]
+    for values in ([1.5, 2], [1, True], [1, "2"]):
+        with pytest.raises(InvalidValue, match="row"):
+            uint_column(values, 128)
+
+
+def test_params_without_action():
+    writer = bfrt_helper.prepare_column_write(EXACT_TABLE)
+    with pytest.raises(ValueError):
+        writer({"ig_intr_md.ingress_port": [0]}, {"egress_port": [1]})
+
+
+def test_prefix_out_of_range():
+    writer = bfrt_helper.prepare_column_write(LPM_TABLE, DROP)
+    with pytest.raises(InvalidValue):
+        writer({"hdr.ethernet.srcAddr": ([0], [49])})
+
+
+def test_unknown_fields():
+    writer = bfrt_helper.prepare_column_write(EXACT_TABLE, FORWARD)
+    with pytest.raises(UnknownKeyField):
+        writer({"hdr.ethernet.srcAddr": [0]})
+    with pytest.raises(UnknownActionParameter):
+        writer({"ig_intr_md.ingress_port": [0]}, {"port": [0]})
+
+
+def test_unsupported_column():
+    writer = bfrt_helper.prepare_column_write("$PORT_STR_INFO")
+    with pytest.raises(UnsupportedColumn):
+        writer({"$PORT_NAME": ["1/0"]})
+
+
+def test_mismatched_lengths():
+    writer = bfrt_helper.prepare_column_write(EXACT_TABLE, FORWARD)
+    with pytest.raises(ValueError):
+        writer({"ig_intr_md.ingress_port": [0, 1]}, {"egress_port": [0]})
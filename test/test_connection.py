@@ -0,0 +1,211 @@
+import json
+import os
+
+from bfrt_helper.bfrt import BfRtHelper
+from bfrt_helper.bfrt_info import BfRtInfo
+from bfrt_helper.connection import BfRtConnection
+from bfrt_helper.fields import PortId
+from bfrt_helper.match import Exact
+from bfrt_helper.pb2.bfruntime_pb2 import ReadResponse
+from bfrt_helper.pb2.bfruntime_pb2 import SetForwardingPipelineConfigRequest
+from bfrt_helper.pipeline import Pipeline
+from bfrt_helper.pipeline import PipelineProfile
+
+import pytest
+
+
+BEGIN = SetForwardingPipelineConfigRequest.VERIFY_AND_WARM_INIT_BEGIN
+END = SetForwardingPipelineConfigRequest.WARM_INIT_END
+
+EXACT_TABLE = "pipe.TestIngressControl.port_forward_exact"
+FORWARD = "TestIngressControl.forward"
+
+bfrt_file = os.path.join(
+    os.path.abspath(os.path.dirname(__file__)), "resources/bfrt.json"
+)
+bfrt_info = BfRtInfo(json.loads(open(bfrt_file).read()))
+connection_helper = BfRtHelper(0, 3, bfrt_info)
+
+
+class FakeClient:
+    """Reads ``responses``, and records the requests written."""
+
+    def __init__(self, calls, responses):
+        self.calls = calls
+        self.responses = responses
+
+    def Read(self, request):
+        self.calls.append(("read", request))
+        return iter(self.responses)
+
+    def Write(self, request):
+        self.calls.append(("write", request))
+
+
+def make_connection(responses=(), info=bfrt_info):
+    """Creates a connection without connecting, which records the requests
+    and calls made."""
+    connection = BfRtConnection.__new__(BfRtConnection)
+    connection.helper = BfRtHelper(0, 3, info)
+    connection.p4_name = None
+    connection.calls = []
+    connection.client = FakeClient(connection.calls, responses)
+
+    def set_forwarding_pipeline(data):
+        request = SetForwardingPipelineConfigRequest.FromString(data)
+        connection.calls.append(("set", request))
+
+    def retrieve_config():
+        connection.p4_name = "forwarder"
+        connection.calls.append(("retrieve", None))
+
+    connection.raw_set_forwarding_pipeline = set_forwarding_pipeline
+    connection.retrieve_config = retrieve_config
+    return connection
+
+
+def make_pipeline(tmp_path):
+    paths = []
+    for name in ("bf-rt.json", "context.json", "tofino.bin"):
+        path = tmp_path / name
+        path.write_bytes(b"{}")
+        paths.append(str(path))
+    return Pipeline("forwarder", paths[0], [PipelineProfile(paths[1], paths[2])])
+
+
+def port_forward_responses(n_entries):
+    response = ReadResponse()
+    for port in range(n_entries):
+        request = connection_helper.create_table_write(
+            "forwarder",
+            EXACT_TABLE,
+            {"ig_intr_md.ingress_port": Exact(PortId(port))},
+            FORWARD,
+            {"egress_port": PortId(port + 1)},
+        )
+        response.entities.add().table_entry.CopyFrom(
+            request.updates[0].entity.table_entry
+        )
+    default = response.entities.add().table_entry
+    default.table_id = bfrt_info.get_table_id(EXACT_TABLE)
+    default.is_default_entry = True
+    return [response]
+
+
+def test_warm_init_replays_captured_tables(tmp_path):
+    connection = make_connection(port_forward_responses(5))
+    connection.p4_name = "forwarder"
+
+    timings = connection.warm_init([make_pipeline(tmp_path)], [EXACT_TABLE])
+
+    names = [name for name, _ in connection.calls]
+    assert names == ["read", "set", "retrieve", "write", "set"]
+    assert connection.calls[1][1].action == BEGIN
+    assert connection.calls[-1][1].action == END
+    assert timings.entries == 5
+    assert timings.capture >= 0
+
+    write = connection.calls[3][1]
+    assert len(write.updates) == 5
+    table_entry = write.updates[4].entity.table_entry
+    assert table_entry.key.fields[0].exact.value == b"\x00\x04"
+    assert table_entry.data.fields[0].stream == b"\x00\x05"
+
+
+def test_replay_tables_writes_full_requests(tmp_path):
+    connection = make_connection(port_forward_responses(10))
+    connection.p4_name = "forwarder"
+    entries = connection.capture_tables([EXACT_TABLE])
+    assert len(entries) == 10
+
+    assert connection.replay_tables(entries, max_updates=4) == 10
+    writes = [request for name, request in connection.calls if name == "write"]
+    assert [len(request.updates) for request in writes] == [4, 4, 2]
+
+
+def ttl_info():
+    """The BfRt info, with the exact table given an entry TTL, and a read only
+    hit state."""
+    data = json.loads(open(bfrt_file).read())
+    for table in data["tables"]:
+        if table["name"] == EXACT_TABLE:
+            table["data"] = [
+                {"mandatory": False, "read_only": False,
+                 "singleton": {"id": 65537, "name": "$ENTRY_TTL",
+                               "type": {"type": "uint32"}}},
+                {"mandatory": False, "read_only": True,
+                 "singleton": {"id": 65538, "name": "$ENTRY_HIT_STATE",
+                               "type": {"type": "uint32"}}},
+            ]
+    return BfRtInfo(data)
+
+
+def test_replay_tables_keeps_data_of_action_entries():
+    info = ttl_info()
+    response = ReadResponse()
+    table_entry = response.entities.add().table_entry
+    table_entry.CopyFrom(
+        port_forward_responses(1)[0].entities[0].table_entry
+    )
+    for field_id, value in ((65537, 5000), (65538, 1)):
+        data_field = table_entry.data.fields.add()
+        data_field.field_id = field_id
+        data_field.stream = value.to_bytes(4, "big")
+    connection = make_connection([response], info)
+    connection.p4_name = "forwarder"
+
+    entries = connection.capture_tables([EXACT_TABLE])
+    assert connection.replay_tables(entries) == 1
+
+    write = [request for name, request in connection.calls if name == "write"][0]
+    data = write.updates[0].entity.table_entry.data
+    assert data.action_id == info.get_action_spec(EXACT_TABLE, FORWARD).id
+    fields = {field.field_id: field.stream for field in data.fields}
+    egress_port_id = info.get_action_field(EXACT_TABLE, FORWARD, "egress_port").id
+    assert fields == {egress_port_id: b"\x00\x01", 65537: (5000).to_bytes(4, "big")}
+
+
+def test_warm_init_phases(tmp_path):
+    connection = make_connection()
+
+    def replay(replay_connection):
+        assert replay_connection.p4_name == "forwarder"
+        connection.calls.append(("replay", None))
+        return 10
+
+    timings = connection.warm_init([make_pipeline(tmp_path)], replay=replay)
+
+    names = [name for name, _ in connection.calls]
+    assert names == ["set", "retrieve", "replay", "set"]
+    begin = connection.calls[0][1]
+    assert begin.action == BEGIN
+    assert begin.config[0].p4_name == "forwarder"
+    end = connection.calls[-1][1]
+    assert end.action == END
+    assert len(end.config) == 0
+    assert end.device_id == 0 and end.client_id == 3
+
+    assert timings.entries == 10
+    assert min(timings.begin, timings.replay, timings.end) >= 0
+    assert timings.capture + timings.begin + timings.replay + timings.end == timings.total
+
+
+def test_warm_init_failed_replay_does_not_end(tmp_path):
+    connection = make_connection()
+
+    def replay(replay_connection):
+        raise RuntimeError("write failed")
+
+    with pytest.raises(RuntimeError):
+        connection.warm_init([make_pipeline(tmp_path)], replay=replay)
+
+    actions = [request.action for name, request in connection.calls if name == "set"]
+    assert actions == [BEGIN]
+
+    connection.end_warm_init()
+    assert connection.calls[-1][1].action == END
+
+
+def test_lazy_rejected_with_cache(tmp_path):
+    with pytest.raises(ValueError):
+        BfRtConnection("localhost:50052", 0, 3, lazy=True, cache_dir=str(tmp_path))
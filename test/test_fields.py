@@ -1,4 +1,10 @@
+import copy
+import pickle
+
+from bfrt_helper.fields import DevPort
 from bfrt_helper.fields import Field
+from bfrt_helper.fields import IPv4Address
+from bfrt_helper.fields import PortId
 from bfrt_helper.fields import StringField
 from bfrt_helper.fields import InvalidValue
 from bfrt_helper.fields import InvalidOperation
@@ -12,6 +18,8 @@ class EightBit(Field):
 
 
 class ThirtyTwoBit(Field):
+    __slots__ = ()
+
     bitwidth = 32
 
 
@@ -150,3 +158,89 @@ def test_string_field_invalid_operations():
 
     with pytest.raises(InvalidOperation):
         field.max_value()
+
+
+def test_fields_are_slotted():
+    assert not hasattr(PortId(1), "__dict__")
+    assert not hasattr(ThirtyTwoBit(1), "__dict__")
+    assert not hasattr(StringField("a"), "__dict__")
+
+
+def test_field_bitwidth_is_class_level():
+    assert PortId(1).bitwidth == 9
+    assert PortId.max_value() == 511
+    assert EightBit.max_value() == 255
+    with pytest.raises(InvalidValue):
+        PortId(512)
+
+
+def test_field_json():
+    assert PortId(3).json() == {"bitwidth": 9, "value": 3}
+    assert IPv4Address("0.0.0.1").json() == {"bitwidth": 32, "value": 1}
+    assert StringField("a").json() == {"value": "a"}
+
+
+def test_field_pickles():
+    field = pickle.loads(pickle.dumps(ThirtyTwoBit(7)))
+    assert field == ThirtyTwoBit(7)
+    assert field.bitwidth == 32
+
+
+def test_fields_are_immutable():
+    field = PortId(1)
+    with pytest.raises(AttributeError):
+        field.value = 2
+    with pytest.raises(AttributeError):
+        del field.value
+    assert field.value == 1
+
+
+def test_unslotted_subclass_can_set_own_attributes():
+    field = EightBit(1)
+    field.note = "spare"
+    assert field.json() == {"bitwidth": 8, "value": 1, "note": "spare"}
+    with pytest.raises(AttributeError):
+        field.value = 2
+
+
+def test_field_to_bytes_is_memoised():
+    field = PortId(300)
+    assert field.to_bytes() == b"\x01\x2c"
+    assert field.to_bytes() is field.to_bytes()
+    assert "_bytes" not in field.json()
+
+
+def test_field_copies():
+    field = PortId(300)
+    field.to_bytes()
+    assert copy.copy(field) == field
+    assert copy.deepcopy(field).to_bytes() == b"\x01\x2c"
+
+
+def test_flyweight_shares_narrow_fields():
+    port = PortId.flyweight(64)
+    assert port is PortId.flyweight(64)
+    assert port == PortId(64)
+    assert port.to_bytes() == b"\x00\x40"
+    assert PortId.flyweight(65) is not port
+    assert EightBit.flyweight(1) is not PortId.flyweight(1)
+
+
+def test_flyweight_normalises_value():
+    port = EightBit.flyweight(True)
+    assert type(port.value) is int and port.value == 1
+    assert EightBit.flyweight(1) is port
+    with pytest.raises(TypeError):
+        EightBit.flyweight(1.0)
+
+
+def test_flyweight_of_wide_field_is_new_instance():
+    assert DevPort.flyweight(1) == DevPort(1)
+    assert DevPort.flyweight(1) is not DevPort.flyweight(1)
+
+
+def test_flyweight_rejects_invalid_value():
+    with pytest.raises(InvalidValue):
+        PortId.flyweight(512)
+    with pytest.raises(InvalidValue):
+        PortId.flyweight(512)
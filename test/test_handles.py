@@ -0,0 +1,174 @@
+import json
+import os
+
+from bfrt_helper.bfrt import BfRtHelper
+from bfrt_helper.bfrt import UnknownTable
+from bfrt_helper.bfrt_info import BfRtInfo
+from bfrt_helper.fields import IPv4Address
+from bfrt_helper.fields import PortId
+from bfrt_helper.fields import field_class
+from bfrt_helper.handles import HandleCache
+from bfrt_helper.handles import MismatchedHandles
+from bfrt_helper.handles import handle_key
+from bfrt_helper.match import Exact
+from bfrt_helper.match import LongestPrefixMatch
+from bfrt_helper.match import Range
+from bfrt_helper.match import Ternary
+from bfrt_helper.read import ReadEntry
+from bfrt_helper.wire import WireWriteBatch
+
+import pytest
+
+
+EXACT_TABLE = "pipe.TestIngressControl.port_forward_exact"
+FORWARD = "TestIngressControl.forward"
+
+
+bfrt_file = os.path.join(
+    os.path.abspath(os.path.dirname(__file__)), "resources/bfrt.json"
+)
+
+bfrt_data = json.loads(open(bfrt_file).read())
+bfrt_info = BfRtInfo(bfrt_data)
+bfrt_helper = BfRtHelper(0, 0, bfrt_info)
+
+
+def port_key(port):
+    return {"ig_intr_md.ingress_port": Exact(PortId(port))}
+
+
+class FakeConnection:
+    def __init__(self, ports=()):
+        self.requests = []
+        self.ports = ports
+
+    def read_handles(self, table_name, keys, program_name=None):
+        request = bfrt_helper.create_handle_read("test", table_name, keys)
+        self.requests.append(request)
+        # Handles are the port number plus 1000.
+        return [
+            int.from_bytes(entity.handle.key.fields[0].exact.value, "big") + 1000
+            for entity in request.entities
+        ]
+
+    def read_table(self, table_name, key=None, program_name=None, from_hw=None):
+        # Entries are read back with the fields of the generic classes.
+        for port in self.ports:
+            request = bfrt_helper.create_table_write(
+                "test", table_name, port_key(port), FORWARD, {"egress_port": PortId(0)}
+            )
+            yield ReadEntry(bfrt_info, request.updates[0].entity.table_entry)
+
+
+def test_create_handle_read():
+    request = bfrt_helper.create_handle_read("test", EXACT_TABLE, [port_key(1)])
+    handle = request.entities[0].handle
+    assert handle.table_id == bfrt_info.get_table_id(EXACT_TABLE)
+    assert handle.key.fields[0].exact.value == b"\x00\x01"
+    with pytest.raises(UnknownTable):
+        bfrt_helper.create_handle_read("test", "pipe.nope", [port_key(1)])
+
+
+def test_fetch_in_chunks():
+    connection = FakeConnection()
+    handles = HandleCache(EXACT_TABLE)
+    handles.fetch(connection, [port_key(port) for port in range(5)], chunk_size=2)
+    assert [len(r.entities) for r in connection.requests] == [2, 2, 1]
+    assert len(handles) == 5
+    # Keys are compared by value.
+    assert handles.get(port_key(3)) == 1003
+    assert port_key(4) in handles
+    assert handles.get(port_key(5)) is None
+
+
+def test_fetch_raises_on_mismatched_handles():
+    connection = FakeConnection()
+    connection.read_handles = lambda table_name, keys, program_name: [1000]
+    handles = HandleCache(EXACT_TABLE)
+    with pytest.raises(MismatchedHandles):
+        handles.fetch(connection, [port_key(0), port_key(1)])
+    assert len(handles) == 0
+
+
+def test_fetch_table():
+    connection = FakeConnection(ports=range(5))
+    handles = HandleCache(EXACT_TABLE)
+    handles.fetch_table(connection, chunk_size=2)
+    assert [len(r.entities) for r in connection.requests] == [2, 2, 1]
+    assert handles.get(port_key(4)) == 1004
+
+
+def test_fetch_inserted():
+    connection = FakeConnection()
+    handles = HandleCache(EXACT_TABLE)
+    batch = WireWriteBatch(bfrt_helper, "test")
+    params = {"egress_port": PortId(2)}
+    for port in range(3):
+        handles.insert(batch, port_key(port), FORWARD, params)
+    handles.delete(batch, port_key(2))
+
+    expected = WireWriteBatch(bfrt_helper, "test")
+    for port in range(3):
+        expected.insert(EXACT_TABLE, port_key(port), FORWARD, params)
+    expected.delete(EXACT_TABLE, port_key(2))
+    assert batch.pop_all() == expected.pop_all()
+
+    handles.fetch(connection)
+    assert len(connection.requests[0].entities) == 2
+    assert handles.get(port_key(1)) == 1001
+    assert port_key(2) not in handles
+    # Nothing is left to fetch.
+    handles.fetch(connection)
+    assert len(connection.requests) == 1
+
+
+def test_modify_and_delete_by_handle_or_key():
+    handles = HandleCache(EXACT_TABLE)
+    handles.add(port_key(1), 1001)
+    params = {"egress_port": PortId(2)}
+
+    batch = WireWriteBatch(bfrt_helper, "test")
+    handles.modify(batch, port_key(1), FORWARD, params)
+    handles.modify(batch, port_key(2), FORWARD, params)
+    handles.delete(batch, port_key(1))
+
+    expected = WireWriteBatch(bfrt_helper, "test")
+    expected.modify_handle(EXACT_TABLE, 1001, FORWARD, params)
+    expected.modify(EXACT_TABLE, port_key(2), FORWARD, params)
+    expected.delete_handle(EXACT_TABLE, 1001)
+    assert batch.pop_all() == expected.pop_all()
+    assert port_key(1) not in handles
+
+
+def test_handle_update_is_smaller():
+    handles = HandleCache(EXACT_TABLE)
+    handles.add(port_key(1), 1001)
+    by_key = WireWriteBatch(bfrt_helper, "test")
+    by_key.delete(EXACT_TABLE, port_key(1))
+    by_handle = WireWriteBatch(bfrt_helper, "test")
+    handles.delete(by_handle, port_key(1))
+    assert len(by_handle.pop_all()[0][0]) < len(by_key.pop_all()[0][0])
+
+
+def test_handle_key_across_field_classes():
+    # Keys read from the server hold fields of the generic class of their
+    # bitwidth, which cannot be compared with the named classes.
+    read_key = {"ig_intr_md.ingress_port": Exact(field_class(9)(3))}
+    handles = HandleCache(EXACT_TABLE)
+    handles.add(port_key(3), 1003)
+    assert handles.get(read_key) == 1003
+    assert handle_key({"a": Exact(PortId(1)), "b": Exact(PortId(2))}) == handle_key(
+        {"b": Exact(PortId(2)), "a": Exact(PortId(1))}
+    )
+
+
+def test_handle_key_distinguishes_matches():
+    address = IPv4Address("10.0.0.0")
+    keys = [
+        {"f": Exact(address)},
+        {"f": Ternary(address, IPv4Address("255.0.0.0"))},
+        {"f": LongestPrefixMatch(address, 8)},
+        {"f": LongestPrefixMatch(address, 16)},
+        {"f": Range(address, IPv4Address("10.255.255.255"))},
+    ]
+    assert len({handle_key(key) for key in keys}) == len(keys)
@@ -0,0 +1,249 @@
+import io
+import json
+import os
+
+from bfrt_helper.bfrt import BfRtHelper
+from bfrt_helper.bfrt import UnknownTable
+from bfrt_helper.bfrt_info import BfRtInfo
+from bfrt_helper.connection import BatchWriteError
+from bfrt_helper.connection import BfRtConnection
+from bfrt_helper.fields import DevPort
+from bfrt_helper.fields import MACAddress
+from bfrt_helper.fields import PortId
+from bfrt_helper.loader import LoaderError
+from bfrt_helper.loader import Progress
+from bfrt_helper.loader import TableLoader
+from bfrt_helper.loader import load
+from bfrt_helper.loader import parse_int
+from bfrt_helper.loader import parse_match
+from bfrt_helper.loader import read_csv
+from bfrt_helper.loader import read_jsonl
+from bfrt_helper.match import Exact
+from bfrt_helper.match import LongestPrefixMatch
+from bfrt_helper.match import Optional
+from bfrt_helper.match import Range
+from bfrt_helper.match import Ternary
+from bfrt_helper.pb2.bfruntime_pb2 import Update
+from bfrt_helper.wire import WireWriteBatch
+
+import grpc
+import pytest
+
+
+EXACT_TABLE = "pipe.TestIngressControl.port_forward_exact"
+TERNARY_TABLE = "pipe.TestIngressControl.port_forward_ternary"
+LPM_TABLE = "pipe.TestIngressControl.port_forward_lpm"
+FORWARD = "TestIngressControl.forward"
+DROP = "TestIngressControl.drop"
+
+
+bfrt_file = os.path.join(
+    os.path.abspath(os.path.dirname(__file__)), "resources/bfrt.json"
+)
+
+bfrt_data = json.loads(open(bfrt_file).read())
+bfrt_info = BfRtInfo(bfrt_data)
+bfrt_helper = BfRtHelper(0, 0, bfrt_info)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.pairs = []
+
+    def write_requests(self, pairs, unit="updates"):
+        self.pairs.extend(pairs)
+
+
+def requests(loader, records):
+    return [(r, e, lines) for r, e, lines in loader.requests(records)]
+
+
+def test_csv_exact():
+    f = io.StringIO(
+        "ig_intr_md.ingress_port,egress_port,action\n"
+        "1,0x40\n"
+        "2, 65\n"
+        "3,,TestIngressControl.drop\n"
+    )
+    loader = TableLoader(bfrt_helper, "test", EXACT_TABLE, FORWARD)
+    actual = requests(loader, read_csv(f))
+
+    expected = WireWriteBatch(bfrt_helper, "test")
+    expected.insert(
+        EXACT_TABLE,
+        {"ig_intr_md.ingress_port": Exact(PortId(1))},
+        FORWARD,
+        {"egress_port": PortId(64)},
+    )
+    expected.insert(
+        EXACT_TABLE,
+        {"ig_intr_md.ingress_port": Exact(PortId(2))},
+        FORWARD,
+        {"egress_port": PortId(65)},
+    )
+    expected.insert(EXACT_TABLE, {"ig_intr_md.ingress_port": Exact(PortId(3))}, DROP)
+    assert actual == [(r, e, range(2, 5)) for r, e in expected.pop_all()]
+
+
+def test_jsonl_ternary_and_lpm():
+    records = [
+        {
+            "hdr.ethernet.srcAddr": "00:00:00:00:00:01 &&& ff:ff:ff:ff:ff:ff",
+            "$MATCH_PRIORITY": 10,
+        },
+        {"hdr.ethernet.srcAddr": "0x0a0000000000"},
+    ]
+    f = io.StringIO("\n\n".join(json.dumps(r) for r in records))
+    loader = TableLoader(bfrt_helper, "test", TERNARY_TABLE, DROP)
+    actual = requests(loader, read_jsonl(f))
+
+    expected = WireWriteBatch(bfrt_helper, "test")
+    expected.insert(
+        TERNARY_TABLE,
+        {
+            "hdr.ethernet.srcAddr": Ternary(
+                MACAddress("00:00:00:00:00:01"), MACAddress("ff:ff:ff:ff:ff:ff")
+            ),
+            "$MATCH_PRIORITY": Exact(DevPort(10)),
+        },
+        DROP,
+    )
+    expected.insert(
+        TERNARY_TABLE,
+        {"hdr.ethernet.srcAddr": Ternary(MACAddress("0a:00:00:00:00:00"))},
+        DROP,
+    )
+    assert actual == [(r, e, range(1, 4)) for r, e in expected.pop_all()]
+
+    f = io.StringIO('{"hdr.ethernet.srcAddr": "0a:00:00:00:00:00/8"}\n')
+    loader = TableLoader(bfrt_helper, "test", LPM_TABLE, DROP)
+    actual = requests(loader, read_jsonl(f))
+    expected = WireWriteBatch(bfrt_helper, "test")
+    expected.insert(
+        LPM_TABLE,
+        {"hdr.ethernet.srcAddr": LongestPrefixMatch(MACAddress("0a:00:00:00:00:00"), 8)},
+        DROP,
+    )
+    assert [r for r, _, _ in actual] == [r for r, _ in expected.pop_all()]
+
+
+def test_delete_ignores_parameters():
+    f = io.StringIO("ig_intr_md.ingress_port,egress_port\n1,2\n")
+    loader = TableLoader(
+        bfrt_helper, "test", EXACT_TABLE, FORWARD, update_type=Update.Type.DELETE
+    )
+    actual = requests(loader, read_csv(f))
+
+    expected = WireWriteBatch(bfrt_helper, "test")
+    expected.delete(EXACT_TABLE, {"ig_intr_md.ingress_port": Exact(PortId(1))})
+    assert [r for r, _, _ in actual] == [r for r, _ in expected.pop_all()]
+
+
+def test_requests_are_streamed():
+    lines = ["ig_intr_md.ingress_port,egress_port"]
+    lines += [f"{port},{port}" for port in range(25)]
+    records = read_csv(io.StringIO("\n".join(lines)))
+    loader = TableLoader(bfrt_helper, "test", EXACT_TABLE, FORWARD, max_updates=10)
+
+    stream = loader.requests(records)
+    _, entries, lines = next(stream)
+    assert entries == range(0, 10)
+    assert lines == range(2, 12)
+    # Only the records of the next request have been read.
+    assert len(loader.batch) == 1
+    assert [(e, lines) for _, e, lines in stream] == [
+        (range(10, 20), range(12, 22)),
+        (range(20, 25), range(22, 27)),
+    ]
+
+
+def test_unknown_column():
+    f = io.StringIO("ig_intr_md.ingress_port,port\n1,2\n")
+    loader = TableLoader(bfrt_helper, "test", EXACT_TABLE, FORWARD)
+    with pytest.raises(LoaderError, match="Line 2"):
+        requests(loader, read_csv(f))
+
+
+def test_invalid_value():
+    f = io.StringIO("ig_intr_md.ingress_port,egress_port\n1,2\n512,2\n")
+    loader = TableLoader(bfrt_helper, "test", EXACT_TABLE, FORWARD)
+    with pytest.raises(LoaderError) as err:
+        requests(loader, read_csv(f))
+    assert err.value.line == 3
+
+
+def test_parse_int():
+    assert parse_int("010", 16) == 10
+    assert parse_int(" 007", 16) == 7
+    assert parse_int("0x10", 16) == 16
+    assert parse_int("0B11", 16) == 3
+    assert parse_int("0o17", 16) == 15
+    with pytest.raises(ValueError):
+        parse_int("12ab", 16)
+
+
+def test_parse_range():
+    info_type = {"type": "bytes", "width": 16}
+    match = parse_match("1024..0xffff", "Range", info_type)
+    assert isinstance(match, Range)
+    assert (match.low.value, match.high.value) == (1024, 0xFFFF)
+    match = parse_match(80, "Range", info_type)
+    assert (match.low.value, match.high.value) == (80, 80)
+
+
+def test_parse_optional():
+    info_type = {"type": "bytes", "width": 9}
+    match = parse_match("5", "Optional", info_type)
+    assert isinstance(match, Optional)
+    assert match.is_valid and match.value.value == 5
+    assert not parse_match("_", "Optional", info_type).is_valid
+
+
+def test_invalid_json():
+    with pytest.raises(LoaderError, match="Line 2"):
+        list(read_jsonl(io.StringIO('{}\n{"a": \n')))
+
+
+def test_unknown_table():
+    with pytest.raises(UnknownTable):
+        TableLoader(bfrt_helper, "test", "pipe.TestIngressControl.nope")
+
+
+def test_load_reports_progress():
+    lines = ["ig_intr_md.ingress_port,egress_port"]
+    lines += [f"{port},{port}" for port in range(25)]
+    records = read_csv(io.StringIO("\n".join(lines)))
+    loader = TableLoader(bfrt_helper, "test", EXACT_TABLE, FORWARD, max_updates=10)
+    connection = FakeConnection()
+    output = io.StringIO()
+
+    written = load(connection, loader, records, Progress(output, interval=0))
+
+    assert written == 25
+    assert [lines for _, lines in connection.pairs] == [
+        range(2, 12), range(12, 22), range(22, 27)
+    ]
+    reports = output.getvalue().splitlines()
+    assert len(reports) == 4
+    assert reports[-1].startswith("25 entries, ")
+
+
+def test_load_failure_names_lines():
+    lines = ["ig_intr_md.ingress_port,egress_port"]
+    lines += [f"{port},{port}" for port in range(25)]
+    records = read_csv(io.StringIO("\n".join(lines)))
+    loader = TableLoader(bfrt_helper, "test", EXACT_TABLE, FORWARD, max_updates=10)
+    connection = BfRtConnection.__new__(BfRtConnection)
+    written = []
+
+    def raw_write(request):
+        if written:
+            raise grpc.RpcError("ALREADY_EXISTS")
+        written.append(request)
+
+    connection.raw_write = raw_write
+
+    with pytest.raises(BatchWriteError) as err:
+        load(connection, loader, records)
+    assert err.value.failed == range(12, 22)
+    assert str(err.value).startswith("Write of lines 12-21 failed")
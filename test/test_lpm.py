@@ -1,6 +1,8 @@
 from bfrt_helper.fields import IPv4Address
 from bfrt_helper.match import LongestPrefixMatch
 from bfrt_helper.match import Field
+from bfrt_helper.match import Ternary
+from bfrt_helper.match import prefix_mask
 from bfrt_helper.util import InvalidValue
 
 import pytest
@@ -72,3 +74,13 @@ def test_lpm_does_not_raise_with_maximum_prefix():
 def test_lpm_raises_when_prefix_exceeds_maximum():
     with pytest.raises(InvalidValue):
         LongestPrefixMatch(EightBit(42), prefix=EightBit.bitwidth + 1)
+
+
+def test_prefix_masks_are_shared():
+    a = LongestPrefixMatch(IPv4Address("10.0.0.0"), 24)
+    b = LongestPrefixMatch(IPv4Address("10.0.1.0"), 24)
+    assert a.mask is b.mask
+    assert a.mask is prefix_mask(IPv4Address, 24)
+    assert str(a.mask) == "255.255.255.0"
+    assert Ternary(IPv4Address("10.0.0.1")).mask is prefix_mask(IPv4Address, 32)
+    assert prefix_mask(IPv4Address, 0).value == 0
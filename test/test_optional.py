@@ -0,0 +1,55 @@
+from bfrt_helper.fields import Field
+from bfrt_helper.match import Key
+from bfrt_helper.match import Optional
+from bfrt_helper.match import Ternary
+
+
+class EightBit(Field):
+    bitwidth = 8
+
+
+def test_optional_to_string():
+    assert str(Optional(EightBit(42))) == "42"
+    assert str(Optional(EightBit(42), is_valid=False)) == "_"
+
+
+def test_optional_masks():
+    assert Optional(EightBit(42)).mask == EightBit(0xFF)
+    match = Optional(EightBit(42), is_valid=False)
+    assert match.mask == EightBit(0)
+    assert match.value == EightBit(0)
+
+
+def test_invalid_optionals_are_equal():
+    assert Optional(EightBit(1), is_valid=False) == Optional(EightBit(2), is_valid=False)
+    assert Optional(EightBit(1)) != Optional(EightBit(2))
+
+
+def test_optional_subsets():
+    any_value = Optional(EightBit(0), is_valid=False)
+    one_value = Optional(EightBit(42))
+    assert one_value <= any_value
+    assert one_value < any_value
+    assert any_value > one_value
+    assert not one_value.overlaps(any_value)
+    assert not one_value <= Optional(EightBit(43))
+
+
+def test_optional_is_subset_of_ternary():
+    assert Optional(EightBit(0x42)) <= Ternary(EightBit(0x40), 0xF0)
+
+
+def test_optional_intersection_and_merge():
+    any_value = Optional(EightBit(0), is_valid=False)
+    one_value = Optional(EightBit(42))
+    assert isinstance(any_value & one_value, Optional)
+    assert any_value & one_value == one_value
+    assert (any_value | one_value) == any_value
+
+
+def test_key_with_optional():
+    outer = Key(port=Optional(EightBit(0), is_valid=False), vlan=Optional(EightBit(1)))
+    inner = Key(port=Optional(EightBit(7)), vlan=Optional(EightBit(1)))
+    assert inner <= outer
+    assert not outer <= inner
+    assert outer & inner == inner
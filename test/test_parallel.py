@@ -0,0 +1,106 @@
+import json
+import os
+
+from bfrt_helper.bfrt import BfRtHelper
+from bfrt_helper.bfrt import UnknownAction
+from bfrt_helper.bfrt import UnknownTable
+from bfrt_helper.bfrt_info import BfRtInfo
+from bfrt_helper.fields import PortId
+from bfrt_helper.match import Exact
+from bfrt_helper.parallel import ParallelEncoder
+from bfrt_helper.parallel import ParallelEncodingError
+from bfrt_helper.parallel import write_parallel
+from bfrt_helper.wire import WireWriteBatch
+
+import pytest
+
+
+EXACT_TABLE = "pipe.TestIngressControl.port_forward_exact"
+FORWARD = "TestIngressControl.forward"
+
+
+bfrt_file = os.path.join(
+    os.path.abspath(os.path.dirname(__file__)), "resources/bfrt.json"
+)
+
+bfrt_data = json.loads(open(bfrt_file).read())
+bfrt_info = BfRtInfo(bfrt_data)
+bfrt_helper = BfRtHelper(0, 5, bfrt_info)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.pairs = []
+
+    def write_requests(self, pairs, unit="updates"):
+        self.pairs.extend(pairs)
+
+
+def make_entries(n_entries):
+    for port in range(n_entries):
+        yield (
+            {"ig_intr_md.ingress_port": Exact(PortId(port % 512))},
+            {"egress_port": PortId(511 - port % 512)},
+        )
+
+
+@pytest.fixture(scope="module")
+def encoder():
+    with ParallelEncoder(bfrt_helper, processes=2, chunk_size=25) as encoder:
+        yield encoder
+
+
+def test_requests_match_wire_batch(encoder):
+    actual = list(
+        encoder.encode("test", EXACT_TABLE, make_entries(110), FORWARD, max_updates=10)
+    )
+
+    expected = []
+    batch = WireWriteBatch(bfrt_helper, "test", max_updates=10)
+    for start in range(0, 110, 25):
+        for key, params in list(make_entries(110))[start:start + 25]:
+            batch.insert(EXACT_TABLE, key, FORWARD, params)
+        # Requests do not span shards.
+        expected.extend(batch.pop_all())
+    assert actual == expected
+    assert actual[-1][1] == range(100, 110)
+
+
+def test_write_parallel(encoder):
+    connection = FakeConnection()
+    requests = encoder.encode("test", EXACT_TABLE, make_entries(60), FORWARD)
+    assert write_parallel(connection, requests) == 60
+    assert [r for _, r in connection.pairs] == [
+        range(0, 25), range(25, 50), range(50, 60)
+    ]
+
+
+def test_unknown_table(encoder):
+    # Raised when called, before the requests are iterated.
+    with pytest.raises(UnknownTable):
+        encoder.encode("test", "pipe.TestIngressControl.nope", [])
+    with pytest.raises(UnknownAction):
+        encoder.encode_shards("test", EXACT_TABLE, [], shard_entries, "nope")
+
+
+def test_invalid_entry(encoder):
+    entries = list(make_entries(60))
+    entries[42] = ({"ig_intr_md.ingress_port": Exact(PortId(1))}, {"port": PortId(1)})
+    with pytest.raises(ParallelEncodingError) as err:
+        list(encoder.encode("test", EXACT_TABLE, entries, FORWARD))
+    assert err.value.number == 42
+    assert "UnknownActionParameter" in str(err.value)
+
+
+def shard_entries(shard):
+    start, stop = shard
+    return list(make_entries(stop))[start:]
+
+
+def test_encode_shards(encoder):
+    shards = [(0, 25), (25, 50), (50, 60)]
+    actual = list(
+        encoder.encode_shards("test", EXACT_TABLE, shards, shard_entries, FORWARD)
+    )
+    expected = list(encoder.encode("test", EXACT_TABLE, make_entries(60), FORWARD))
+    assert actual == expected
@@ -0,0 +1,153 @@
+import os
+
+from bfrt_helper.bfrt import BfRtHelper
+from bfrt_helper.bfrt_info import BfRtInfo
+from bfrt_helper.pb2.bfruntime_pb2 import SetForwardingPipelineConfigRequest
+import bfrt_helper.pipeline as pipeline_module
+from bfrt_helper.pipeline import Pipeline
+from bfrt_helper.pipeline import PipelineCache
+from bfrt_helper.pipeline import PipelineProfile
+from bfrt_helper.pipeline import encode_set_pipeline_request
+
+
+bfrt_helper = BfRtHelper(0, 3, BfRtInfo({}))
+
+
+def write_file(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def make_pipeline(tmp_path, binary=b"\x00\x01" * 1000):
+    bfrt_path = write_file(tmp_path, "bf-rt.json", b'{"tables": []}')
+    profiles = []
+    for pipe in range(2):
+        context_path = write_file(tmp_path, f"context{pipe}.json", b"{}" * (pipe + 1))
+        binary_path = write_file(tmp_path, f"tofino{pipe}.bin", binary)
+        profiles.append(
+            PipelineProfile(
+                context_path,
+                binary_path,
+                profile_name=f"pipe{pipe}",
+                pipe_scope=[pipe * 2, pipe * 2 + 1],
+            )
+        )
+    return Pipeline("forwarder", bfrt_path, profiles)
+
+
+def expected_request(pipeline, action):
+    request = SetForwardingPipelineConfigRequest()
+    request.device_id = bfrt_helper.device_id
+    request.client_id = bfrt_helper.client_id
+    request.action = action
+    request.base_path = "install/share/tofinopd/"
+    config = request.config.add()
+    config.p4_name = pipeline.program_name
+    with open(pipeline.bfrt_path, "rb") as f:
+        config.bfruntime_info = f.read()
+    for pipeline_profile in pipeline.profiles:
+        profile = config.profiles.add()
+        profile.profile_name = pipeline_profile.profile_name
+        with open(pipeline_profile.context_path, "rb") as f:
+            profile.context = f.read()
+        with open(pipeline_profile.binary_path, "rb") as f:
+            profile.binary = f.read()
+        profile.pipe_scope.extend(pipeline_profile.pipe_scope)
+    return request.SerializeToString()
+
+
+def test_encode_matches_serialised_request(tmp_path):
+    pipeline = make_pipeline(tmp_path)
+    action = SetForwardingPipelineConfigRequest.VERIFY_AND_WARM_INIT_BEGIN
+    actual = encode_set_pipeline_request(bfrt_helper, [pipeline], action=action)
+    assert actual == expected_request(pipeline, action)
+
+
+def test_encode_empty_artifact(tmp_path):
+    pipeline = make_pipeline(tmp_path, binary=b"")
+    action = SetForwardingPipelineConfigRequest.VERIFY_AND_WARM_INIT_BEGIN_AND_END
+    actual = encode_set_pipeline_request(bfrt_helper, [pipeline])
+    assert actual == expected_request(pipeline, action)
+
+
+def test_encode_matches_create_set_pipeline_request(tmp_path):
+    pipeline = make_pipeline(tmp_path)
+    pipeline.profiles = pipeline.profiles[:1]
+    pipeline.profiles[0].profile_name = "pipe"
+    pipeline.profiles[0].pipe_scope = [0, 1, 2, 3]
+    profile = pipeline.profiles[0]
+    request = bfrt_helper.create_set_pipeline_request(
+        "forwarder", pipeline.bfrt_path, profile.context_path, profile.binary_path
+    )
+    actual = encode_set_pipeline_request(bfrt_helper, [pipeline])
+    assert actual == request.SerializeToString()
+
+
+def test_create_set_pipeline_request_pipe_scope(tmp_path):
+    pipeline = make_pipeline(tmp_path)
+    profile = pipeline.profiles[0]
+    request = bfrt_helper.create_set_pipeline_request(
+        "forwarder",
+        pipeline.bfrt_path,
+        profile.context_path,
+        profile.binary_path,
+        pipe_scope=[1],
+    )
+    assert list(request.config[0].profiles[0].pipe_scope) == [1]
+
+
+def test_cache_reuses_request(tmp_path):
+    pipeline = make_pipeline(tmp_path)
+    cache = PipelineCache()
+    first = encode_set_pipeline_request(bfrt_helper, [pipeline], cache=cache)
+    second = encode_set_pipeline_request(bfrt_helper, [pipeline], cache=cache)
+    assert second is first
+    assert len(cache) == 1
+
+
+def test_cache_misses_on_changed_artifact(tmp_path):
+    pipeline = make_pipeline(tmp_path)
+    cache = PipelineCache()
+    first = encode_set_pipeline_request(bfrt_helper, [pipeline], cache=cache)
+    write_file(tmp_path, "tofino1.bin", b"\x02" * 10)
+    second = encode_set_pipeline_request(bfrt_helper, [pipeline], cache=cache)
+    assert second != first
+    assert second == encode_set_pipeline_request(bfrt_helper, [pipeline])
+    assert len(cache) == 1
+
+
+def test_cache_hit_reads_no_artifacts(tmp_path, monkeypatch):
+    pipeline = make_pipeline(tmp_path)
+    cache = PipelineCache()
+    first = encode_set_pipeline_request(bfrt_helper, [pipeline], cache=cache)
+
+    def map_file(path, stack):
+        raise AssertionError(f"{path} was read")
+
+    monkeypatch.setattr(pipeline_module, "map_file", map_file)
+    assert encode_set_pipeline_request(bfrt_helper, [pipeline], cache=cache) is first
+
+
+def test_cache_misses_on_same_size_rewrite(tmp_path):
+    pipeline = make_pipeline(tmp_path)
+    cache = PipelineCache()
+    first = encode_set_pipeline_request(bfrt_helper, [pipeline], cache=cache)
+    binary_path = pipeline.profiles[0].binary_path
+    mtime_ns = os.stat(binary_path).st_mtime_ns
+    with open(binary_path, "r+b") as f:
+        f.write(b"\x07")
+    os.utime(binary_path, ns=(mtime_ns + 10**9, mtime_ns + 10**9))
+    second = encode_set_pipeline_request(bfrt_helper, [pipeline], cache=cache)
+    assert len(second) == len(first) and second != first
+
+
+def test_cache_evicts_least_recently_used():
+    cache = PipelineCache(max_entries=2)
+    cache.put("a", b"1")
+    cache.put("b", b"2")
+    cache.get("a")
+    cache.put("c", b"3")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1"
+    assert cache.get("c") == b"3"
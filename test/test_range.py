@@ -0,0 +1,96 @@
+from bfrt_helper.fields import Field
+from bfrt_helper.match import Key
+from bfrt_helper.match import Range
+from bfrt_helper.match import range_to_ternary
+from bfrt_helper.util import InvalidOperation
+from bfrt_helper.util import InvalidValue
+
+import pytest
+
+
+class EightBit(Field):
+    bitwidth = 8
+
+
+class Port(Field):
+    bitwidth = 16
+
+
+def test_range_to_string():
+    assert str(Range(EightBit(1), EightBit(10))) == "1..10"
+
+
+def test_range_with_non_value_type_high_creates_value_type():
+    match = Range(EightBit(1), 10)
+    assert isinstance(match.high, EightBit)
+
+
+def test_range_high_less_than_low_raises():
+    with pytest.raises(InvalidValue):
+        Range(EightBit(10), EightBit(1))
+
+
+def test_range_contains():
+    match = Range(EightBit(5), EightBit(10))
+    assert EightBit(5) in match
+    assert EightBit(10) in match
+    assert EightBit(11) not in match
+
+
+def test_range_subsets():
+    outer = Range(EightBit(0), EightBit(100))
+    inner = Range(EightBit(10), EightBit(20))
+    assert inner <= outer
+    assert inner < outer
+    assert outer >= inner
+    assert outer > inner
+    assert outer <= outer
+    assert not outer < outer
+    assert not inner.overlaps(outer)
+
+
+def test_range_overlaps_and_intersection():
+    a = Range(EightBit(0), EightBit(20))
+    b = Range(EightBit(10), EightBit(30))
+    assert a.overlaps(b)
+    assert a & b == Range(EightBit(10), EightBit(20))
+    with pytest.raises(InvalidOperation):
+        a & Range(EightBit(21), EightBit(30))
+
+
+def test_key_with_range():
+    outer = Key(port=Range(Port(0), Port(1023)))
+    inner = Key(port=Range(Port(80), Port(443)))
+    assert inner < outer
+    assert (outer & inner) == inner
+
+
+def covered(matches):
+    values = []
+    for match in matches:
+        values.extend(
+            v for v in range(256) if v & match.mask.value == match.value.value
+        )
+    return values
+
+
+@pytest.mark.parametrize(
+    "low,high", [(0, 255), (0, 0), (255, 255), (3, 12), (1, 254), (17, 200)]
+)
+def test_range_to_ternary_covers_range_exactly(low, high):
+    matches = range_to_ternary(EightBit(low), EightBit(high))
+    # No value is matched twice, or outside of the range.
+    assert covered(matches) == list(range(low, high + 1))
+
+
+def test_range_to_ternary_is_minimal():
+    assert len(range_to_ternary(EightBit(0), EightBit(255))) == 1
+    assert len(range_to_ternary(EightBit(16), EightBit(31))) == 1
+    # The worst case for w bits is 2w - 2.
+    assert len(range_to_ternary(EightBit(1), EightBit(254))) == 14
+    assert len(Range(Port(1), Port(1023)).to_ternary()) == 10
+
+
+def test_range_to_ternary_high_less_than_low_raises():
+    with pytest.raises(InvalidValue):
+        range_to_ternary(EightBit(10), 1)
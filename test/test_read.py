@@ -0,0 +1,134 @@
+import json
+import os
+
+from bfrt_helper.bfrt import BfRtHelper
+from bfrt_helper.bfrt_info import BfRtInfo
+from bfrt_helper.fields import DevPort
+from bfrt_helper.fields import MACAddress
+from bfrt_helper.fields import PortId
+from bfrt_helper.fields import StringField
+from bfrt_helper.match import Exact
+from bfrt_helper.match import LongestPrefixMatch
+from bfrt_helper.match import Ternary
+from bfrt_helper.pb2.bfruntime_pb2 import ReadResponse
+from bfrt_helper.read import ReadEntry
+from bfrt_helper.read import UnknownTableId
+from bfrt_helper.read import read_entries
+
+import pytest
+
+
+EXACT_TABLE = "pipe.TestIngressControl.port_forward_exact"
+TERNARY_TABLE = "pipe.TestIngressControl.port_forward_ternary"
+LPM_TABLE = "pipe.TestIngressControl.port_forward_lpm"
+FORWARD = "TestIngressControl.forward"
+DROP = "TestIngressControl.drop"
+
+
+bfrt_file = os.path.join(
+    os.path.abspath(os.path.dirname(__file__)), "resources/bfrt.json"
+)
+
+bfrt_data = json.loads(open(bfrt_file).read())
+bfrt_info = BfRtInfo(bfrt_data)
+bfrt_helper = BfRtHelper(0, 0, bfrt_info)
+
+
+def written_entry(table_name, key, action_name=None, action_params=None):
+    """Creates the table entry the server would return for a written entry."""
+    request = bfrt_helper.create_table_write(
+        "test", table_name, key, action_name, action_params
+    )
+    response = ReadResponse()
+    response.entities.add().table_entry.CopyFrom(request.updates[0].entity.table_entry)
+    return response
+
+
+def test_exact_entry():
+    response = written_entry(
+        EXACT_TABLE,
+        {"ig_intr_md.ingress_port": Exact(PortId(7))},
+        FORWARD,
+        {"egress_port": PortId(300)},
+    )
+    [entry] = read_entries(bfrt_info, [response])
+    assert entry.table_name == EXACT_TABLE
+    assert entry.key["ig_intr_md.ingress_port"].value.value == 7
+    assert entry.key["ig_intr_md.ingress_port"].value.bitwidth == 9
+    assert entry.action_name == FORWARD
+    assert entry.action_params["egress_port"].value == 300
+    assert entry.data == {}
+
+
+def test_ternary_and_lpm_entries():
+    ternary = written_entry(
+        TERNARY_TABLE,
+        {
+            "hdr.ethernet.srcAddr": Ternary(MACAddress("0a:00:00:00:00:01"), 0xFF),
+            "$MATCH_PRIORITY": Exact(DevPort(10)),
+        },
+        DROP,
+    )
+    lpm = written_entry(
+        LPM_TABLE,
+        {"hdr.ethernet.srcAddr": LongestPrefixMatch(MACAddress("0a:00:00:00:00:00"), 8)},
+        DROP,
+    )
+    entries = list(read_entries(bfrt_info, [ternary, lpm]))
+
+    match = entries[0].key["hdr.ethernet.srcAddr"]
+    assert isinstance(match, Ternary)
+    assert (match.value.value, match.mask.value) == (0x01, 0xFF)
+    assert entries[0].key["$MATCH_PRIORITY"].value.value == 10
+    assert entries[0].action_params == {}
+
+    match = entries[1].key["hdr.ethernet.srcAddr"]
+    assert isinstance(match, LongestPrefixMatch)
+    assert (match.value.value, match.prefix) == (0x0A0000000000, 8)
+
+
+def test_data_fields():
+    request = bfrt_helper.create_table_data_write(
+        "test",
+        "$PORT",
+        {"$DEV_PORT": Exact(DevPort(5))},
+        {"$SPEED": StringField("BF_SPEED_100G"), "$PORT_ENABLE": True},
+    )
+    response = ReadResponse()
+    response.entities.add().table_entry.CopyFrom(request.updates[0].entity.table_entry)
+    [entry] = read_entries(bfrt_info, [response])
+    assert entry.action_name is None
+    assert entry.key["$DEV_PORT"].value.value == 5
+    assert entry.data["$SPEED"].value == "BF_SPEED_100G"
+    assert entry.data["$PORT_ENABLE"] is True
+
+
+def test_entries_are_decoded_lazily():
+    response = written_entry(
+        EXACT_TABLE, {"ig_intr_md.ingress_port": Exact(PortId(7))}, DROP
+    )
+    entry = ReadEntry(bfrt_info, response.entities[0].table_entry)
+    assert entry._key is None
+    assert entry.key is entry.key
+
+
+def test_responses_are_streamed():
+    consumed = []
+
+    def responses():
+        for port in range(3):
+            consumed.append(port)
+            yield written_entry(
+                EXACT_TABLE, {"ig_intr_md.ingress_port": Exact(PortId(port))}, DROP
+            )
+
+    entries = read_entries(bfrt_info, responses())
+    next(entries)
+    assert consumed == [0]
+
+
+def test_unknown_table_id():
+    response = ReadResponse()
+    response.entities.add().table_entry.table_id = 42
+    with pytest.raises(UnknownTableId):
+        list(read_entries(bfrt_info, [response]))
@@ -0,0 +1,246 @@
+import json
+import os
+
+from bfrt_helper.bfrt import BfRtHelper
+from bfrt_helper.bfrt import InvalidActionParameter
+from bfrt_helper.bfrt import MismatchedMatchType
+from bfrt_helper.bfrt import UnknownActionParameter
+from bfrt_helper.bfrt import UnknownKeyField
+from bfrt_helper.bfrt_info import BfRtInfo
+from bfrt_helper.fields import DevPort
+from bfrt_helper.fields import Field
+from bfrt_helper.fields import MACAddress
+from bfrt_helper.fields import PortId
+from bfrt_helper.match import Exact
+from bfrt_helper.match import LongestPrefixMatch
+from bfrt_helper.match import Optional
+from bfrt_helper.match import Range
+from bfrt_helper.match import Ternary
+from bfrt_helper.pb2.bfruntime_pb2 import Update
+from bfrt_helper.pb2.bfruntime_pb2 import WriteRequest
+from bfrt_helper.wire import WireTableWrite
+from bfrt_helper.wire import WireWriteBatch
+from bfrt_helper.wire import encode_varint
+
+import pytest
+
+
+EXACT_TABLE = "pipe.TestIngressControl.port_forward_exact"
+TERNARY_TABLE = "pipe.TestIngressControl.port_forward_ternary"
+LPM_TABLE = "pipe.TestIngressControl.port_forward_lpm"
+FORWARD = "TestIngressControl.forward"
+DROP = "TestIngressControl.drop"
+
+
+class TooBigForAPortId(Field):
+    bitwidth = 10
+
+
+bfrt_file = os.path.join(
+    os.path.abspath(os.path.dirname(__file__)), "resources/bfrt.json"
+)
+
+bfrt_data = json.loads(open(bfrt_file).read())
+bfrt_info = BfRtInfo(bfrt_data)
+bfrt_helper = BfRtHelper(0, 3, bfrt_info)
+
+
+class L4Port(Field):
+    bitwidth = 16
+
+
+range_info = BfRtInfo(
+    {
+        "tables": [
+            {
+                "id": 1,
+                "name": "pipe.acl",
+                "key": [
+                    {
+                        "id": 1,
+                        "name": "hdr.tcp.dst_port",
+                        "match_type": "Range",
+                        "type": {"type": "bytes", "width": 16},
+                    },
+                    {
+                        "id": 2,
+                        "name": "ig_intr_md.ingress_port",
+                        "match_type": "Optional",
+                        "type": {"type": "bytes", "width": 9},
+                    },
+                    {
+                        "id": 65537,
+                        "name": "$MATCH_PRIORITY",
+                        "match_type": "Exact",
+                        "type": {"type": "uint32"},
+                    },
+                ],
+                "action_specs": [{"id": 2, "name": "drop", "data": []}],
+            }
+        ]
+    }
+)
+
+
+def encode(table_name, key, action_name=None, action_params=None, update_type=None):
+    prepared = bfrt_helper.prepare_table_write(table_name, action_name)
+    expected = prepared(key, action_params, update_type).SerializeToString()
+    actual = WireTableWrite(prepared)(key, action_params, update_type)
+    return expected, actual
+
+
+def test_encode_varint():
+    assert encode_varint(0) == b"\x00"
+    assert encode_varint(127) == b"\x7f"
+    assert encode_varint(300) == b"\xac\x02"
+    assert encode_varint(-1) == b"\xff" * 9 + b"\x01"
+
+
+def test_exact_matches_serialised_update():
+    expected, actual = encode(
+        EXACT_TABLE,
+        {"ig_intr_md.ingress_port": Exact(PortId(0))},
+        FORWARD,
+        {"egress_port": PortId(300)},
+    )
+    assert actual == expected
+
+
+def test_ternary_matches_serialised_update():
+    key = {
+        "hdr.ethernet.srcAddr": Ternary(
+            MACAddress("00:00:00:00:00:01"), MACAddress("ff:ff:ff:ff:ff:ff")
+        ),
+        "$MATCH_PRIORITY": Exact(DevPort(10)),
+    }
+    expected, actual = encode(TERNARY_TABLE, key, DROP)
+    assert actual == expected
+
+
+def test_lpm_matches_serialised_update():
+    key = {"hdr.ethernet.srcAddr": LongestPrefixMatch(MACAddress("0a:00:00:00:00:00"), 8)}
+    expected, actual = encode(
+        LPM_TABLE, key, FORWARD, {"egress_port": PortId(1)}, Update.Type.MODIFY
+    )
+    assert actual == expected
+
+
+def test_range_matches_serialised_update():
+    helper = BfRtHelper(0, 3, range_info)
+    key = {
+        "hdr.tcp.dst_port": Range(L4Port(0), L4Port(1023)),
+        "$MATCH_PRIORITY": Exact(DevPort(1)),
+    }
+    prepared = helper.prepare_table_write("pipe.acl", "drop")
+    update = prepared(key)
+    assert update.entity.table_entry.key.fields[0].range.low == b"\x00\x00"
+    assert update.entity.table_entry.key.fields[0].range.high == b"\x03\xff"
+    assert WireTableWrite(prepared)(key) == update.SerializeToString()
+
+    request = helper.create_table_write("test", "pipe.acl", key, "drop")
+    assert request.updates[0] == update
+
+
+@pytest.mark.parametrize("is_valid", [True, False])
+def test_optional_matches_serialised_update(is_valid):
+    helper = BfRtHelper(0, 3, range_info)
+    key = {
+        "ig_intr_md.ingress_port": Optional(PortId(5), is_valid),
+        "$MATCH_PRIORITY": Exact(DevPort(1)),
+    }
+    prepared = helper.prepare_table_write("pipe.acl", "drop")
+    update = prepared(key)
+    assert update.entity.table_entry.key.fields[0].optional.is_valid == is_valid
+    assert update.entity.table_entry.key.fields[0].HasField("optional")
+    assert WireTableWrite(prepared)(key) == update.SerializeToString()
+
+
+@pytest.mark.parametrize("handle_id", [0, 1, 300])
+def test_handle_matches_serialised_update(handle_id):
+    prepared = bfrt_helper.prepare_table_write(EXACT_TABLE, FORWARD)
+    params = {"egress_port": PortId(1)}
+    update = prepared(None, params, Update.Type.MODIFY, handle_id=handle_id)
+    assert update.entity.table_entry.handle_id == handle_id
+    assert not update.entity.table_entry.HasField("key")
+    actual = WireTableWrite(prepared)(None, params, Update.Type.MODIFY, handle_id)
+    assert actual == update.SerializeToString()
+
+
+def test_batch_handle_updates_match_write_batch():
+    expected = bfrt_helper.create_write_batch("test")
+    actual = WireWriteBatch(bfrt_helper, "test")
+    for batch in (expected, actual):
+        batch.modify_handle(EXACT_TABLE, 7, FORWARD, {"egress_port": PortId(1)})
+        batch.delete_handle(EXACT_TABLE, 8)
+    [(request, _)] = expected.pop_all()
+    assert actual.pop_all() == [(request.SerializeToString(), range(0, 2))]
+
+
+def test_delete_matches_serialised_update():
+    key = {"ig_intr_md.ingress_port": Exact(PortId(7))}
+    expected, actual = encode(EXACT_TABLE, key, update_type=Update.Type.DELETE)
+    assert actual == expected
+
+
+def test_empty_key_matches_serialised_update():
+    expected, actual = encode(EXACT_TABLE, {}, DROP)
+    assert actual == expected
+
+
+def test_non_field_parameter_matches_serialised_update():
+    key = {"ig_intr_md.ingress_port": Exact(PortId(7))}
+    expected, actual = encode(EXACT_TABLE, key, FORWARD, {"egress_port": "7"})
+    assert actual == expected
+
+
+def test_errors():
+    forward = WireTableWrite(bfrt_helper.prepare_table_write(EXACT_TABLE, FORWARD))
+    key = {"ig_intr_md.ingress_port": Exact(PortId(7))}
+    with pytest.raises(UnknownKeyField):
+        forward({"hdr.ethernet.srcAddr": Exact(PortId(7))})
+    with pytest.raises(MismatchedMatchType):
+        forward({"ig_intr_md.ingress_port": LongestPrefixMatch(PortId(7), 9)})
+    with pytest.raises(UnknownActionParameter):
+        forward(key, {"port": PortId(1)})
+    with pytest.raises(InvalidActionParameter):
+        forward(key, {"egress_port": TooBigForAPortId(1)})
+
+
+def fill(batch, n_entries):
+    for port in range(n_entries):
+        batch.insert(
+            EXACT_TABLE,
+            {"ig_intr_md.ingress_port": Exact(PortId(port))},
+            FORWARD,
+            {"egress_port": PortId(511 - port)},
+        )
+    batch.delete(EXACT_TABLE, {"ig_intr_md.ingress_port": Exact(PortId(0))})
+
+
+@pytest.mark.parametrize(
+    "max_bytes, max_updates", [(None, None), (None, 7), (200, None), (1, None)]
+)
+def test_batch_matches_write_batch(max_bytes, max_updates):
+    target = {"pipe_id": 1}
+    atomicity = WriteRequest.Atomicity.ROLLBACK_ON_ERROR
+    expected = bfrt_helper.create_write_batch(
+        "test", atomicity, target, max_bytes, max_updates
+    )
+    actual = WireWriteBatch(bfrt_helper, "test", atomicity, target, max_bytes, max_updates)
+    fill(expected, 40)
+    fill(actual, 40)
+    assert len(actual) == len(expected) == 41
+
+    expected = [(r.SerializeToString(), n) for r, n in expected.pop_all()]
+    assert actual.pop_all() == expected
+    assert len(actual) == 0
+    assert actual.pop_all() == []
+
+
+def test_batch_pop_full():
+    batch = WireWriteBatch(bfrt_helper, "test", max_updates=10)
+    fill(batch, 24)
+    full = batch.pop_full()
+    assert [r for _, r in full] == [range(0, 10), range(10, 20)]
+    assert len(batch) == 5
+    assert [r for _, r in batch.pop_all()] == [range(20, 25)]